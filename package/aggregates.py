@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from dispatch import STATS_COLUMNS
+
+# Columns averaged per (month pair, hour) for the daily profile plots
+PROFILE_COLUMNS = ('PV_total_kW', 'consumption_kW', 'battery_charge_kWh', 'battery_discharge_kWh')
+
+
+def annual_metrics(pv_kWh, consumption_kWh, from_grid_kWh):
+    """Average the per-year sums (years along axis 0) into the headline metrics"""
+    pv_used_kWh = consumption_kWh - from_grid_kWh
+    # Without PV the self-consumption rate is inf in a year the initial battery charge
+    # is used and NaN (0/0) in the others; the mean skips NaN like SimulationResult.summary
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'avg_pv_used': _nanmean(pv_used_kWh),
+            'avg_consumption': _nanmean(consumption_kWh),
+            'avg_grid_independence': _nanmean((1 - from_grid_kWh / consumption_kWh) * 100),
+            'avg_self_consumption_rate': _nanmean(pv_used_kWh / pv_kWh * 100),
+        }
+
+
+def _nanmean(values):
+    """Mean along axis 0 without NaN entries, as pandas does; NaN if all entries are NaN"""
+    valid = ~np.isnan(values)
+    return np.where(valid, values, 0.0).sum(axis=0) / valid.sum(axis=0)
+
+
+@dataclass(frozen=True)
+class ReportAggregates:
+    """Compact aggregates of one simulation run, everything the report needs.
+
+    ``monthly_sums`` has shape ``(n_years, 12, 5)``: energy sums per weather
+    year and month in the order of ``dispatch.STATS_COLUMNS``, NaN for months
+    without data. ``hourly_means`` has shape ``(6, 24, 4)``: the mean per month
+    pair (Jan-Feb, ...) and hour of day in the order of ``PROFILE_COLUMNS``.
+    The daily arrays hold the lowest and highest state of charge and the month
+    of each day.
+    """
+    parameters: dict
+    years: np.ndarray
+    monthly_sums: np.ndarray
+    hourly_means: np.ndarray
+    daily_soc_min: np.ndarray
+    daily_soc_max: np.ndarray
+    daily_month: np.ndarray
+
+    @classmethod
+    def from_result(cls, result):
+        """Aggregate a SimulationResult with one grouped reduction per output column"""
+        dataset = result.dataset
+        n_years = len(dataset.years)
+        month, hour = dataset.calendar['month'], dataset.calendar['hour']
+        year_position = np.repeat(np.arange(n_years), np.diff(np.r_[dataset.year_starts, len(dataset)]))
+
+        year_month = year_position * 12 + (month - 1)
+        counts = np.bincount(year_month, minlength=n_years * 12)
+        monthly_sums = np.stack(
+            [np.bincount(year_month, weights=getattr(result, name), minlength=n_years * 12)
+             for name in STATS_COLUMNS], axis=-1)
+        monthly_sums[counts == 0] = np.nan
+
+        pair_hour = ((month - 1) // 2) * 24 + hour
+        counts = np.bincount(pair_hour, minlength=6 * 24)
+        with np.errstate(invalid='ignore'):
+            # Divided by the step length, so sub-hourly energies become mean power per hour as well
+            hourly_means = np.stack(
+                [np.bincount(pair_hour, weights=getattr(result, name), minlength=6 * 24)
+                 / counts / dataset.step_hours
+                 for name in PROFILE_COLUMNS], axis=-1)
+
+        day_starts = dataset.calendar['day_starts']
+        return cls(
+            parameters=dict(result.parameters),
+            years=dataset.years,
+            monthly_sums=monthly_sums.reshape(n_years, 12, len(STATS_COLUMNS)),
+            hourly_means=hourly_means.reshape(6, 24, len(PROFILE_COLUMNS)),
+            daily_soc_min=np.minimum.reduceat(result.battery_soc_kWh, day_starts),
+            daily_soc_max=np.maximum.reduceat(result.battery_soc_kWh, day_starts),
+            daily_month=month[day_starts],
+        )
+
+    def monthly(self, name):
+        """``(n_years, 12)`` sums of one of ``STATS_COLUMNS``"""
+        return self.monthly_sums[:, :, STATS_COLUMNS.index(name)]
+
+    def hourly(self, name):
+        """``(6, 24)`` means of one of ``PROFILE_COLUMNS``"""
+        return self.hourly_means[:, :, PROFILE_COLUMNS.index(name)]
+
+    def annual_sums(self):
+        """``(n_years, 5)`` sums per weather year"""
+        return np.nansum(self.monthly_sums, axis=1)
+
+    def summary(self):
+        """The four headline metrics, averaged over the weather years"""
+        annual_sums = self.annual_sums()
+        return annual_metrics(annual_sums[:, 0], annual_sums[:, 1], annual_sums[:, 2])
+
+    def battery_days_per_month(self, full_fraction=0.9):
+        """Number of days per month (summed over all years) with a full and with an empty battery"""
+        capacity = self.parameters['battery_capacity_kWh']
+        full = self.daily_soc_max >= capacity * full_fraction
+        empty = self.daily_soc_min <= capacity * self.parameters['battery_discharge_cutoff_limit']
+        return (np.bincount(self.daily_month - 1, weights=full, minlength=12),
+                np.bincount(self.daily_month - 1, weights=empty, minlength=12))
@@ -1,108 +1,46 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import json
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+import io
 from datetime import datetime
-
-df = None
-
-def create_summary_page(pdf, consumption_per_flat_per_year_kWh, installed_power_oso_kWp, 
-                       installed_power_wnw_kWp, battery_capacity_kWh, 
-                       battery_discharge_cutoff_limit, battery_charge_efficiency, 
-                       battery_max_power_kW, avg_pv_used, avg_consumption, 
-                       avg_grid_independence, avg_self_consumption_rate):
-    """Create summary page with parameters and results"""
-    from matplotlib.patches import Rectangle
-    
-    fig = plt.figure(figsize=(8.27, 11.69))  # A4 size in inches
-    ax = fig.add_subplot(111)
-    ax.axis('off')
-    
-    # Title
-    fig.text(0.5, 0.95, 'PV-Batterie-Simulationsbericht', 
-             ha='center', fontsize=18, fontweight='bold')
-    fig.text(0.5, 0.92, f'Erstellt am: {datetime.now().strftime("%d.%m.%Y %H:%M:%S")}', 
-             ha='center', fontsize=10, color='gray')
-    
-    y_pos = 0.88
-    
-    # Section: Annahmen
-    fig.text(0.1, y_pos, 'Annahmen', fontsize=14, fontweight='bold')
-    y_pos -= 0.03
-    
-    assumptions_text = """• Latitude/Longitude: 48.865, 9.314 (Burghaldenstr. 5, 71336 Waiblingen)
+from dataclasses import dataclass
+
+from aggregates import ReportAggregates, annual_metrics
+from dataset import SimulationDataset, default_dataset
+from dispatch import STATS_COLUMNS, greedy_dispatch, greedy_dispatch_batch_stats, greedy_dispatch_stats
+from instrumentation import StageObserver, instrumentation
+from optimal_dispatch import DISPATCH_STRATEGIES, Tariff, optimal_dispatch
+
+# Default parameters of run_pv_battery_simulation, also used to fill gaps in simulate_batch tables
+SIMULATION_DEFAULTS = {
+    'consumption_per_flat_per_year_kWh': 3200,
+    'installed_power_oso_kWp': 10,
+    'installed_power_wnw_kWp': 10,
+    'battery_capacity_kWh': 20,
+    'battery_discharge_cutoff_limit': 0.1,
+    'battery_charge_efficiency': 0.95,
+    'battery_max_power_kW': 4.2,
+}
+
+
+MONTH_PAIRS = ['Jan-Feb', 'Mär-Apr', 'Mai-Jun', 'Jul-Aug', 'Sep-Okt', 'Nov-Dez']
+MONTH_PAIR_COLORS = [
+    '#3A4CC0',  # Jan-Feb: Deep blue (winter)
+    '#6FA8DC',  # Mar-Apr: Light blue (spring)
+    '#F4A582',  # May-Jun: Light orange (late spring/early summer)
+    '#D7191C',  # Jul-Aug: Red (peak summer)
+    '#FDAE61',  # Sep-Oct: Orange (fall)
+    '#5E8CC0'   # Nov-Dec: Blue (late fall/winter)
+]
+MONTHS = ['Jan', 'Feb', 'Mär', 'Apr', 'Mai', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dez']
+
+ASSUMPTIONS_TEXT = """• Latitude/Longitude: 48.865, 9.314 (Burghaldenstr. 5, 71336 Waiblingen)
 • Dachneigung zur Straße: 48°, Bearing: 285° (WNW), Azimuth für PVGIS: +105°
 • Dachneigung zum Garten: 42°, Bearing: 105° (OSO), Azimuth für PVGIS: -75°"""
-    
-    fig.text(0.12, y_pos, assumptions_text, ha='left', va='top', fontsize=9, 
-             verticalalignment='top')
-    y_pos -= 0.10
-    
-    # Section: Eingabeparameter (as table)
-    fig.text(0.1, y_pos, 'Eingabeparameter', fontsize=14, fontweight='bold')
-    y_pos -= 0.00
-    
-    # Create parameter table
-    param_data = [
-        ['Verbrauch pro Wohnung pro Jahr', f'{consumption_per_flat_per_year_kWh:.0f} kWh'],
-        ['Installierte Leistung OSO', f'{installed_power_oso_kWp:.1f} kWp'],
-        ['Installierte Leistung WNW', f'{installed_power_wnw_kWp:.1f} kWp'],
-        ['Batteriekapazität', f'{battery_capacity_kWh:.1f} kWh'],
-        ['Batterie-Entladegrenze', f'{battery_discharge_cutoff_limit * 100:.0f}%'],
-        ['Batterie-Ladewirkungsgrad', f'{battery_charge_efficiency * 100:.0f}%'],
-        ['Maximale Batterieleistung', f'{battery_max_power_kW:.1f} kW']
-    ]
-    
-    table = ax.table(cellText=param_data, 
-                     colWidths=[0.5, 0.25],
-                     cellLoc='left',
-                     loc='upper left',
-                     bbox=[0.1, y_pos-0.18, 0.8, 0.18])
-    table.auto_set_font_size(False)
-    table.set_fontsize(9)
-    table.scale(1, 1.8)
-    
-    # Style the table
-    for i in range(len(param_data)):
-        table[(i, 0)].set_facecolor('#f0f0f0')
-        table[(i, 1)].set_facecolor('white')
-    
-    y_pos -= 0.30
-    
-    # Section: Simulationsergebnisse (as table)
-    fig.text(0.1, y_pos, 'Simulationsergebnisse', fontsize=14, fontweight='bold')
-    y_pos -= 0.02
-    
-    results_data = [
-        ['Durchschn. jährlich genutzte PV-Energie', f'{int(avg_pv_used)} kWh'],
-        ['Durchschn. jährlicher Verbrauch', f'{int(avg_consumption)} kWh'],
-        ['Durchschn. Netzunabhängigkeitsrate', f'{avg_grid_independence:.1f}%'],
-        ['Durchschn. PV-Eigenverbrauchsrate', f'{avg_self_consumption_rate:.1f}%']
-    ]
-    
-    table2 = ax.table(cellText=results_data, 
-                      colWidths=[0.5, 0.25],
-                      cellLoc='left',
-                      loc='upper left',
-                      bbox=[0.1, y_pos-0.11, 0.8, 0.11])
-    table2.auto_set_font_size(False)
-    table2.set_fontsize(9)
-    table2.scale(1, 1.8)
-    
-    # Style the table
-    for i in range(len(results_data)):
-        table2[(i, 0)].set_facecolor('#e6f3ff')
-        table2[(i, 1)].set_facecolor('white')
-        table2[(i, 0)].set_text_props(weight='bold')
-    
-    y_pos -= 0.14
-    
-    # Section: Quellen
-    fig.text(0.1, y_pos, 'Quellen', fontsize=14, fontweight='bold')
-    y_pos -= 0.03
-    
-    sources_text = """• Stromverbrauch Haushalt - DeStatis
+
+SOURCES_TEXT = """• Stromverbrauch Haushalt - DeStatis
   https://www.destatis.de/DE/Themen/Gesellschaft-Umwelt/Umwelt/
   UGR/private-haushalte/Tabellen/stromverbrauch-haushalte.html
   Gesamtstromverbrauch pro Jahr
@@ -114,188 +52,494 @@ def create_summary_page(pdf, consumption_per_flat_per_year_kWh, installed_power_
 • Sample data - Open Power System Data
   https://data.open-power-system-data.org/household_data/
   Messdaten zu Stromverbrauch aus EU-gefördertem Projekt"""
-    
-    fig.text(0.12, y_pos, sources_text, ha='left', va='top', fontsize=8, 
-             verticalalignment='top', family='monospace')
-    
-    pdf.savefig(fig, bbox_inches='tight')
-    plt.close()
-
-
-def plot_hourly_profiles(df, pdf=None):
-    """Create hourly profile plots for PV, consumption, and battery"""
-    # Calculate hourly averages by month
-    df_hourly = df.copy()
-    df_hourly['month'] = df_hourly.index.month
-    df_hourly['hour'] = df_hourly.index.hour
-    df_hourly['month_pair'] = ((df_hourly['month'] - 1) // 2) + 1
-
-    hourly_by_month = df_hourly.groupby(['month_pair', 'hour']).agg({
-        'PV_total_kW': 'mean',
-        'consumption_kW': 'mean',
-        'battery_charge_kWh': 'mean',
-        'battery_discharge_kWh': 'mean'
-    }).reset_index()
-
-    month_pairs = ['Jan-Feb', 'Mär-Apr', 'Mai-Jun', 'Jul-Aug', 'Sep-Okt', 'Nov-Dez']
-    colors = [
-        '#3A4CC0',  # Jan-Feb: Deep blue (winter)
-        '#6FA8DC',  # Mar-Apr: Light blue (spring)
-        '#F4A582',  # May-Jun: Light orange (late spring/early summer)
-        '#D7191C',  # Jul-Aug: Red (peak summer)
-        '#FDAE61',  # Sep-Oct: Orange (fall)
-        '#5E8CC0'   # Nov-Dec: Blue (late fall/winter)
-    ]
-
-    # Create subplots with A4-friendly size
-    fig, axes = plt.subplots(3, 1, figsize=(8.27, 10))
-
-    # Plot 1: PV Production
-    for month_pair in range(1, 7):
-        month_data = hourly_by_month[hourly_by_month['month_pair'] == month_pair]
-        axes[0].plot(month_data['hour'], month_data['PV_total_kW'], 
-                    label=month_pairs[month_pair-1], color=colors[month_pair-1], linewidth=2.5)
-    axes[0].set_ylabel('Durchschn. PV-Erzeugung (kW)', fontsize=10)
-    axes[0].set_title('Durchschnittliche PV-Erzeugung nach Tageszeit (2005-2023)', fontsize=11, fontweight='bold')
-    axes[0].set_xticks(range(0, 24, 2))
-    axes[0].legend(loc='upper right', ncol=3, fontsize=8)
-    axes[0].grid(True, alpha=0.3)
-
-    # Plot 2: Consumption
-    for month_pair in range(1, 7):
-        month_data = hourly_by_month[hourly_by_month['month_pair'] == month_pair]
-        axes[1].plot(month_data['hour'], month_data['consumption_kW'], 
-                    label=month_pairs[month_pair-1], color=colors[month_pair-1], linewidth=2.5)
-    axes[1].set_ylabel('Durchschn. Verbrauch (kW)', fontsize=10)
-    axes[1].set_title('Durchschnittlicher Verbrauch nach Tageszeit (2005-2023)', fontsize=11, fontweight='bold')
-    axes[1].set_xticks(range(0, 24, 2))
-    axes[1].legend(loc='upper right', ncol=3, fontsize=8)
-    axes[1].grid(True, alpha=0.3)
-
-    # Plot 3: Battery Charge/Discharge
-    for month_pair in range(1, 7):
-        month_data = hourly_by_month[hourly_by_month['month_pair'] == month_pair]
-        net_battery = month_data['battery_charge_kWh'] - month_data['battery_discharge_kWh']
-        axes[2].plot(month_data['hour'], net_battery, 
-                    label=month_pairs[month_pair-1], color=colors[month_pair-1], linewidth=2.5)
-    axes[2].axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
-    axes[2].set_xlabel('Tageszeit (Stunde)', fontsize=10)
-    axes[2].set_ylabel('Netto-Batteriefluss (kWh)\n(+Laden, -Entladen)', fontsize=10)
-    axes[2].set_title('Durchschnittliches Batterieladen/-entladen nach Tageszeit (2005-2023)', fontsize=11, fontweight='bold')
-    axes[2].set_xticks(range(0, 24, 2))
-    axes[2].legend(loc='upper right', ncol=3, fontsize=8)
-    axes[2].grid(True, alpha=0.3)
-
-    plt.tight_layout()
-    if pdf:
-        pdf.savefig(fig)
-    plt.show()
-    plt.close()
-
-
-def plot_monthly_pv_usage(df, pdf=None):
-    """Create monthly PV output vs unused PV plot"""
-    monthly_data = df.copy().groupby(['year', 'month']).agg({
-        'PV_total_kW': 'sum',
-        'consumption_kW': 'sum',
-        'from_grid_kW': 'sum'
-    }).reset_index()
-    monthly_data['pv_used_kWh'] = monthly_data['consumption_kW'] - monthly_data['from_grid_kW']
-    monthly_data['pv_unused_kWh'] = monthly_data['PV_total_kW'] - monthly_data['pv_used_kWh']
-    monthly_avg = monthly_data.groupby('month').agg({
-        'PV_total_kW': 'mean',
-        'pv_unused_kWh': 'mean'
-    }).reset_index()
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    months = ['Jan', 'Feb', 'Mär', 'Apr', 'Mai', 'Jun', 
-              'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dez']
-    x = np.arange(len(months))
-    width = 0.35
-    ax.bar(x - width/2, monthly_avg['PV_total_kW'], width, label='Gesamt-PV-Energieertrag', color='orange', alpha=0.8)
-    ax.bar(x + width/2, monthly_avg['pv_unused_kWh'], width, label='Nicht genutzte PV-Energie', color='red', alpha=0.8)
-    ax.set_xlabel('Monat')
-    ax.set_ylabel('Energie (kWh)')
-    ax.set_title('Monatlicher PV-Energieertrag vs. ungenutzte PV-Energie (Durchschnitt 2005-2023)')
-    ax.set_xticks(x)
-    ax.set_xticklabels(months)
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    if pdf:
-        pdf.savefig(fig, bbox_inches='tight')
-    plt.show()
-    plt.close()
-
-
-def plot_battery_status(df, battery_capacity_kWh, battery_discharge_cutoff_limit, pdf=None):
-    """Create battery status plot showing full vs empty days"""
-    df_copy = df.copy()
-    df_copy["year"] = df_copy.index.year
-    df_copy["month"] = df_copy.index.month
-    df_copy["day"] = df_copy.index.day
-    daily_battery = df_copy.groupby([df_copy.year, df_copy.month, df_copy.day]).agg({
-        'battery_soc_kWh': ['min', 'max']
-    }).reset_index()
-    daily_battery.columns = ['year', 'month', 'day', 'soc_min', 'soc_max']
-    battery_full_threshold = battery_capacity_kWh * 0.9
-    battery_empty_threshold = battery_capacity_kWh * battery_discharge_cutoff_limit
-    daily_battery['battery_full'] = daily_battery['soc_max'] >= battery_full_threshold
-    daily_battery['battery_empty'] = daily_battery['soc_min'] <= battery_empty_threshold
-    monthly_battery_status = daily_battery.groupby('month').agg({
-        'battery_full': 'sum',
-        'battery_empty': 'sum'
-    }).reset_index()
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    months = ['Jan', 'Feb', 'Mär', 'Apr', 'Mai', 'Jun', 
-              'Jul', 'Aug', 'Sep', 'Okt', 'Nov', 'Dez']
-    x = np.arange(len(months))
-    width = 0.35
-    ax.bar(x - width/2, monthly_battery_status['battery_full'], width, label='Tage mit voller Batterie (>90%)', color='green', alpha=0.8)
-    ax.bar(x + width/2, monthly_battery_status['battery_empty'], width, label='Tage mit leerer Batterie (<10%)', color='red', alpha=0.8)
-    ax.set_xlabel('Monat')
-    ax.set_ylabel('Anzahl Tage')
-    ax.set_title('Batteriestatus: Volle vs. leere Tage nach Monat (2005-2023)')
-    ax.set_xticks(x)
-    ax.set_xticklabels(months)
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    if pdf:
-        pdf.savefig(fig, bbox_inches='tight')
-    plt.show()
-    plt.close()
-
-
-def generate_pdf_report(df, consumption_per_flat_per_year_kWh, installed_power_oso_kWp, 
-                       installed_power_wnw_kWp, battery_capacity_kWh, 
-                       battery_discharge_cutoff_limit, battery_charge_efficiency, 
-                       battery_max_power_kW, avg_pv_used, avg_consumption, 
-                       avg_grid_independence, avg_self_consumption_rate):
-    """Generate complete PDF report with all plots and data"""
-    pdf_filename = f"PV_Batterie_Simulation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    
-    with PdfPages(pdf_filename) as pdf:
-        # Page 1: Summary
-        create_summary_page(pdf, consumption_per_flat_per_year_kWh, installed_power_oso_kWp, 
-                          installed_power_wnw_kWp, battery_capacity_kWh, 
-                          battery_discharge_cutoff_limit, battery_charge_efficiency, 
-                          battery_max_power_kW, avg_pv_used, avg_consumption, 
-                          avg_grid_independence, avg_self_consumption_rate)
-        
-        # Page 2: Hourly profiles
-        plot_hourly_profiles(df, pdf)
-        
-        # Page 3: Monthly PV usage
-        plot_monthly_pv_usage(df, pdf)
-        
-        # Page 4: Battery status
-        plot_battery_status(df, battery_capacity_kWh, battery_discharge_cutoff_limit, pdf)
-    
+
+
+class ReportLayout:
+    """The four report pages, built once and refilled for every scenario.
+
+    Uses ``matplotlib.figure.Figure`` objects directly instead of pyplot, so no
+    GUI backend or global figure state is involved and one layout can render
+    any number of reports, e.g. in a worker process.
+    """
+
+    def __init__(self):
+        self._build_summary_page()
+        self._build_hourly_profiles()
+        self._build_monthly_pv_usage()
+        self._build_battery_status()
+
+    def _build_summary_page(self):
+        fig = Figure(figsize=(8.27, 11.69))  # A4 size in inches
+        ax = fig.add_subplot(111)
+        ax.axis('off')
+
+        # Title
+        fig.text(0.5, 0.95, 'PV-Batterie-Simulationsbericht',
+                 ha='center', fontsize=18, fontweight='bold')
+        self._created_text = fig.text(0.5, 0.92, '', ha='center', fontsize=10, color='gray')
+
+        y_pos = 0.88
+
+        # Section: Annahmen
+        fig.text(0.1, y_pos, 'Annahmen', fontsize=14, fontweight='bold')
+        y_pos -= 0.03
+        fig.text(0.12, y_pos, ASSUMPTIONS_TEXT, ha='left', va='top', fontsize=9)
+        y_pos -= 0.10
+
+        # Section: Eingabeparameter (as table)
+        fig.text(0.1, y_pos, 'Eingabeparameter', fontsize=14, fontweight='bold')
+        param_labels = [
+            'Verbrauch pro Wohnung pro Jahr',
+            'Installierte Leistung OSO',
+            'Installierte Leistung WNW',
+            'Batteriekapazität',
+            'Batterie-Entladegrenze',
+            'Batterie-Ladewirkungsgrad',
+            'Maximale Batterieleistung',
+        ]
+        self._param_table = ax.table(cellText=[[label, ''] for label in param_labels],
+                                     colWidths=[0.5, 0.25],
+                                     cellLoc='left',
+                                     loc='upper left',
+                                     bbox=[0.1, y_pos-0.18, 0.8, 0.18])
+        self._param_table.auto_set_font_size(False)
+        self._param_table.set_fontsize(9)
+        self._param_table.scale(1, 1.8)
+        for i in range(len(param_labels)):
+            self._param_table[(i, 0)].set_facecolor('#f0f0f0')
+            self._param_table[(i, 1)].set_facecolor('white')
+        y_pos -= 0.30
+
+        # Section: Simulationsergebnisse (as table)
+        fig.text(0.1, y_pos, 'Simulationsergebnisse', fontsize=14, fontweight='bold')
+        y_pos -= 0.02
+        result_labels = [
+            'Durchschn. jährlich genutzte PV-Energie',
+            'Durchschn. jährlicher Verbrauch',
+            'Durchschn. Netzunabhängigkeitsrate',
+            'Durchschn. PV-Eigenverbrauchsrate',
+        ]
+        self._results_table = ax.table(cellText=[[label, ''] for label in result_labels],
+                                       colWidths=[0.5, 0.25],
+                                       cellLoc='left',
+                                       loc='upper left',
+                                       bbox=[0.1, y_pos-0.11, 0.8, 0.11])
+        self._results_table.auto_set_font_size(False)
+        self._results_table.set_fontsize(9)
+        self._results_table.scale(1, 1.8)
+        for i in range(len(result_labels)):
+            self._results_table[(i, 0)].set_facecolor('#e6f3ff')
+            self._results_table[(i, 1)].set_facecolor('white')
+            self._results_table[(i, 0)].set_text_props(weight='bold')
+        y_pos -= 0.14
+
+        # Section: Quellen
+        fig.text(0.1, y_pos, 'Quellen', fontsize=14, fontweight='bold')
+        y_pos -= 0.03
+        fig.text(0.12, y_pos, SOURCES_TEXT, ha='left', va='top', fontsize=8, family='monospace')
+
+        self.summary_figure = fig
+
+    def _build_hourly_profiles(self):
+        # Create subplots with A4-friendly size
+        fig = Figure(figsize=(8.27, 10))
+        axes = fig.subplots(3, 1)
+        titles = [
+            ('Durchschn. PV-Erzeugung (kW)',
+             'Durchschnittliche PV-Erzeugung nach Tageszeit (2005-2023)'),
+            ('Durchschn. Verbrauch (kW)',
+             'Durchschnittlicher Verbrauch nach Tageszeit (2005-2023)'),
+            ('Netto-Batteriefluss (kWh)\n(+Laden, -Entladen)',
+             'Durchschnittliches Batterieladen/-entladen nach Tageszeit (2005-2023)'),
+        ]
+        self._hourly_lines = []
+        for ax, (ylabel, title) in zip(axes, titles):
+            self._hourly_lines.append([
+                ax.plot(np.arange(24), np.zeros(24), label=label, color=color, linewidth=2.5)[0]
+                for label, color in zip(MONTH_PAIRS, MONTH_PAIR_COLORS)])
+            ax.set_ylabel(ylabel, fontsize=10)
+            ax.set_title(title, fontsize=11, fontweight='bold')
+            ax.set_xticks(range(0, 24, 2))
+            ax.legend(loc='upper right', ncol=3, fontsize=8)
+            ax.grid(True, alpha=0.3)
+        axes[2].axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+        axes[2].set_xlabel('Tageszeit (Stunde)', fontsize=10)
+
+        self._hourly_axes = axes
+        self.hourly_figure = fig
+
+    def _build_monthly_bars(self, ylabel, title, bars):
+        fig = Figure(figsize=(12, 6))
+        ax = fig.add_subplot(111)
+        x = np.arange(len(MONTHS))
+        width = 0.35
+        containers = []
+        for offset, (label, color) in zip((-width/2, width/2), bars):
+            containers.append(ax.bar(x + offset, np.zeros(len(MONTHS)), width,
+                                     label=label, color=color, alpha=0.8))
+        ax.set_xlabel('Monat')
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        ax.set_xticks(x)
+        ax.set_xticklabels(MONTHS)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        return fig, ax, containers
+
+    def _build_monthly_pv_usage(self):
+        self.monthly_figure, self._monthly_ax, self._monthly_bars = self._build_monthly_bars(
+            'Energie (kWh)',
+            'Monatlicher PV-Energieertrag vs. ungenutzte PV-Energie (Durchschnitt 2005-2023)',
+            [('Gesamt-PV-Energieertrag', 'orange'), ('Nicht genutzte PV-Energie', 'red')])
+
+    def _build_battery_status(self):
+        self.battery_figure, self._battery_ax, self._battery_bars = self._build_monthly_bars(
+            'Anzahl Tage',
+            'Batteriestatus: Volle vs. leere Tage nach Monat (2005-2023)',
+            [('Tage mit voller Batterie (>90%)', 'green'), ('Tage mit leerer Batterie (<10%)', 'red')])
+
+    def update(self, aggregates, summary=None):
+        """Fill all pages with the values of one scenario"""
+        params = aggregates.parameters
+        if summary is None:
+            summary = aggregates.summary()
+
+        self._created_text.set_text(f'Erstellt am: {datetime.now().strftime("%d.%m.%Y %H:%M:%S")}')
+        param_values = [
+            f"{params['consumption_per_flat_per_year_kWh']:.0f} kWh",
+            f"{params['installed_power_oso_kWp']:.1f} kWp",
+            f"{params['installed_power_wnw_kWp']:.1f} kWp",
+            f"{params['battery_capacity_kWh']:.1f} kWh",
+            f"{params['battery_discharge_cutoff_limit'] * 100:.0f}%",
+            f"{params['battery_charge_efficiency'] * 100:.0f}%",
+            f"{params['battery_max_power_kW']:.1f} kW",
+        ]
+        for i, value in enumerate(param_values):
+            self._param_table[(i, 1)].get_text().set_text(value)
+        result_values = [
+            f"{int(summary['avg_pv_used'])} kWh",
+            f"{int(summary['avg_consumption'])} kWh",
+            f"{summary['avg_grid_independence']:.1f}%",
+            f"{summary['avg_self_consumption_rate']:.1f}%",
+        ]
+        for i, value in enumerate(result_values):
+            self._results_table[(i, 1)].get_text().set_text(value)
+
+        hourly = [
+            aggregates.hourly('PV_total_kW'),
+            aggregates.hourly('consumption_kW'),
+            aggregates.hourly('battery_charge_kWh') - aggregates.hourly('battery_discharge_kWh'),
+        ]
+        for ax, lines, values in zip(self._hourly_axes, self._hourly_lines, hourly):
+            for line, month_pair_values in zip(lines, values):
+                line.set_ydata(month_pair_values)
+            _rescale(ax)
+
+        pv_total = aggregates.monthly('PV_total_kW')
+        pv_used = aggregates.monthly('consumption_kW') - aggregates.monthly('from_grid_kW')
+        _set_bar_heights(self._monthly_ax, self._monthly_bars,
+                         [np.nanmean(pv_total, axis=0), np.nanmean(pv_total - pv_used, axis=0)])
+        _set_bar_heights(self._battery_ax, self._battery_bars,
+                         aggregates.battery_days_per_month(full_fraction=0.9))
+
+    def save(self, pdf_filename):
+        """Write the current pages as a four-page PDF"""
+        self.hourly_figure.tight_layout()
+        with PdfPages(pdf_filename) as pdf:
+            pdf.savefig(self.summary_figure, bbox_inches='tight')
+            pdf.savefig(self.hourly_figure)
+            pdf.savefig(self.monthly_figure, bbox_inches='tight')
+            pdf.savefig(self.battery_figure, bbox_inches='tight')
+        return pdf_filename
+
+    def show(self):
+        """Display the plot pages in a Jupyter notebook, like the single runs did with pyplot.
+
+        Does nothing outside a notebook kernel, e.g. in scripts and worker processes.
+        """
+        try:
+            from IPython import get_ipython
+            from IPython.display import Image, display
+        except ImportError:
+            return
+        if getattr(get_ipython(), 'kernel', None) is None:
+            return
+        for fig in (self.hourly_figure, self.monthly_figure, self.battery_figure):
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', bbox_inches='tight')
+            display(Image(data=buffer.getvalue()))
+
+    def render(self, aggregates, pdf_filename=None, summary=None):
+        """Update the pages for one scenario and save them, by default under ``report_filename``"""
+        if pdf_filename is None:
+            pdf_filename = report_filename(aggregates.parameters)
+        self.update(aggregates, summary)
+        return self.save(pdf_filename)
+
+
+def _rescale(ax):
+    ax.relim()
+    ax.autoscale_view()
+
+
+def _set_bar_heights(ax, containers, heights):
+    for container, values in zip(containers, heights):
+        for bar, value in zip(container, values):
+            bar.set_height(value)
+    _rescale(ax)
+
+
+def report_filename(parameters):
+    """Deterministic PDF name for one parameter set.
+
+    All parameters are part of the name, in the German number format of the
+    existing reports: battery capacity, installed power per side, consumption
+    per flat, battery power, then discharge cutoff and charge efficiency in
+    percent, e.g. ``PV_Batterie_Simulation_20kWh_OSO10kWp_WNW10kWp_3200kWh-Whg_4,2kW_10-95.pdf``.
+    """
+    params = _resolve_parameters(parameters)
+
+    def number(value):
+        # 12 significant digits keep nearby values apart, but drop the float noise of e.g. 0.1 * 100
+        return f"{value:.12g}".replace('.', ',')
+
+    return (
+        f"PV_Batterie_Simulation_{number(params['battery_capacity_kWh'])}kWh"
+        f"_OSO{number(params['installed_power_oso_kWp'])}kWp"
+        f"_WNW{number(params['installed_power_wnw_kWp'])}kWp"
+        f"_{number(params['consumption_per_flat_per_year_kWh'])}kWh-Whg"
+        f"_{number(params['battery_max_power_kW'])}kW"
+        f"_{number(params['battery_discharge_cutoff_limit'] * 100)}"
+        f"-{number(params['battery_charge_efficiency'] * 100)}.pdf"
+    )
+
+
+def generate_pdf_report(aggregates, pdf_filename=None, show=False):
+    """Generate complete PDF report with all plots and data; ``show`` also displays the plots in a notebook"""
+    layout = ReportLayout()
+    pdf_filename = layout.render(aggregates, pdf_filename)
+    if show:
+        layout.show()
     return pdf_filename
 
 
+def _annual_stats_frame(years, sums):
+    """Annual stats table from per-year sums (dict of arrays keyed by STATS_COLUMNS)"""
+    annual_stats = pd.DataFrame({'year': years})
+    for name in STATS_COLUMNS:
+        annual_stats[name] = sums[name]
+    annual_stats['pv_used_kWh'] = annual_stats['consumption_kW'] - annual_stats['from_grid_kW']
+    annual_stats['pv_self_consumption_rate'] = annual_stats['pv_used_kWh'] / annual_stats['PV_total_kW'] * 100
+    annual_stats['grid_independence_rate'] = (1 - annual_stats['from_grid_kW'] / annual_stats['consumption_kW']) * 100
+    return annual_stats
+
+
+def _energy_per_step(params, step_hours):
+    """Installed PV power and battery power scaled from kW to kWh per time step.
+
+    The per-step series then hold energy in kWh; for hourly data the factor is
+    exactly 1 and the values equal the power in kW.
+    """
+    return (params['installed_power_oso_kWp'] * step_hours, params['installed_power_wnw_kWp'] * step_hours,
+            params['battery_max_power_kW'] * step_hours)
+
+
+def _resolve_parameters(parameters):
+    """Fill in defaults for a single parameter set and reject unknown names"""
+    unknown = set(parameters) - set(SIMULATION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown simulation parameters: {sorted(unknown)}")
+    return {**SIMULATION_DEFAULTS, **parameters}
+
+
+@dataclass(frozen=True, eq=False)
+class SimulationResult:
+    """Hourly outputs of one simulation run on a SimulationDataset.
+
+    Kept separate from the dataset, so any number of runs can share one dataset.
+    """
+    dataset: SimulationDataset
+    parameters: dict
+    PV_total_kW: np.ndarray
+    consumption_kW: np.ndarray
+    battery_soc_kWh: np.ndarray
+    from_grid_kW: np.ndarray
+    battery_charge_kWh: np.ndarray
+    battery_discharge_kWh: np.ndarray
+
+    def annual_stats(self):
+        """Per-year energy sums and rates as a DataFrame, one row per weather year"""
+        sums = {name: np.add.reduceat(getattr(self, name), self.dataset.year_starts) for name in STATS_COLUMNS}
+        return _annual_stats_frame(self.dataset.years, sums)
+
+    def summary(self):
+        """The four headline metrics, averaged over the weather years"""
+        annual_stats = self.annual_stats()
+        return {
+            'avg_pv_used': annual_stats['pv_used_kWh'].mean(),
+            'avg_consumption': annual_stats['consumption_kW'].mean(),
+            'avg_grid_independence': annual_stats['grid_independence_rate'].mean(),
+            'avg_self_consumption_rate': annual_stats['pv_self_consumption_rate'].mean(),
+        }
+
+    def energy_costs(self, tariff):
+        """Grid import cost minus feed-in revenue per weather year, in EUR"""
+        costs = tariff.energy_cost(self.PV_total_kW, self.consumption_kW, self.from_grid_kW,
+                                   self.battery_charge_kWh, self.battery_discharge_kWh,
+                                   self.parameters['battery_charge_efficiency'])
+        return np.add.reduceat(costs, self.dataset.year_starts)
+
+    def to_frame(self):
+        """Dataset and output columns as one DataFrame indexed by time, as used by the plots"""
+        frame = self.dataset.to_frame()
+        for name in ('consumption_kW', 'PV_total_kW', 'battery_soc_kWh', 'from_grid_kW',
+                     'battery_charge_kWh', 'battery_discharge_kWh'):
+            frame[name] = getattr(self, name)
+        return frame
+
+
+def simulate(dataset=None, use_jit=True, strategy='greedy', tariff=None, **parameters):
+    """Run the PV battery simulation for one parameter set and return a ``SimulationResult``.
+
+    ``dataset`` defaults to ``dataset.default_dataset()`` and is not modified.
+    ``strategy='optimal'`` replaces the greedy rule by the cost-optimal dispatch
+    for ``tariff`` (default ``Tariff()``), see ``optimal_dispatch.optimal_dispatch``.
+    """
+    if strategy not in DISPATCH_STRATEGIES:
+        raise ValueError(f"strategy must be one of {DISPATCH_STRATEGIES}, got {strategy!r}")
+    if dataset is None:
+        dataset = default_dataset()
+    params = _resolve_parameters(parameters)
+
+    power_oso, power_wnw, max_power = _energy_per_step(params, dataset.step_hours)
+
+    # Scale consumption
+    # Computed in float64 like the PV output, also for float32 datasets
+    consumption_kW = np.asarray(dataset.consumption_smoothed, dtype=np.float64) \
+        * params['consumption_per_flat_per_year_kWh']
+    PV_total_kW = power_oso*np.asarray(dataset.P_oso, dtype=np.float64)*1e-3 \
+        + power_wnw*np.asarray(dataset.P_wnw, dtype=np.float64)*1e-3
+
+    # Battery simulation with power limit
+    battery = (params['battery_capacity_kWh'], params['battery_discharge_cutoff_limit'],
+               params['battery_charge_efficiency'], max_power)
+    if strategy == 'greedy':
+        battery_soc, from_grid, battery_charge, battery_discharge = greedy_dispatch(
+            PV_total_kW, consumption_kW, *battery, use_jit=use_jit)
+    else:
+        steps_per_hour = round(1 / dataset.step_hours)
+        import_price, export_price = (tariff or Tariff()).prices(len(dataset))
+        battery_soc, from_grid, battery_charge, battery_discharge = optimal_dispatch(
+            PV_total_kW, consumption_kW, import_price, export_price, *battery,
+            horizon=48 * steps_per_hour, commit=24 * steps_per_hour, use_jit=use_jit)
+
+    return SimulationResult(dataset, params, PV_total_kW, consumption_kW,
+                            battery_soc, from_grid, battery_charge, battery_discharge)
+
+
+@dataclass(frozen=True)
+class SimulationStats:
+    """Headline metrics and per-year sums of one run, without per-hour outputs"""
+    parameters: dict
+    years: np.ndarray
+    annual_sums: np.ndarray
+    avg_pv_used: float
+    avg_consumption: float
+    avg_grid_independence: float
+    avg_self_consumption_rate: float
+
+    @classmethod
+    def from_annual_sums(cls, parameters, years, annual_sums):
+        """Derive the metrics from a ``(n_years, 5)`` array ordered like STATS_COLUMNS"""
+        metrics = annual_metrics(annual_sums[:, 0], annual_sums[:, 1], annual_sums[:, 2])
+        return cls(parameters, years, annual_sums, **{name: float(value) for name, value in metrics.items()})
+
+    def annual_stats(self):
+        """Per-year energy sums and rates as a DataFrame, one row per weather year"""
+        return _annual_stats_frame(self.years, dict(zip(STATS_COLUMNS, self.annual_sums.T)))
+
+    def summary(self):
+        """The four headline metrics as a dict"""
+        return {
+            'avg_pv_used': self.avg_pv_used,
+            'avg_consumption': self.avg_consumption,
+            'avg_grid_independence': self.avg_grid_independence,
+            'avg_self_consumption_rate': self.avg_self_consumption_rate,
+        }
+
+
+def simulate_stats(dataset=None, use_jit=True, strategy='greedy', tariff=None, **parameters):
+    """Run the simulation in stats-only mode and return ``SimulationStats``, for sweeps and optimisers.
+
+    The greedy kernel only accumulates per-year sums, so no per-step output is
+    allocated; ``strategy='optimal'`` needs the per-step series and runs ``simulate``.
+    """
+    if dataset is None:
+        dataset = default_dataset()
+    if strategy != 'greedy':
+        result = simulate(dataset, use_jit=use_jit, strategy=strategy, tariff=tariff, **parameters)
+        annual_sums = np.stack([np.add.reduceat(getattr(result, name), dataset.year_starts)
+                                for name in STATS_COLUMNS], axis=1)
+        return SimulationStats.from_annual_sums(result.parameters, dataset.years, annual_sums)
+    params = _resolve_parameters(parameters)
+
+    power_oso, power_wnw, max_power = _energy_per_step(params, dataset.step_hours)
+    annual_sums = greedy_dispatch_stats(
+        dataset.P_oso, dataset.P_wnw, dataset.consumption_smoothed, dataset.year_starts,
+        power_oso, power_wnw, params['consumption_per_flat_per_year_kWh'],
+        params['battery_capacity_kWh'], params['battery_discharge_cutoff_limit'],
+        params['battery_charge_efficiency'], max_power,
+        use_jit=use_jit
+    )
+    return SimulationStats.from_annual_sums(params, dataset.years, annual_sums)
+
+
+def compare_strategies(dataset=None, tariff=None, use_jit=True, **parameters):
+    """Headline metrics and ``avg_energy_cost`` (EUR per year under ``tariff``) of both strategies, one row each"""
+    if dataset is None:
+        dataset = default_dataset()
+    if tariff is None:
+        tariff = Tariff()
+    rows = {}
+    for strategy in DISPATCH_STRATEGIES:
+        result = simulate(dataset, use_jit=use_jit, strategy=strategy, tariff=tariff, **parameters)
+        rows[strategy] = {**result.summary(), 'avg_energy_cost': result.energy_costs(tariff).mean()}
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('strategy')
+
+
+class ConsoleReport(StageObserver):
+    """Prints parameters and results of each run, the default output of run_pv_battery_simulation"""
+
+    def on_run_end(self, record):
+        params = record['parameters']
+        results = record['results']
+
+        # Print input parameters
+        print("=" * 60)
+        print("EINGABEPARAMETER:")
+        print("=" * 60)
+        print(f"Verbrauch pro Wohnung pro Jahr: {params['consumption_per_flat_per_year_kWh']:.0f} kWh")
+        print(f"Installierte Leistung OSO: {params['installed_power_oso_kWp']:.1f} kWp")
+        print(f"Installierte Leistung WNW: {params['installed_power_wnw_kWp']:.1f} kWp")
+        print(f"Batteriekapazität: {params['battery_capacity_kWh']:.1f} kWh")
+        print(f"Batterie-Entladegrenze: {params['battery_discharge_cutoff_limit'] * 100:.0f}%")
+        print(f"Batterie-Ladewirkungsgrad: {params['battery_charge_efficiency'] * 100:.0f}%")
+        print(f"Maximale Batterieleistung: {params['battery_max_power_kW']:.1f} kW")
+        print("=" * 60)
+        print()
+
+        print("SIMULATIONSERGEBNISSE:")
+        print("-" * 60)
+        print(f"Durchschnittliche jährliche genutzte PV-Energie: {results['avg_pv_used']:.2f} kWh")
+        print(f"Verbrauch: {results['avg_consumption']:.2f} kWh")
+        print(f"Durchschnittliche Netzunabhängigkeitsrate: {results['avg_grid_independence']:.1f}%")
+        print(f"Durchschnittliche PV-Eigenverbrauchsrate: {results['avg_self_consumption_rate']:.1f}%")
+        print()
+
+        if record.get('pdf_filename'):
+            print(f"PDF-Bericht erfolgreich erstellt: {record['pdf_filename']}")
+
+
 def run_pv_battery_simulation(
     consumption_per_flat_per_year_kWh=3200,
     installed_power_oso_kWp=10,
@@ -304,166 +548,138 @@ def run_pv_battery_simulation(
     battery_discharge_cutoff_limit=0.1,
     battery_charge_efficiency=0.95,
     battery_max_power_kW=4.2,
-    enable_plots=True
+    enable_plots=True,
+    dataset=None,
+    observers=None,
+    cache=None,
+    strategy='greedy',
+    tariff=None
 ):
-    global df
-
-    if df is None:
-
-        # Load PV data
-        path_oso = "data/Timeseries_48.865_9.314_SA3_1kWp_crystSi_14_42deg_-75deg_2005_2023.json"
-        path_wnw = "data/Timeseries_48.865_9.314_SA3_1kWp_crystSi_14_48deg_105deg_2005_2023.json"
-        with open(path_oso, "r") as file:
-            data_oso = json.load(file)
-        with open(path_wnw, "r") as file:
-            data_wnw = json.load(file)
-
-        df_raw_oso = pd.DataFrame(data_oso['outputs']['hourly'])
-        df_raw_oso["time"] = pd.to_datetime(
-            df_raw_oso.time.str.slice(0,4)+"-"+df_raw_oso.time.str.slice(4,6)+"-"+df_raw_oso.time.str.slice(6,8)+" "+
-            df_raw_oso.time.str.slice(9,11)+":"+df_raw_oso.time.str.slice(11,13), utc=True)
-        df_pv_oso = df_raw_oso.set_index("time")
-        df_pv_oso = df_pv_oso.tz_convert("Europe/Berlin")
-
-        df_raw_wnw = pd.DataFrame(data_wnw['outputs']['hourly'])
-        df_raw_wnw["time"] = pd.to_datetime(
-            df_raw_wnw.time.str.slice(0,4)+"-"+df_raw_wnw.time.str.slice(4,6)+"-"+df_raw_wnw.time.str.slice(6,8)+" "+
-            df_raw_wnw.time.str.slice(9,11)+":"+df_raw_wnw.time.str.slice(11,13), utc=True)
-        df_pv_wnw = df_raw_wnw.set_index("time")
-        df_pv_wnw = df_pv_wnw.tz_convert("Europe/Berlin")
-
-        # Load consumption data
-        df_raw = pd.read_csv('data/household_data_15min_singleindex_filtered.csv')
-        df_full = df_raw[['cet_cest_timestamp', 'DE_KN_residential2_grid_import']].copy()
-        df_full['cet_cest_timestamp'] = pd.to_datetime(df_full['cet_cest_timestamp'], utc=True)
-        df_full.set_index('cet_cest_timestamp', inplace=True)
-        df_cons = df_full['DE_KN_residential2_grid_import'].diff().resample('h').sum()
-        df_filtered = df_cons[(df_cons.index >= pd.to_datetime("2016-01-01", utc=True)) & (df_cons.index <= pd.to_datetime("2016-12-31 23:59:59", utc=True))]
-        consumption_year_total = df_filtered.sum()
-        df_consumption = pd.DataFrame(df_filtered)
-        df_consumption.index = pd.to_datetime(df_consumption.index)
-        df_consumption.index.name = "time"
-        df_consumption.rename(columns={"DE_KN_residential2_grid_import": "consumption_kW_normed"}, inplace=True)
-        df_consumption["consumption_kW_normed"] /= consumption_year_total
-        df_consumption["month"] = df_consumption.index.month
-        df_consumption["day"] = df_consumption.index.day
-        df_consumption["hour"] = df_consumption.index.hour
-
-        # Merge PV and consumption data
-        df = pd.merge(df_pv_oso["P"], df_pv_wnw["P"], on="time", suffixes=('_oso', '_wnw'))
-        df["year"] = df.index.year
-        df["month"] = df.index.month
-        df["day"] = df.index.day
-        df["hour"] = df.index.hour
-
-        dfs = []
-        for year in range(2005, 2024):
-            df_merged = pd.merge(df[df.year==year], df_consumption, on=["month", "day", "hour"], how="inner")
-            df_merged["year"] = year
-            dfs.append(df_merged)
-        df = pd.concat(dfs)
-        df["time"] = pd.to_datetime(df[["year", "month", "day", "hour"]])
-        df.set_index("time", inplace=True)
-
-    # Scale consumption
-    df["consumption_kW"] = \
-        df["consumption_kW_normed"] + np.roll(df["consumption_kW_normed"], 1) + np.roll(df["consumption_kW_normed"], 2) \
-        + np.roll(df["consumption_kW_normed"], 7) + np.roll(df["consumption_kW_normed"], -6)
-    
-    df["consumption_kW"] *= consumption_per_flat_per_year_kWh
-    df["PV_total_kW"] = installed_power_oso_kWp*df["P_oso"]*1e-3 + installed_power_wnw_kWp*df["P_wnw"]*1e-3
-
-    # Battery simulation with power limit
-    soc = battery_capacity_kWh/2
-    soc_list = []
-    grid_list = []
-    battery_charge_list = []
-    battery_discharge_list = []
-
-    for idx, row in df.iterrows():
-        pv_surplus = row["PV_total_kW"] - row["consumption_kW"]
-        if pv_surplus > 0:
-            # Charging: limited by efficiency, capacity, and max power
-            charge_possible = min(
-                pv_surplus * battery_charge_efficiency, 
-                battery_capacity_kWh - soc,
-                battery_max_power_kW  # Power limit
-            )
-            soc += charge_possible
-            grid = 0
-            battery_charge = charge_possible
-            battery_discharge = 0
-        else:
-            # Discharging: limited by available energy, cutoff limit, and max power
-            discharge_possible = min(
-                -pv_surplus, 
-                soc - battery_capacity_kWh * battery_discharge_cutoff_limit,
-                battery_max_power_kW  # Power limit
-            )
-            soc -= discharge_possible
-            grid = -pv_surplus - discharge_possible if discharge_possible < -pv_surplus else 0
-            battery_charge = 0
-            battery_discharge = discharge_possible
-        
-        soc_list.append(soc)
-        grid_list.append(grid)
-        battery_charge_list.append(battery_charge)
-        battery_discharge_list.append(battery_discharge)
-
-    df["battery_soc_kWh"] = soc_list
-    df["from_grid_kW"] = grid_list
-    df["battery_charge_kWh"] = battery_charge_list
-    df["battery_discharge_kWh"] = battery_discharge_list
-
-    # Annual stats
-    annual_stats = df.copy().groupby('year').agg({
-        'PV_total_kW': 'sum',
-        'consumption_kW': 'sum',
-        'from_grid_kW': 'sum',
-        'battery_charge_kWh': 'sum',
-        'battery_discharge_kWh': 'sum'
-    }).reset_index()
-    annual_stats['pv_used_kWh'] = annual_stats['consumption_kW'] - annual_stats['from_grid_kW']
-    annual_stats['pv_self_consumption_rate'] = annual_stats['pv_used_kWh'] / annual_stats['PV_total_kW'] * 100
-    annual_stats['grid_independence_rate'] = (1 - annual_stats['from_grid_kW'] / annual_stats['consumption_kW']) * 100
-
-    avg_pv_used = annual_stats['pv_used_kWh'].mean()
-    avg_self_consumption_rate = annual_stats['pv_self_consumption_rate'].mean()
-    avg_grid_independence = annual_stats['grid_independence_rate'].mean()
-    avg_consumption = annual_stats['consumption_kW'].mean()
-
+    """Simulate one configuration; with ``enable_plots`` also write the PDF report.
+
+    In a Jupyter notebook the report plots are displayed inline as well.
+
+    ``observers`` is a list of ``instrumentation.StageObserver`` that receive
+    the stages ``load``, ``smoothing``, ``dispatch``, ``aggregation`` and
+    ``report`` and a metrics record per run, e.g. a ``StageTimer`` or a
+    ``JsonLinesRecorder``. By default the parameters and results are printed
+    (``ConsoleReport``) when ``enable_plots`` is set; pass ``observers=[]`` to
+    silence it. Without observers the instrumentation costs nothing measurable.
+
+    With a ``result_cache.ResultCache`` as ``cache``, runs without plots reuse
+    the stats of earlier runs with the same parameters and dataset.
+
+    ``strategy='optimal'`` replaces the greedy dispatch by the cost-optimal
+    dispatch for ``tariff``, see ``simulate``; such runs are not cached.
+
+    Returns the average yearly PV energy used when ``enable_plots`` is False.
+    """
+    parameters = dict(
+        consumption_per_flat_per_year_kWh=consumption_per_flat_per_year_kWh,
+        installed_power_oso_kWp=installed_power_oso_kWp,
+        installed_power_wnw_kWp=installed_power_wnw_kWp,
+        battery_capacity_kWh=battery_capacity_kWh,
+        battery_discharge_cutoff_limit=battery_discharge_cutoff_limit,
+        battery_charge_efficiency=battery_charge_efficiency,
+        battery_max_power_kW=battery_max_power_kW,
+    )
+    if observers is None:
+        observers = [ConsoleReport()] if enable_plots else []
+    instrumented = instrumentation(observers)
+    instrumented.run_start(parameters)
+
+    with instrumented.stage('load'):
+        if dataset is None:
+            dataset = default_dataset()
+    with instrumented.stage('smoothing'):
+        dataset.consumption_smoothed
+
+    pdf_filename = None
+    if not enable_plots:
+        # Only the result number is needed, skip all per-hour outputs
+        with instrumented.stage('dispatch'):
+            if cache is None or strategy != 'greedy':
+                stats = simulate_stats(dataset, strategy=strategy, tariff=tariff, **parameters)
+            else:
+                stats = cache.simulate_stats(dataset, **parameters)
+        if not instrumented.observers:
+            return stats.avg_pv_used
+        with instrumented.stage('aggregation'):
+            summary = stats.summary()
+    else:
+        with instrumented.stage('dispatch'):
+            result = simulate(dataset, strategy=strategy, tariff=tariff, **parameters)
+        # One aggregation pass feeds the summary and all report plots
+        with instrumented.stage('aggregation'):
+            aggregates = ReportAggregates.from_result(result)
+            summary = aggregates.summary()
+        with instrumented.stage('report'):
+            pdf_filename = generate_pdf_report(aggregates, show=True)
+
+    instrumented.run_end({'parameters': parameters, 'strategy': strategy, 'results': summary,
+                          'pdf_filename': pdf_filename})
     if not enable_plots:
-        return avg_pv_used
-    
-    # Print input parameters
-    print("=" * 60)
-    print("EINGABEPARAMETER:")
-    print("=" * 60)
-    print(f"Verbrauch pro Wohnung pro Jahr: {consumption_per_flat_per_year_kWh:.0f} kWh")
-    print(f"Installierte Leistung OSO: {installed_power_oso_kWp:.1f} kWp")
-    print(f"Installierte Leistung WNW: {installed_power_wnw_kWp:.1f} kWp")
-    print(f"Batteriekapazität: {battery_capacity_kWh:.1f} kWh")
-    print(f"Batterie-Entladegrenze: {battery_discharge_cutoff_limit * 100:.0f}%")
-    print(f"Batterie-Ladewirkungsgrad: {battery_charge_efficiency * 100:.0f}%")
-    print(f"Maximale Batterieleistung: {battery_max_power_kW:.1f} kW")
-    print("=" * 60)
-    print()
-    
-    print("SIMULATIONSERGEBNISSE:")
-    print("-" * 60)
-    print(f"Durchschnittliche jährliche genutzte PV-Energie: {avg_pv_used:.2f} kWh")
-    print(f"Verbrauch: {avg_consumption:.2f} kWh")
-    print(f"Durchschnittliche Netzunabhängigkeitsrate: {avg_grid_independence:.1f}%")
-    print(f"Durchschnittliche PV-Eigenverbrauchsrate: {avg_self_consumption_rate:.1f}%")
-    print()
-    
-    # Generate PDF report
-    pdf_filename = generate_pdf_report(
-        df, consumption_per_flat_per_year_kWh, installed_power_oso_kWp, 
-        installed_power_wnw_kWp, battery_capacity_kWh, 
-        battery_discharge_cutoff_limit, battery_charge_efficiency, 
-        battery_max_power_kW, avg_pv_used, avg_consumption, 
-        avg_grid_independence, avg_self_consumption_rate
+        return summary['avg_pv_used']
+
+
+def simulate_batch(params_table, dataset=None, use_jit=True, cache=None):
+    """Simulate many parameter sets in one kernel call that keeps only per-year sums.
+
+    ``params_table`` has one row per scenario, columns named like the arguments of
+    ``run_pv_battery_simulation`` (missing ones use ``SIMULATION_DEFAULTS``). Returns
+    the table plus the four headline metrics; with a ``result_cache.ResultCache``
+    only the scenarios missing from it are simulated.
+    """
+    if dataset is None:
+        dataset = default_dataset()
+    params = _normalize_params(params_table)
+    if cache is not None:
+        return params.assign(**_simulate_batch_cached(params, dataset, cache, use_jit))
+    sums = _simulate_batch_arrays(dataset.P_oso, dataset.P_wnw, dataset.consumption_smoothed,
+                                  dataset.year_starts, params, step_hours=dataset.step_hours, use_jit=use_jit)
+    metrics = annual_metrics(sums['PV_total_kW'], sums['consumption_kW'], sums['from_grid_kW'])
+    return params.assign(**metrics)
+
+
+def _simulate_batch_cached(params, dataset, cache, use_jit):
+    """Per-scenario metrics columns, simulating only the scenarios missing from ``cache``"""
+    records = params.to_dict('records')
+    results = [cache.get(dataset, record) for record in records]
+    missing = [i for i, stats in enumerate(results) if stats is None]
+    if missing:
+        sums = _simulate_batch_arrays(dataset.P_oso, dataset.P_wnw, dataset.consumption_smoothed,
+                                      dataset.year_starts, params.iloc[missing],
+                                      step_hours=dataset.step_hours, use_jit=use_jit)
+        annual_sums = np.stack([sums[name] for name in STATS_COLUMNS], axis=-1)
+        computed = [SimulationStats.from_annual_sums(records[i], dataset.years, annual_sums[:, k])
+                    for k, i in enumerate(missing)]
+        cache.put_many(dataset, computed)
+        for i, stats in zip(missing, computed):
+            results[i] = stats
+    return pd.DataFrame([stats.summary() for stats in results], index=params.index).to_dict('series')
+
+
+def _normalize_params(params_table):
+    """Return the scenario table with all parameter columns, gaps filled with the defaults"""
+    params = pd.DataFrame(params_table).reset_index(drop=True)
+    unknown = set(params.columns) - set(SIMULATION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown simulation parameters: {sorted(unknown)}")
+    for name, default in SIMULATION_DEFAULTS.items():
+        params[name] = params[name].fillna(default) if name in params.columns else default
+    return params[list(SIMULATION_DEFAULTS)]
+
+
+def _simulate_batch_arrays(p_oso, p_wnw, consumption_smoothed, year_starts, params,
+                           step_hours=1.0, use_jit=True):
+    """Per-year sums of all scenarios as a dict of ``(n_years, n_scenarios)`` arrays keyed by ``STATS_COLUMNS``"""
+    columns = {name: params[name].to_numpy(dtype=np.float64) for name in SIMULATION_DEFAULTS}
+    power_oso, power_wnw, max_power = _energy_per_step(columns, step_hours)
+    sums = greedy_dispatch_batch_stats(
+        p_oso, p_wnw, consumption_smoothed, year_starts,
+        power_oso, power_wnw, columns['consumption_per_flat_per_year_kWh'],
+        columns['battery_capacity_kWh'], columns['battery_discharge_cutoff_limit'],
+        columns['battery_charge_efficiency'], max_power,
+        use_jit=use_jit
     )
-    
-    print(f"PDF-Bericht erfolgreich erstellt: {pdf_filename}")
\ No newline at end of file
+    return {name: sums[:, k] for k, name in enumerate(STATS_COLUMNS)}
@@ -0,0 +1,234 @@
+"""Benchmarks of the simulation stages on deterministic synthetic data.
+
+Usage: ``python benchmark.py [--years N] [--repeat N] [--no-pdf] [--update-baseline]``
+
+Writes the synthetic input files (see ``synthetic_data``) into a temporary
+directory, times each stage, and compares the simulation results with
+``benchmark_baseline.json``, so an optimisation cannot change the numbers
+unnoticed. The exit code is 1 if the results differ from the baseline.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import battery_simulation
+import data_cache
+import dataset
+from aggregates import ReportAggregates
+from synthetic_data import write_synthetic_data
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+FIRST_YEAR = 2005
+
+# Relative tolerance of the baseline comparison; summation order may change, the results may not
+RESULT_RTOL = 1e-9
+
+# The 2 x 8 x 6 grid of the battery size comparison in compact_analysis.ipynb
+NOTEBOOK_SWEEP = [
+    dict(consumption_per_flat_per_year_kWh=consumption,
+         installed_power_oso_kWp=oso, installed_power_wnw_kWp=wnw,
+         battery_capacity_kWh=battery, battery_discharge_cutoff_limit=0.1,
+         battery_charge_efficiency=0.9, battery_max_power_kW=4.5)
+    for consumption in [3200, 4500]
+    for oso, wnw in [(5, 2), (7, 3), (8, 4), (9, 5), (10, 5), (11, 6), (14, 7), (18, 9)]
+    for battery in [0, 6.5, 9.75, 13, 16.25, 19.5]
+]
+
+
+def measure(function, repeat=3, setup=None, warmup=False):
+    """Best wall time of ``repeat`` calls and peak traced memory of one more call.
+
+    The memory is measured in a separate call, as tracemalloc slows down
+    allocations. It covers Python objects and NumPy arrays, not memory-mapped files.
+    Returns ``(seconds, peak_bytes, result)``, the result being that of the last call.
+    """
+    if warmup:
+        function()  # e.g. numba compilation
+    seconds = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak_bytes, result
+
+
+def run_benchmarks(years=19, repeat=3, include_pdf=True, work_dir=None):
+    """Time all stages on synthetic data of ``years`` weather years.
+
+    Returns a dict of ``data`` (how the input was generated), ``stages``
+    (seconds, peak memory and throughput per stage) and ``results`` (numbers
+    checked against the baseline).
+    """
+    cleanup = work_dir is None
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="battery-benchmark-")
+    data = {'first_year': FIRST_YEAR, 'last_year': FIRST_YEAR + years - 1, 'seed': 0}
+    write_synthetic_data(work_dir, data['first_year'], data['last_year'], seed=data['seed'])
+
+    stages = {}
+    results = {}
+    cwd = os.getcwd()
+    os.chdir(work_dir)  # the dataset paths are relative to the working directory
+    try:
+        def record(name, seconds, peak_bytes, **throughput):
+            stages[name] = {'seconds': seconds, 'peak_MB': peak_bytes / 2**20, **throughput}
+
+        seconds, peak, _ = measure(dataset.SimulationDataset.from_files, repeat,
+                                   setup=lambda: data_cache.clear_cache(dataset.CACHE_DIR))
+        record('cold_load', seconds, peak)
+
+        seconds, peak, inputs = measure(dataset.SimulationDataset.from_files, repeat)
+        record('cached_load', seconds, peak)
+        n_hours = len(inputs)
+        data['hours'] = n_hours
+
+        seconds, peak, avg_pv_used = measure(
+            lambda: battery_simulation.run_pv_battery_simulation(enable_plots=False, dataset=inputs),
+            repeat, warmup=True)
+        record('single_run', seconds, peak, hours_per_s=n_hours / seconds)
+        results['single_run'] = float(avg_pv_used)
+
+        def notebook_sweep():
+            return [battery_simulation.run_pv_battery_simulation(**params, enable_plots=False, dataset=inputs)
+                    for params in NOTEBOOK_SWEEP]
+
+        seconds, peak, values = measure(notebook_sweep, repeat, warmup=True)
+        n_scenarios = len(NOTEBOOK_SWEEP)
+        record('sweep_96', seconds, peak, scenarios_per_s=n_scenarios / seconds,
+               hours_per_s=n_scenarios * n_hours / seconds)
+        results['sweep_96'] = [float(value) for value in values]
+
+        seconds, peak, table = measure(
+            lambda: battery_simulation.simulate_batch(NOTEBOOK_SWEEP, dataset=inputs), repeat, warmup=True)
+        record('sweep_96_batch', seconds, peak, scenarios_per_s=n_scenarios / seconds,
+               hours_per_s=n_scenarios * n_hours / seconds)
+        results['sweep_96_batch'] = table['avg_pv_used'].astype(float).tolist()
+
+        # Same sweep on the 15-minute float32 dataset, four times as many steps
+        inputs_15min = dataset.SimulationDataset.from_files(resolution="15min", dtype=np.float32)
+
+        def notebook_sweep_15min():
+            return [battery_simulation.simulate_stats(inputs_15min, **params).avg_pv_used
+                    for params in NOTEBOOK_SWEEP]
+
+        seconds, peak, values = measure(notebook_sweep_15min, repeat, warmup=True)
+        record('sweep_96_15min', seconds, peak, scenarios_per_s=n_scenarios / seconds,
+               hours_per_s=n_scenarios * n_hours / seconds)
+        results['sweep_96_15min'] = [float(value) for value in values]
+
+        if include_pdf:
+            def report():
+                aggregates = ReportAggregates.from_result(battery_simulation.simulate(inputs))
+                battery_simulation.generate_pdf_report(aggregates, os.path.join(work_dir, "report.pdf"))
+                return aggregates.summary()
+
+            seconds, peak, summary = measure(report, repeat, warmup=True)
+            record('pdf_report', seconds, peak)
+            results['pdf_report'] = {name: float(value) for name, value in summary.items()}
+    finally:
+        os.chdir(cwd)
+        if cleanup:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {'data': data, 'stages': stages, 'results': results}
+
+
+def compare_results(results, baseline):
+    """List of differences between two ``results`` dicts, empty if all match"""
+    differences = []
+    for name, expected in baseline.items():
+        if name not in results:
+            continue  # stage skipped in this run
+        actual = results[name]
+        if isinstance(expected, dict):
+            expected, actual = list(expected.values()), [actual[key] for key in expected]
+        expected, actual = np.atleast_1d(expected), np.atleast_1d(actual)
+        if expected.shape != actual.shape or not np.allclose(actual, expected, rtol=RESULT_RTOL, atol=0,
+                                                              equal_nan=True):
+            deviation = np.max(np.abs(actual - expected)) if expected.shape == actual.shape else "shape"
+            differences.append(f"{name}: max. deviation {deviation}")
+    return differences
+
+
+def format_report(benchmark, baseline=None):
+    """Human-readable table of the stage timings, with the speedup over the baseline timings"""
+    baseline_stages = (baseline or {}).get('stages', {})
+    data = benchmark['data']
+    lines = [f"Synthetic data {data['first_year']}-{data['last_year']}, {data['hours']} hours",
+             f"{'stage':<16}{'seconds':>10}{'peak MB':>10}{'hours/s':>14}{'scen./s':>10}{'speedup':>10}"]
+    for name, stage in benchmark['stages'].items():
+        reference = baseline_stages.get(name)
+        speedup = f"{reference['seconds'] / stage['seconds']:.2f}x" if reference else ""
+        hours = f"{stage['hours_per_s']:.3g}" if 'hours_per_s' in stage else ""
+        scenarios = f"{stage['scenarios_per_s']:.3g}" if 'scenarios_per_s' in stage else ""
+        lines.append(f"{name:<16}{stage['seconds']:>10.4f}{stage['peak_MB']:>10.1f}{hours:>14}"
+                     f"{scenarios:>10}{speedup:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PV battery simulation on synthetic data")
+    parser.add_argument("--years", type=int, default=19, help="number of weather years (default: 19)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per stage, the best counts")
+    parser.add_argument("--no-pdf", action="store_true", help="skip the PDF report stage")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline instead of comparing")
+    parser.add_argument("--output", help="also write the benchmark as JSON to this file")
+    args = parser.parse_args(argv)
+
+    benchmark = run_benchmarks(args.years, args.repeat, include_pdf=not args.no_pdf)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['data'] != {key: benchmark['data'][key] for key in baseline['data']}:
+            print("Baseline was recorded on different synthetic data, results not checked")
+            baseline = None
+    print(format_report(benchmark, baseline))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(benchmark, file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(benchmark, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if baseline is None:
+        if not os.path.exists(args.baseline):
+            print("No baseline found, results not checked")
+        return 0
+
+    differences = compare_results(benchmark['results'], baseline['results'])
+    if differences:
+        print("Results differ from the baseline:")
+        print("\n".join(f"  {difference}" for difference in differences))
+        return 1
+    print("Results match the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
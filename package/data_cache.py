@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump when the layout or meaning of the cached arrays changes
+CACHE_FORMAT_VERSION = 1
+
+_DIGEST_INDEX = "digests.json"
+
+
+def file_digest(path, cache_dir=None):
+    """SHA-256 of a file's content.
+
+    With ``cache_dir`` the digest is remembered together with the file's size and
+    modification time, so unchanged files are not read again on the next start.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    index = _read_digest_index(cache_dir) if cache_dir else {}
+    entry = index.get(path)
+    if entry is not None and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return entry[2]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    if cache_dir:
+        index[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        _write_json_atomic(os.path.join(cache_dir, _DIGEST_INDEX), index)
+    return digest
+
+
+def cache_key(paths, options, cache_dir=None):
+    """Key of a cache entry: content of all source files plus the preprocessing options"""
+    sha = hashlib.sha256()
+    sha.update(f"v{CACHE_FORMAT_VERSION}".encode())
+    for path in paths:
+        sha.update(file_digest(path, cache_dir).encode())
+    sha.update(json.dumps(options, sort_keys=True).encode())
+    return sha.hexdigest()[:32]
+
+
+def load_or_build(paths, options, build, cache_dir, mmap_mode="r"):
+    """Return the arrays built from ``paths``, using the on-disk cache when possible.
+
+    Each entry is a directory of ``.npy`` files named after the arrays, so they
+    can be memory-mapped instead of read. If no entry for the current content
+    of ``paths`` and ``options`` exists, ``build()`` is called; it must return a
+    dict of NumPy arrays, which is then stored for the next call. Entries for
+    outdated inputs are removed when the new one is written.
+
+    ``options`` must be JSON-serialisable, and ``mmap_mode`` is passed to
+    ``np.load``; ``None`` reads the arrays into memory.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key(paths, options, cache_dir)
+    entry_dir = os.path.join(cache_dir, key)
+
+    if os.path.isdir(entry_dir):
+        try:
+            with open(os.path.join(entry_dir, "arrays.json")) as file:
+                names = json.load(file)
+            return {name: np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+                    for name in names}
+        except (OSError, ValueError):
+            # Incomplete or corrupted entry, rebuild it below
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    arrays = build()
+
+    # Write into a temporary directory first so concurrent readers never see half an entry
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(values), allow_pickle=False)
+        _write_json_atomic(os.path.join(tmp_dir, "options.json"), options)
+        _write_json_atomic(os.path.join(tmp_dir, "arrays.json"), list(arrays))
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process stored the same entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _remove_stale_entries(cache_dir, key, options)
+    return arrays
+
+
+def clear_cache(cache_dir):
+    """Delete all cache entries and remembered file digests"""
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _remove_stale_entries(cache_dir, key, options):
+    """Drop entries built with the same options from older versions of the source files"""
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if name == key or name.startswith(".") or not os.path.isdir(entry_dir):
+            continue
+        try:
+            with open(os.path.join(entry_dir, "options.json")) as file:
+                stale = json.load(file) == options
+        except (OSError, ValueError):
+            stale = True
+        if stale:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+def _read_digest_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, _DIGEST_INDEX)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,264 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import loader
+
+# Input files, relative to the working directory of the notebook
+DATA_DIR = "data"
+PATH_PV_OSO = os.path.join(DATA_DIR, "Timeseries_48.865_9.314_SA3_1kWp_crystSi_14_42deg_-75deg_2005_2023.json")
+PATH_PV_WNW = os.path.join(DATA_DIR, "Timeseries_48.865_9.314_SA3_1kWp_crystSi_14_48deg_105deg_2005_2023.json")
+PATH_CONSUMPTION = os.path.join(DATA_DIR, "household_data_15min_singleindex_filtered.csv")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+# Time steps per hour of the supported resolutions; the household data is recorded every 15 minutes
+STEPS_PER_HOUR = {'h': 1, '15min': 4}
+
+# Everything besides the input files that determines the merged arrays, part of the cache key
+PREPROCESSING_OPTIONS = {
+    'consumption_column': 'DE_KN_residential2_grid_import',
+    'consumption_year': 2016,
+    'weather_years': [2005, 2023],
+    'timezone': 'Europe/Berlin',
+}
+
+
+@dataclass(frozen=True, eq=False)
+class SimulationDataset:
+    """Read-only input series for the battery simulation, hourly or sub-hourly.
+
+    Holds the PV output of 1 kWp per roof side and the normed household
+    consumption profile, aligned to the weather years. Writeable input arrays
+    are copied and all arrays are marked read-only, so one dataset can be
+    shared by any number of simulations, threads or sites without being
+    modified.
+
+    ``time`` is the local start of each step and ``year`` its weather year,
+    sorted ascending. ``P_oso`` and ``P_wnw`` are the PV output in W of 1 kWp,
+    ``consumption_kW_normed`` the share of the yearly consumption per step.
+    ``step_hours`` is 1 for hourly and 0.25 for 15-minute data; PV and battery
+    power are converted to energy per step with it.
+    """
+    time: np.ndarray
+    year: np.ndarray
+    P_oso: np.ndarray
+    P_wnw: np.ndarray
+    consumption_kW_normed: np.ndarray
+    name: str = ""
+    step_hours: float = 1.0
+
+    def __post_init__(self):
+        n = len(self.time)
+        for field in ('year', 'P_oso', 'P_wnw', 'consumption_kW_normed'):
+            values = np.asarray(getattr(self, field))
+            if values.shape != (n,):
+                raise ValueError(f"{field} must have one entry per time step ({n}), got shape {values.shape}")
+        if not self.step_hours > 0:
+            raise ValueError(f"step_hours must be positive, got {self.step_hours}")
+        for field in ('time', 'year', 'P_oso', 'P_wnw', 'consumption_kW_normed'):
+            # Arrays that can still be written to are copied, so neither a user of the dataset nor the
+            # caller can change them behind the cached consumption_smoothed and fingerprint.
+            # Read-only inputs such as the memory-mapped cache are kept without a copy.
+            values = np.asarray(getattr(self, field))
+            values = values.copy() if _writeable(values) else values.view()
+            values.flags.writeable = False
+            object.__setattr__(self, field, values)
+
+    @classmethod
+    def from_arrays(cls, arrays, dtype=np.float64, name="", step_hours=1.0):
+        """Create a dataset from a dict of arrays as stored in the input cache.
+
+        ``dtype`` applies to the PV and consumption series, e.g. ``np.float32``
+        to halve the memory of large or many datasets.
+        """
+        return cls(
+            time=np.asarray(arrays['time']),
+            year=np.asarray(arrays['year']),
+            P_oso=np.asarray(arrays['P_oso'], dtype=dtype),
+            P_wnw=np.asarray(arrays['P_wnw'], dtype=dtype),
+            consumption_kW_normed=np.asarray(arrays['consumption_kW_normed'], dtype=dtype),
+            name=name,
+            step_hours=step_hours,
+        )
+
+    @classmethod
+    def from_files(cls, use_cache=True, dtype=np.float64, name="", resolution="h"):
+        """Load the PVGIS and household data files.
+
+        The merged arrays are stored in CACHE_DIR, keyed by the content of the
+        input files, so new processes skip parsing and merging the raw data.
+        They are stored in ``dtype`` and memory-mapped, so e.g. a float32 dataset
+        is neither converted nor read into memory as a whole.
+
+        ``resolution="15min"`` keeps the 15-minute household readings and
+        interpolates the hourly PV output to the same steps, see
+        ``loader.interpolate_hourly``.
+        """
+        if resolution not in STEPS_PER_HOUR:
+            raise ValueError(f"resolution must be one of {sorted(STEPS_PER_HOUR)}, got {resolution!r}")
+        dtype = np.dtype(dtype)
+        options = dict(PREPROCESSING_OPTIONS)
+        # Only non-default settings become part of the key, so existing hourly entries stay valid
+        if resolution != "h":
+            options['resolution'] = resolution
+        if dtype != np.float64:
+            options['dtype'] = dtype.name
+
+        def build():
+            return _build_input_arrays(resolution, dtype)
+
+        if use_cache:
+            arrays = data_cache.load_or_build(
+                [PATH_PV_OSO, PATH_PV_WNW, PATH_CONSUMPTION], options, build, CACHE_DIR)
+        else:
+            arrays = build()
+        return cls.from_arrays(arrays, dtype=dtype, name=name, step_hours=1 / STEPS_PER_HOUR[resolution])
+
+    def __len__(self):
+        return len(self.time)
+
+    @cached_property
+    def consumption_smoothed(self):
+        """Normed profile superimposed with time-shifted copies of itself to mimic several flats"""
+        steps_per_hour = round(1 / self.step_hours)
+        values = _smooth_consumption(np.asarray(self.consumption_kW_normed, dtype=np.float64), steps_per_hour)
+        # Kept in the precision of the dataset, a float32 dataset stays float32
+        values = values.astype(self.consumption_kW_normed.dtype, copy=False)
+        values.flags.writeable = False
+        return values
+
+    @cached_property
+    def year_starts(self):
+        """Index of the first step of each weather year"""
+        _, starts = _year_segments(self.year)
+        starts.flags.writeable = False
+        return starts
+
+    @cached_property
+    def years(self):
+        """Distinct weather years, in the order of ``year_starts``"""
+        return self.year[self.year_starts]
+
+    @cached_property
+    def calendar(self):
+        """Month, hour and the index of the first step of each day, from the local time"""
+        time = pd.DatetimeIndex(self.time)
+        day = time.normalize().to_numpy()
+        return {
+            'month': time.month.to_numpy().astype(np.int64),
+            'hour': time.hour.to_numpy().astype(np.int64),
+            'day_starts': np.flatnonzero(np.r_[True, day[1:] != day[:-1]]),
+        }
+
+    @cached_property
+    def fingerprint(self):
+        """Hash of the series, identifies the dataset content e.g. in result caches"""
+        sha = hashlib.sha256()
+        for field in ('time', 'year', 'P_oso', 'P_wnw', 'consumption_kW_normed'):
+            values = getattr(self, field)
+            sha.update(f"{field}:{values.dtype.str}:{len(values)};".encode())
+            sha.update(np.ascontiguousarray(values).tobytes())
+        return sha.hexdigest()[:32]
+
+    def to_frame(self):
+        """Base columns as a DataFrame indexed by time, as used by the report plots"""
+        time = pd.DatetimeIndex(self.time, name="time")
+        return pd.DataFrame({
+            'P_oso': self.P_oso,
+            'P_wnw': self.P_wnw,
+            'year': self.year,
+            'month': time.month,
+            'day': time.day,
+            'hour': time.hour,
+            'consumption_kW_normed': self.consumption_kW_normed,
+        }, index=time)
+
+
+# Datasets of default_dataset by resolution
+_default_datasets = {}
+
+
+def default_dataset(resolution="h"):
+    """The dataset loaded from the default input files, loaded on first use"""
+    if resolution not in _default_datasets:
+        _default_datasets[resolution] = SimulationDataset.from_files(resolution=resolution)
+    return _default_datasets[resolution]
+
+
+def _build_input_arrays(resolution="h", dtype=np.float64):
+    """Parse the PVGIS and household files and align them into arrays of the given resolution"""
+    local_time, p_oso, p_wnw = _load_pv_series(resolution)
+    consumption_time, consumption_normed = loader.load_household_consumption(
+        PATH_CONSUMPTION, PREPROCESSING_OPTIONS['consumption_column'],
+        PREPROCESSING_OPTIONS['consumption_year'], freq=resolution)
+    return _align_consumption(local_time, p_oso, p_wnw, consumption_time, consumption_normed, resolution, dtype)
+
+
+def _load_pv_series(resolution="h"):
+    """Local time and PV output of both roof sides over the full weather years"""
+    # Load PV data, both files cover the same UTC hours
+    time_oso, p_oso = loader.load_pvgis_hourly(PATH_PV_OSO)
+    time_wnw, p_wnw = loader.load_pvgis_hourly(PATH_PV_WNW)
+    if not np.array_equal(time_oso, time_wnw):
+        time_oso, index_oso, index_wnw = np.intersect1d(time_oso, time_wnw, return_indices=True)
+        p_oso, p_wnw = p_oso[index_oso], p_wnw[index_wnw]
+    local_time, (p_oso, p_wnw) = _pv_weather_years(time_oso, [p_oso, p_wnw], resolution)
+    return local_time, p_oso, p_wnw
+
+
+def _pv_weather_years(time_utc, series, resolution="h"):
+    """Convert hourly PV series to local time steps of ``resolution`` within the weather years"""
+    first_year, last_year = PREPROCESSING_OPTIONS['weather_years']
+    steps_per_hour = STEPS_PER_HOUR[resolution]
+    if steps_per_hour > 1:
+        time_utc, series = loader.interpolate_hourly(time_utc, series, steps_per_hour)
+    local_time = pd.DatetimeIndex(time_utc).tz_localize("UTC") \
+        .tz_convert(PREPROCESSING_OPTIONS['timezone']).tz_localize(None)
+
+    # Keep the full weather years in local time
+    in_years = (local_time.year >= first_year) & (local_time.year <= last_year)
+    return local_time[in_years], [values[in_years] for values in series]
+
+
+def _align_consumption(local_time, p_oso, p_wnw, consumption_time, consumption_normed, resolution, dtype):
+    """Map the consumption profile(s) onto the same calendar step of every weather year.
+
+    ``consumption_normed`` is one profile or a ``(n_steps, n_households)`` array;
+    steps without a matching profile step are dropped from all series.
+    """
+    index, valid = loader.align_profile_to_calendar(consumption_time, local_time, STEPS_PER_HOUR[resolution])
+    return {
+        'time': local_time[valid].floor(resolution).to_numpy(),
+        'P_oso': p_oso[valid].astype(dtype, copy=False),
+        'P_wnw': p_wnw[valid].astype(dtype, copy=False),
+        'consumption_kW_normed': consumption_normed[index[valid]].astype(dtype, copy=False),
+        'year': local_time.year[valid].to_numpy().astype(np.int64),
+    }
+
+
+def _writeable(values):
+    """True if ``values`` or any array it is a view of can be written to"""
+    while isinstance(values, np.ndarray):
+        if values.flags.writeable:
+            return True
+        values = values.base
+    return False
+
+
+def _smooth_consumption(consumption_kW_normed, steps_per_hour=1):
+    """Superimpose copies of the normed profile shifted by 1, 2, 7 and -6 hours to mimic several flats"""
+    return consumption_kW_normed + np.roll(consumption_kW_normed, 1 * steps_per_hour) \
+        + np.roll(consumption_kW_normed, 2 * steps_per_hour) \
+        + np.roll(consumption_kW_normed, 7 * steps_per_hour) + np.roll(consumption_kW_normed, -6 * steps_per_hour)
+
+
+def _year_segments(years):
+    """Return the distinct years and the start index of each year's block in a year-sorted series"""
+    years = np.asarray(years)
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    return years[starts], starts
@@ -0,0 +1,411 @@
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, see the "jit" extra in pyproject.toml
+    njit = None
+
+
+def _greedy_dispatch_loop(pv, consumption, soc, battery_capacity_kWh,
+                          battery_discharge_cutoff_limit, battery_charge_efficiency,
+                          battery_max_power_kW, soc_out, grid_out, charge_out, discharge_out):
+    """Greedy charge/discharge rule, one time step after the other.
+
+    Works on anything indexable, so the same code runs compiled by numba on
+    arrays and interpreted on plain Python lists. Returns the final state of charge.
+    """
+    min_soc = battery_capacity_kWh * battery_discharge_cutoff_limit
+    for i in range(len(pv)):
+        pv_surplus = pv[i] - consumption[i]
+        if pv_surplus > 0:
+            # Charging: limited by efficiency, capacity, and max power
+            charge_possible = min(
+                pv_surplus * battery_charge_efficiency,
+                battery_capacity_kWh - soc,
+                battery_max_power_kW
+            )
+            soc += charge_possible
+            grid_out[i] = 0.0
+            charge_out[i] = charge_possible
+            discharge_out[i] = 0.0
+        else:
+            # Discharging: limited by available energy, cutoff limit, and max power
+            discharge_possible = min(
+                -pv_surplus,
+                soc - min_soc,
+                battery_max_power_kW
+            )
+            soc -= discharge_possible
+            grid_out[i] = -pv_surplus - discharge_possible if discharge_possible < -pv_surplus else 0.0
+            charge_out[i] = 0.0
+            discharge_out[i] = discharge_possible
+        soc_out[i] = soc
+    return soc
+
+
+_greedy_dispatch_jit = njit(cache=True)(_greedy_dispatch_loop) if njit is not None else None
+
+
+def greedy_dispatch(pv_kW, consumption_kW, battery_capacity_kWh, battery_discharge_cutoff_limit,
+                    battery_charge_efficiency, battery_max_power_kW, initial_soc_kWh=None,
+                    out=None, use_jit=True):
+    """Run the greedy battery dispatch over hourly PV and consumption series.
+
+    The battery is charged with every PV surplus and discharged for every deficit,
+    limited by charge efficiency, capacity, discharge cutoff and maximum power.
+    The state of charge starts at ``initial_soc_kWh``, by default half the
+    capacity; ``out`` takes four preallocated float64 arrays for the results.
+
+    Returns ``(battery_soc_kWh, from_grid_kW, battery_charge_kWh, battery_discharge_kWh)``.
+    The numba-compiled kernel is used if numba is installed and ``use_jit`` is set.
+    """
+    pv = np.ascontiguousarray(pv_kW, dtype=np.float64)
+    consumption = np.ascontiguousarray(consumption_kW, dtype=np.float64)
+    if pv.shape != consumption.shape or pv.ndim != 1:
+        raise ValueError("pv_kW and consumption_kW must be 1-D arrays of equal length")
+
+    n = len(pv)
+    if out is None:
+        out = tuple(np.empty(n, dtype=np.float64) for _ in range(4))
+    soc_out, grid_out, charge_out, discharge_out = out
+
+    soc = battery_capacity_kWh / 2 if initial_soc_kWh is None else initial_soc_kWh
+    args = (float(soc), float(battery_capacity_kWh), float(battery_discharge_cutoff_limit),
+            float(battery_charge_efficiency), float(battery_max_power_kW))
+
+    if use_jit and _greedy_dispatch_jit is not None:
+        _greedy_dispatch_jit(pv, consumption, *args, soc_out, grid_out, charge_out, discharge_out)
+    else:
+        # Plain Python floats are much faster to step through than NumPy scalars
+        results = [[0.0] * n for _ in range(4)]
+        _greedy_dispatch_loop(pv.tolist(), consumption.tolist(), *args, *results)
+        for target, values in zip(out, results):
+            target[:] = values
+
+    return out
+
+
+def _greedy_dispatch_batch_loop(pv, consumption, soc, battery_capacity_kWh, min_soc,
+                                battery_charge_efficiency, battery_max_power_kW,
+                                grid_out, charge_out, discharge_out):
+    """Scalar version of the batch step, compiled by numba (time outer, scenarios inner)."""
+    n_steps, n_scenarios = pv.shape
+    for i in range(n_steps):
+        for j in range(n_scenarios):
+            pv_surplus = pv[i, j] - consumption[i, j]
+            if pv_surplus > 0:
+                charge_possible = min(
+                    pv_surplus * battery_charge_efficiency[j],
+                    battery_capacity_kWh[j] - soc[j],
+                    battery_max_power_kW[j]
+                )
+                soc[j] += charge_possible
+                grid_out[i, j] = 0.0
+                charge_out[i, j] = charge_possible
+                discharge_out[i, j] = 0.0
+            else:
+                discharge_possible = min(
+                    -pv_surplus,
+                    soc[j] - min_soc[j],
+                    battery_max_power_kW[j]
+                )
+                soc[j] -= discharge_possible
+                grid_out[i, j] = -pv_surplus - discharge_possible if discharge_possible < -pv_surplus else 0.0
+                charge_out[i, j] = 0.0
+                discharge_out[i, j] = discharge_possible
+
+
+_greedy_dispatch_batch_jit = njit(cache=True)(_greedy_dispatch_batch_loop) if njit is not None else None
+
+
+def _greedy_dispatch_batch_numpy(pv, consumption, soc, battery_capacity_kWh, min_soc,
+                                 battery_charge_efficiency, battery_max_power_kW,
+                                 grid_out, charge_out, discharge_out):
+    """Vectorised over scenarios: one NumPy expression per time step for the whole batch."""
+    for i in range(pv.shape[0]):
+        pv_surplus = pv[i] - consumption[i]
+        charging = pv_surplus > 0
+        deficit = -pv_surplus
+        charge = np.minimum(np.minimum(pv_surplus * battery_charge_efficiency,
+                                       battery_capacity_kWh - soc), battery_max_power_kW)
+        discharge = np.minimum(np.minimum(deficit, soc - min_soc), battery_max_power_kW)
+        np.copyto(charge, 0.0, where=~charging)
+        np.copyto(discharge, 0.0, where=charging)
+        grid = np.where(discharge < deficit, deficit - discharge, 0.0)
+        np.copyto(grid, 0.0, where=charging)
+        soc += charge
+        soc -= discharge
+        grid_out[i] = grid
+        charge_out[i] = charge
+        discharge_out[i] = discharge
+
+
+def greedy_dispatch_batch(pv_kW, consumption_kW, soc_kWh, battery_capacity_kWh,
+                          battery_discharge_cutoff_limit, battery_charge_efficiency,
+                          battery_max_power_kW, out=None, use_jit=True):
+    """Run the greedy dispatch for many scenarios side by side.
+
+    Applies exactly the same rule as :func:`greedy_dispatch`, but the inputs are
+    2-D arrays of shape ``(n_steps, n_scenarios)`` and the battery parameters are
+    per-scenario vectors, so the sequential time loop runs once for the whole batch.
+    Long series can be processed in consecutive blocks: ``soc_kWh`` is updated
+    in place and carries the state of charge from one block to the next.
+    Returns ``(from_grid_kW, battery_charge_kWh, battery_discharge_kWh)``, each
+    of shape ``(n_steps, n_scenarios)``.
+    """
+    pv = np.ascontiguousarray(pv_kW, dtype=np.float64)
+    consumption = np.ascontiguousarray(consumption_kW, dtype=np.float64)
+    if pv.shape != consumption.shape or pv.ndim != 2:
+        raise ValueError("pv_kW and consumption_kW must be 2-D arrays of equal shape")
+    if soc_kWh.dtype != np.float64 or soc_kWh.shape != (pv.shape[1],):
+        raise ValueError("soc_kWh must be a float64 vector with one entry per scenario")
+
+    n_scenarios = pv.shape[1]
+    capacity, cutoff, efficiency, max_power = (
+        np.broadcast_to(np.asarray(value, dtype=np.float64), (n_scenarios,)).copy()
+        for value in (battery_capacity_kWh, battery_discharge_cutoff_limit,
+                      battery_charge_efficiency, battery_max_power_kW)
+    )
+    min_soc = capacity * cutoff
+
+    if out is None:
+        out = tuple(np.empty(pv.shape, dtype=np.float64) for _ in range(3))
+
+    kernel = _greedy_dispatch_batch_jit if use_jit and _greedy_dispatch_batch_jit is not None \
+        else _greedy_dispatch_batch_numpy
+    kernel(pv, consumption, soc_kWh, capacity, min_soc, efficiency, max_power, *out)
+    return out
+
+
+# Order of the per-year sums written by greedy_dispatch_stats
+STATS_COLUMNS = ('PV_total_kW', 'consumption_kW', 'from_grid_kW', 'battery_charge_kWh', 'battery_discharge_kWh')
+
+
+def _greedy_dispatch_stats_loop(p_oso, p_wnw, consumption_profile, year_starts,
+                                installed_power_oso_kWp, installed_power_wnw_kWp, consumption_scale,
+                                soc, battery_capacity_kWh, battery_discharge_cutoff_limit,
+                                battery_charge_efficiency, battery_max_power_kW, sums):
+    """Greedy dispatch that only keeps running per-year sums.
+
+    PV and consumption of each step are scaled from the base series on the fly,
+    so no per-step array is created. ``sums`` is a flat sequence with five
+    entries per year, in the order of STATS_COLUMNS.
+    """
+    min_soc = battery_capacity_kWh * battery_discharge_cutoff_limit
+    n_years = len(year_starts)
+    for year in range(n_years):
+        start = year_starts[year]
+        stop = year_starts[year + 1] if year + 1 < n_years else len(p_oso)
+        pv_sum = 0.0
+        consumption_sum = 0.0
+        grid_sum = 0.0
+        charge_sum = 0.0
+        discharge_sum = 0.0
+        for i in range(start, stop):
+            pv = installed_power_oso_kWp*p_oso[i]*1e-3 + installed_power_wnw_kWp*p_wnw[i]*1e-3
+            consumption = consumption_profile[i] * consumption_scale
+            pv_surplus = pv - consumption
+            if pv_surplus > 0:
+                charge_possible = min(
+                    pv_surplus * battery_charge_efficiency,
+                    battery_capacity_kWh - soc,
+                    battery_max_power_kW
+                )
+                soc += charge_possible
+                charge_sum += charge_possible
+            else:
+                discharge_possible = min(
+                    -pv_surplus,
+                    soc - min_soc,
+                    battery_max_power_kW
+                )
+                soc -= discharge_possible
+                if discharge_possible < -pv_surplus:
+                    grid_sum += -pv_surplus - discharge_possible
+                discharge_sum += discharge_possible
+            pv_sum += pv
+            consumption_sum += consumption
+        sums[5*year] = pv_sum
+        sums[5*year + 1] = consumption_sum
+        sums[5*year + 2] = grid_sum
+        sums[5*year + 3] = charge_sum
+        sums[5*year + 4] = discharge_sum
+    return soc
+
+
+_greedy_dispatch_stats_jit = njit(cache=True)(_greedy_dispatch_stats_loop) if njit is not None else None
+
+
+def greedy_dispatch_stats(p_oso, p_wnw, consumption_profile, year_starts,
+                          installed_power_oso_kWp, installed_power_wnw_kWp, consumption_scale,
+                          battery_capacity_kWh, battery_discharge_cutoff_limit,
+                          battery_charge_efficiency, battery_max_power_kW,
+                          initial_soc_kWh=None, use_jit=True):
+    """Run the greedy dispatch and return only per-year energy sums.
+
+    Same rule as :func:`greedy_dispatch`, but PV and consumption are scaled
+    from the 1 kWp PV series and the consumption profile inside the loop and
+    the outputs are accumulated per year, so memory use is O(number of years).
+    Returns an array of shape ``(n_years, 5)``, columns in the order of ``STATS_COLUMNS``.
+    """
+    n_years = len(year_starts)
+    soc = battery_capacity_kWh / 2 if initial_soc_kWh is None else initial_soc_kWh
+    args = (float(installed_power_oso_kWp), float(installed_power_wnw_kWp), float(consumption_scale),
+            float(soc), float(battery_capacity_kWh), float(battery_discharge_cutoff_limit),
+            float(battery_charge_efficiency), float(battery_max_power_kW))
+
+    if use_jit and _greedy_dispatch_stats_jit is not None:
+        sums = np.zeros(5 * n_years)
+        _greedy_dispatch_stats_jit(
+            _float_array(p_oso), _float_array(p_wnw), _float_array(consumption_profile),
+            np.ascontiguousarray(year_starts, dtype=np.int64), *args, sums)
+    else:
+        sums = [0.0] * (5 * n_years)
+        _greedy_dispatch_stats_loop(
+            np.asarray(p_oso, dtype=np.float64).tolist(), np.asarray(p_wnw, dtype=np.float64).tolist(),
+            np.asarray(consumption_profile, dtype=np.float64).tolist(),
+            np.asarray(year_starts).tolist(), *args, sums)
+
+    return np.asarray(sums, dtype=np.float64).reshape(n_years, 5)
+
+
+def _greedy_dispatch_batch_stats_loop(p_oso, p_wnw, consumption_profiles, profile_index, year_starts,
+                                      power_oso, power_wnw, consumption_scale, soc, battery_capacity_kWh,
+                                      min_soc, battery_charge_efficiency, battery_max_power_kW, sums):
+    """Per-year sums of many scenarios, one scenario after the other through the whole series.
+
+    Each scenario runs exactly like ``_greedy_dispatch_stats_loop``, so its
+    sums equal those of a single run. ``sums`` has shape ``(n_years, 5, n_scenarios)``.
+    """
+    n_years = len(year_starts)
+    for j in range(len(soc)):
+        profile = consumption_profiles[profile_index[j]]
+        soc_j = soc[j]
+        for year in range(n_years):
+            start = year_starts[year]
+            stop = year_starts[year + 1] if year + 1 < n_years else len(p_oso)
+            pv_sum = 0.0
+            consumption_sum = 0.0
+            grid_sum = 0.0
+            charge_sum = 0.0
+            discharge_sum = 0.0
+            for i in range(start, stop):
+                pv = power_oso[j]*p_oso[i]*1e-3 + power_wnw[j]*p_wnw[i]*1e-3
+                consumption = profile[i] * consumption_scale[j]
+                pv_surplus = pv - consumption
+                if pv_surplus > 0:
+                    charge_possible = min(
+                        pv_surplus * battery_charge_efficiency[j],
+                        battery_capacity_kWh[j] - soc_j,
+                        battery_max_power_kW[j]
+                    )
+                    soc_j += charge_possible
+                    charge_sum += charge_possible
+                else:
+                    discharge_possible = min(
+                        -pv_surplus,
+                        soc_j - min_soc[j],
+                        battery_max_power_kW[j]
+                    )
+                    soc_j -= discharge_possible
+                    if discharge_possible < -pv_surplus:
+                        grid_sum += -pv_surplus - discharge_possible
+                    discharge_sum += discharge_possible
+                pv_sum += pv
+                consumption_sum += consumption
+            sums[year, 0, j] = pv_sum
+            sums[year, 1, j] = consumption_sum
+            sums[year, 2, j] = grid_sum
+            sums[year, 3, j] = charge_sum
+            sums[year, 4, j] = discharge_sum
+        soc[j] = soc_j
+
+
+_greedy_dispatch_batch_stats_jit = njit(cache=True)(_greedy_dispatch_batch_stats_loop) if njit is not None else None
+
+
+def _greedy_dispatch_batch_stats_numpy(p_oso, p_wnw, consumption_profiles, profile_index, year_starts,
+                                       power_oso, power_wnw, consumption_scale, soc, battery_capacity_kWh,
+                                       min_soc, battery_charge_efficiency, battery_max_power_kW, sums):
+    """Vectorised over scenarios: one NumPy expression per time step, sums added step by step."""
+    n_years = len(year_starts)
+    for year in range(n_years):
+        start = year_starts[year]
+        stop = year_starts[year + 1] if year + 1 < n_years else len(p_oso)
+        for i in range(start, stop):
+            pv = power_oso*p_oso[i]*1e-3 + power_wnw*p_wnw[i]*1e-3
+            consumption = consumption_profiles[profile_index, i] * consumption_scale
+            pv_surplus = pv - consumption
+            charging = pv_surplus > 0
+            deficit = -pv_surplus
+            charge = np.minimum(np.minimum(pv_surplus * battery_charge_efficiency,
+                                           battery_capacity_kWh - soc), battery_max_power_kW)
+            discharge = np.minimum(np.minimum(deficit, soc - min_soc), battery_max_power_kW)
+            np.copyto(charge, 0.0, where=~charging)
+            np.copyto(discharge, 0.0, where=charging)
+            grid = np.where(discharge < deficit, deficit - discharge, 0.0)
+            np.copyto(grid, 0.0, where=charging)
+            soc += charge
+            soc -= discharge
+            for k, values in enumerate((pv, consumption, grid, charge, discharge)):
+                sums[year, k] += values
+
+
+def greedy_dispatch_batch_stats(p_oso, p_wnw, consumption_profiles, year_starts,
+                                installed_power_oso_kWp, installed_power_wnw_kWp, consumption_scale,
+                                battery_capacity_kWh, battery_discharge_cutoff_limit,
+                                battery_charge_efficiency, battery_max_power_kW,
+                                profile_index=None, initial_soc_kWh=None, use_jit=True):
+    """Per-year energy sums of many scenarios, without any per-step output.
+
+    The batch counterpart of :func:`greedy_dispatch_stats`: parameters are
+    per-scenario vectors (or scalars for all scenarios). ``consumption_profiles``
+    is one profile for all scenarios or an array of shape ``(n_profiles, n_steps)``
+    together with ``profile_index``, the profile of each scenario. Returns an
+    array of shape ``(n_years, 5, n_scenarios)``, second axis in the order of
+    ``STATS_COLUMNS``.
+    """
+    profiles = _float_array(consumption_profiles)
+    if profiles.ndim == 1:
+        profiles = profiles[None]
+    parameters = [installed_power_oso_kWp, installed_power_wnw_kWp, consumption_scale, battery_capacity_kWh,
+                  battery_discharge_cutoff_limit, battery_charge_efficiency, battery_max_power_kW]
+    if profile_index is not None:
+        parameters.append(profile_index)
+    n_scenarios = math.prod(np.broadcast_shapes(*(np.shape(value) for value in parameters)))
+    if profile_index is None:
+        profile_index = 0
+    power_oso, power_wnw, scale, capacity, cutoff, efficiency, max_power = (
+        np.broadcast_to(np.asarray(value, dtype=np.float64), (n_scenarios,)).copy()
+        for value in (installed_power_oso_kWp, installed_power_wnw_kWp, consumption_scale,
+                      battery_capacity_kWh, battery_discharge_cutoff_limit,
+                      battery_charge_efficiency, battery_max_power_kW)
+    )
+    profile_index = np.broadcast_to(np.asarray(profile_index, dtype=np.int64), (n_scenarios,)).copy()
+    soc = capacity / 2 if initial_soc_kWh is None else \
+        np.broadcast_to(np.asarray(initial_soc_kWh, dtype=np.float64), (n_scenarios,)).copy()
+    year_starts = np.ascontiguousarray(year_starts, dtype=np.int64)
+    sums = np.zeros((len(year_starts), len(STATS_COLUMNS), n_scenarios))
+    if n_scenarios == 0:
+        return sums
+
+    if use_jit and _greedy_dispatch_batch_stats_jit is not None:
+        kernel = _greedy_dispatch_batch_stats_jit
+        p_oso, p_wnw = _float_array(p_oso), _float_array(p_wnw)
+    else:
+        kernel = _greedy_dispatch_batch_stats_numpy
+        p_oso, p_wnw = np.asarray(p_oso, dtype=np.float64), np.asarray(p_wnw, dtype=np.float64)
+        profiles = profiles.astype(np.float64, copy=False)
+    kernel(p_oso, p_wnw, profiles, profile_index, year_starts, power_oso, power_wnw, scale,
+           soc, capacity, capacity * cutoff, efficiency, max_power, sums)
+    return sums
+
+
+def _float_array(values):
+    """Contiguous float32 or float64 array; float32 inputs are passed on without a float64 copy"""
+    values = np.asarray(values)
+    if values.dtype not in (np.float32, np.float64):
+        values = values.astype(np.float64)
+    return np.ascontiguousarray(values)
@@ -0,0 +1,166 @@
+"""Monte Carlo ensemble of stochastic lifetimes of one configuration.
+
+All members are dispatched side by side, one batch per year of their lifetime,
+so thousands of members cost one batch pass over a year of data per lifetime year.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregates import annual_metrics
+from battery_simulation import _energy_per_step, _resolve_parameters
+from dataset import default_dataset
+from dispatch import STATS_COLUMNS, greedy_dispatch_batch
+from optimize import CostModel
+
+# Metrics of EnsembleResult.members summarised by EnsembleResult.percentiles
+ENSEMBLE_METRICS = ('avg_pv_used', 'avg_consumption', 'avg_grid_independence', 'avg_self_consumption_rate',
+                    'annual_cash_flow', 'payback_years', 'npv')
+
+
+@dataclass(frozen=True)
+class EnsembleResult:
+    """Outcome of every ensemble member and their spread.
+
+    ``annual_sums`` has shape ``(n_members, n_years, 5)`` in the order of
+    ``dispatch.STATS_COLUMNS``, ``weather_years`` the year drawn for each
+    member-year, and ``members`` one row per member with its draws, metrics and economics.
+    """
+    parameters: dict
+    annual_sums: np.ndarray
+    weather_years: np.ndarray
+    members: pd.DataFrame
+
+    def percentiles(self, q=(10, 50, 90)):
+        """Percentiles of the member metrics, one row per percentile, e.g. ``P10``"""
+        values = self.members[list(ENSEMBLE_METRICS)].to_numpy(dtype=np.float64)
+        table = _percentiles(values, q)
+        return pd.DataFrame(table, index=[f"P{p:g}" for p in q], columns=ENSEMBLE_METRICS)
+
+
+def run_ensemble(n_members=1000, cost_model=None, dataset=None, seed=0,
+                 consumption_scale_sd=0.1, consumption_year_sd=0.05,
+                 shift_variants=32, max_shift_hours=8,
+                 capacity_fade_mean=0.02, capacity_fade_sd=0.005,
+                 block_size=None, use_jit=True, **parameters):
+    """Simulate ``n_members`` stochastic lifetimes of one configuration, see ``EnsembleResult``.
+
+    Members draw weather years, log-normal consumption factors, a building profile
+    of shifted household profiles and a yearly capacity fade; equal seeds give equal results.
+    The state of charge carries over from one year of a member to the next.
+    """
+    if dataset is None:
+        dataset = default_dataset()
+    if cost_model is None:
+        cost_model = CostModel()
+    params = _resolve_parameters(parameters)
+    rng = np.random.default_rng(seed)
+    n_years = cost_model.horizon_years
+    steps_per_hour = round(1 / dataset.step_hours)
+
+    # Draw everything up front, one vectorised call per random quantity
+    year_index = rng.integers(0, len(dataset.years), size=(n_members, n_years))
+    member_scale = rng.lognormal(0.0, consumption_scale_sd, n_members)
+    scale = member_scale[:, None] * rng.lognormal(0.0, consumption_year_sd, (n_members, n_years))
+    shifts = rng.integers(-max_shift_hours, max_shift_hours + 1, size=(shift_variants, 4)) * steps_per_hour
+    variant = rng.integers(0, max(shift_variants, 1), n_members)
+    fade = np.clip(rng.normal(capacity_fade_mean, capacity_fade_sd, n_members), 0.0, 1.0)
+    capacity = params['battery_capacity_kWh'] * (1 - fade[:, None]) ** np.arange(n_years)
+
+    # Series shared by all members: PV output of the configuration and the building profiles
+    power_oso, power_wnw, max_power = _energy_per_step(params, dataset.step_hours)
+    pv_kW = power_oso*np.asarray(dataset.P_oso, dtype=np.float64)*1e-3 \
+        + power_wnw*np.asarray(dataset.P_wnw, dtype=np.float64)*1e-3
+    profile = np.asarray(dataset.consumption_kW_normed, dtype=np.float64)
+    if shift_variants:
+        profiles = np.stack([profile + sum(np.roll(profile, shift) for shift in variant_shifts)
+                             for variant_shifts in shifts])
+    else:
+        profiles = np.asarray(dataset.consumption_smoothed, dtype=np.float64)[None]
+
+    starts = np.asarray(dataset.year_starts)
+    lengths = np.diff(np.r_[starts, len(dataset)])
+    annual_sums = np.zeros((n_members, n_years, len(STATS_COLUMNS)))
+    soc = capacity[:, 0] / 2
+    for year in range(n_years):
+        # The years run one after the other, so each member's battery keeps its charge, within the faded capacity
+        np.minimum(soc, capacity[:, year], out=soc)
+        annual_sums[:, year] = _simulate_member_years(
+            pv_kW, profiles.ravel(), len(dataset),
+            column_start=starts[year_index[:, year]], column_length=lengths[year_index[:, year]],
+            column_variant=variant,
+            column_consumption=params['consumption_per_flat_per_year_kWh'] * scale[:, year],
+            soc=soc, capacity=capacity[:, year], params=params, max_power=max_power,
+            block_size=block_size, use_jit=use_jit)
+
+    metrics = annual_metrics(*(annual_sums[:, :, k].T for k in range(3)))
+    members = pd.DataFrame({'consumption_scale': member_scale, 'capacity_fade': fade, **metrics})
+    members = members.join(_member_economics(annual_sums, params, cost_model))
+    return EnsembleResult(params, annual_sums, dataset.years[year_index], members)
+
+
+def _simulate_member_years(pv_kW, profiles, n_steps, column_start, column_length, column_variant,
+                           column_consumption, soc, capacity, params, max_power, block_size=None, use_jit=True):
+    """Dispatch one year of every member as one batch column and return its sums, shape ``(n_columns, 5)``.
+
+    Column ``c`` runs through the year starting at ``column_start[c]`` of the
+    series; shorter years are padded with steps without PV and consumption,
+    which leave the sums unchanged. ``soc`` is updated in place to the state
+    of charge at the end of the year.
+    """
+    n_columns = len(column_start)
+    if block_size is None:
+        block_size = max(1, (1 << 21) // max(n_columns, 1))
+    profile_offset = column_variant * n_steps + column_start
+    sums = np.zeros((len(STATS_COLUMNS), n_columns))
+
+    for start in range(0, column_length.max(), block_size):
+        step = np.arange(start, min(start + block_size, column_length.max()))[:, None]
+        padding = step >= column_length
+        index = np.where(padding, 0, column_start + step)
+        pv = pv_kW[index]
+        consumption = profiles[np.where(padding, 0, profile_offset + step)] * column_consumption
+        pv[padding] = 0.0
+        consumption[padding] = 0.0
+        grid, charge, discharge = greedy_dispatch_batch(
+            pv, consumption, soc, capacity, params['battery_discharge_cutoff_limit'],
+            params['battery_charge_efficiency'], max_power, use_jit=use_jit)
+        for k, values in enumerate((pv, consumption, grid, charge, discharge)):
+            sums[k] += values.sum(axis=0)
+    return sums.T
+
+
+def _member_economics(annual_sums, params, cost_model):
+    """Yearly cash flow, payback time and net present value of every member"""
+    pv_total = annual_sums[:, :, 0]
+    pv_used = annual_sums[:, :, 1] - annual_sums[:, :, 2]
+    installed_power = params['installed_power_oso_kWp'] + params['installed_power_wnw_kWp']
+    investment = cost_model.investment(installed_power, params['battery_capacity_kWh'])
+    cash_flows = cost_model.annual_cash_flow(pv_used, pv_total)
+    discount = (1 + cost_model.discount_rate) ** -np.arange(1, cash_flows.shape[1] + 1)
+    cash_flow = cash_flows.mean(axis=1)
+    with np.errstate(divide='ignore'):
+        payback_years = np.where(cash_flow > 0, investment / cash_flow, np.inf)
+    return pd.DataFrame({
+        'annual_cash_flow': cash_flow,
+        'payback_years': payback_years,
+        'npv': cash_flows @ discount - investment,
+    })
+
+
+def _percentiles(values, q):
+    """Linearly interpolated percentiles along axis 0 that keep infinite values.
+
+    ``np.percentile`` gives NaN between two infinite values; here members that
+    never pay back count as infinitely late, so P90 of the payback time is inf
+    if more than 10 % of the members never pay back.
+    """
+    values = np.sort(values, axis=0)
+    position = np.asarray(q, dtype=np.float64) / 100 * (len(values) - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    fraction = (position - lower)[:, None]
+    low, high = values[lower], values[upper]
+    with np.errstate(invalid='ignore'):
+        return np.where((fraction == 0) | (low == high), low, low + (high - low) * fraction)
@@ -0,0 +1,263 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import dataset as dataset_module
+import loader
+import sweep
+from aggregates import annual_metrics
+from battery_simulation import _energy_per_step, _resolve_parameters
+from dataset import SimulationDataset
+from dispatch import greedy_dispatch, greedy_dispatch_batch_stats
+
+BATTERY_MODES = ('shared', 'per_flat')
+
+
+@dataclass(frozen=True, eq=False)
+class FleetDataset:
+    """PV series of ``dataset`` plus one measured consumption profile per household.
+
+    ``consumption_profiles`` has shape ``(n_steps, n_households)``, the share of
+    each household's yearly consumption per step; ``dataset.consumption_kW_normed``
+    is their mean.
+    """
+    dataset: SimulationDataset
+    consumption_profiles: np.ndarray
+    household_names: tuple
+
+    def __post_init__(self):
+        profiles = np.asarray(self.consumption_profiles)
+        if profiles.ndim != 2 or len(profiles) != len(self.dataset):
+            raise ValueError(f"consumption_profiles must have shape ({len(self.dataset)}, n_households), "
+                             f"got {profiles.shape}")
+        if len(self.household_names) != profiles.shape[1]:
+            raise ValueError("household_names must name every column of consumption_profiles")
+        profiles = profiles.view()
+        profiles.flags.writeable = False
+        object.__setattr__(self, 'consumption_profiles', profiles)
+        object.__setattr__(self, 'household_names', tuple(self.household_names))
+
+    @classmethod
+    def from_profiles(cls, dataset, profiles, household_names=None):
+        """Combine a dataset with own per-flat profiles, one column per household and step"""
+        profiles = np.asarray(profiles)
+        if household_names is None:
+            household_names = [f"flat{i + 1}" for i in range(profiles.shape[1])]
+        return cls(dataset, profiles, household_names)
+
+    @classmethod
+    def from_files(cls, columns=None, use_cache=True, dtype=np.float64, resolution="h"):
+        """Load the PV files and several household meters of the Open Power System Data file.
+
+        ``columns`` defaults to all residential grid import meters in the file.
+        The aligned arrays are cached like ``SimulationDataset.from_files``.
+        """
+        if columns is None:
+            columns = loader.household_columns(dataset_module.PATH_CONSUMPTION)
+        columns = list(columns)
+        dtype = np.dtype(dtype)
+        options = {name: value for name, value in dataset_module.PREPROCESSING_OPTIONS.items()
+                   if name != 'consumption_column'}
+        options.update(consumption_columns=columns, resolution=resolution, dtype=dtype.name)
+
+        def build():
+            return _build_fleet_arrays(columns, resolution, dtype)
+
+        paths = [dataset_module.PATH_PV_OSO, dataset_module.PATH_PV_WNW, dataset_module.PATH_CONSUMPTION]
+        if use_cache:
+            arrays = data_cache.load_or_build(paths, options, build, dataset_module.CACHE_DIR)
+        else:
+            arrays = build()
+        base = SimulationDataset.from_arrays(
+            arrays, dtype=dtype, step_hours=1 / dataset_module.STEPS_PER_HOUR[resolution])
+        return cls(base, np.asarray(arrays['consumption_profiles']), columns)
+
+    @property
+    def n_households(self):
+        return self.consumption_profiles.shape[1]
+
+    def select(self, households):
+        """Fleet of a subset of the households, given by name or column index"""
+        columns = _household_indices(self.household_names, households)
+        return FleetDataset(self.dataset, self.consumption_profiles[:, columns],
+                            [self.household_names[i] for i in columns])
+
+
+@dataclass(frozen=True)
+class FleetResult:
+    """Per-year energy sums of one building, in total and per household.
+
+    ``annual_sums`` is the building total ordered like ``dispatch.STATS_COLUMNS``.
+    With a shared battery the grid import of each step is attributed to the
+    households in proportion to their consumption in that step.
+    """
+    parameters: dict
+    battery: str
+    years: np.ndarray
+    household_names: tuple
+    annual_sums: np.ndarray
+    household_consumption: np.ndarray
+    household_from_grid: np.ndarray
+
+    def summary(self):
+        """The four headline metrics of the building, averaged over the weather years"""
+        metrics = annual_metrics(self.annual_sums[:, 0], self.annual_sums[:, 1], self.annual_sums[:, 2])
+        return {name: float(value) for name, value in metrics.items()}
+
+    def households(self):
+        """Average yearly consumption, grid import and grid independence per household"""
+        consumption = self.household_consumption.mean(axis=0)
+        from_grid = self.household_from_grid.mean(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grid_independence = ((1 - self.household_from_grid / self.household_consumption) * 100).mean(axis=0)
+        return pd.DataFrame({
+            'avg_consumption': consumption,
+            'avg_from_grid': from_grid,
+            'avg_pv_used': consumption - from_grid,
+            'avg_grid_independence': grid_independence,
+        }, index=pd.Index(self.household_names, name='household'))
+
+
+def simulate_fleet(fleet, battery='shared', pv_shares=None, use_jit=True, **parameters):
+    """Simulate a building of several households with one PV plant.
+
+    ``battery='shared'`` dispatches one battery against the summed consumption;
+    ``'per_flat'`` gives every household its own battery and its ``pv_shares`` of
+    the plant (equal by default). A single ``battery_capacity_kWh`` or
+    ``battery_max_power_kW`` is then the building total and is split by the same
+    shares, so both modes compare the same hardware; one value per household
+    sets each flat's battery directly. ``consumption_per_flat_per_year_kWh`` may
+    also be one value per household.
+    """
+    params = _resolve_parameters(parameters)
+    data = fleet.dataset
+    sums = _simulate_fleet_arrays(data.P_oso, data.P_wnw, fleet.consumption_profiles, data.year_starts,
+                                  data.step_hours, params, battery, pv_shares, use_jit)
+    return FleetResult(params, battery, data.years, fleet.household_names, *sums)
+
+
+def _simulate_fleet_arrays(p_oso, p_wnw, profiles, year_starts, step_hours, params, battery='shared',
+                           pv_shares=None, use_jit=True):
+    """Return building sums ``(n_years, 5)`` and household consumption and grid import ``(n_years, H)``"""
+    if battery not in BATTERY_MODES:
+        raise ValueError(f"battery must be one of {BATTERY_MODES}, got {battery!r}")
+    n_steps, n_households = profiles.shape
+    year_starts = np.asarray(year_starts)
+    power_oso, power_wnw, max_power = _energy_per_step(
+        {**params, 'battery_max_power_kW': np.asarray(params['battery_max_power_kW'], dtype=np.float64)}, step_hours)
+    consumption_per_flat = np.broadcast_to(
+        np.asarray(params['consumption_per_flat_per_year_kWh'], dtype=np.float64), (n_households,))
+
+    if battery == 'shared':
+        pv = power_oso*np.asarray(p_oso, dtype=np.float64)*1e-3 + power_wnw*np.asarray(p_wnw, dtype=np.float64)*1e-3
+        consumption = profiles @ consumption_per_flat
+        _, grid, charge, discharge = greedy_dispatch(
+            pv, consumption, params['battery_capacity_kWh'], params['battery_discharge_cutoff_limit'],
+            params['battery_charge_efficiency'], max_power, use_jit=use_jit)
+        annual_sums = np.stack([np.add.reduceat(values, year_starts)
+                                for values in (pv, consumption, grid, charge, discharge)], axis=1)
+
+        # Grid import of each step split by the households' consumption in that step
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grid_share = np.where(consumption > 0, grid / consumption, 0.0)
+        # Yearly consumption per household: one reduction over time, no (steps, households) temporary
+        household_consumption = np.add.reduceat(profiles, year_starts, axis=0, dtype=np.float64) \
+            * consumption_per_flat
+        bounds = np.r_[year_starts, n_steps]
+        household_from_grid = np.stack([grid_share[start:stop] @ profiles[start:stop]
+                                        for start, stop in zip(bounds[:-1], bounds[1:])]) * consumption_per_flat
+        return annual_sums, household_consumption, household_from_grid
+
+    if pv_shares is None:
+        pv_shares = np.full(n_households, 1 / n_households)
+    else:
+        pv_shares = np.asarray(pv_shares, dtype=np.float64)
+        pv_shares = pv_shares / pv_shares.sum()
+    # A building total is split like the plant, per-household values are kept
+    capacity, max_power = (values * pv_shares if values.ndim == 0 else values
+                           for values in (np.asarray(params['battery_capacity_kWh'], dtype=np.float64), max_power))
+    sums = greedy_dispatch_batch_stats(
+        p_oso, p_wnw, profiles.T, year_starts, power_oso * pv_shares, power_wnw * pv_shares,
+        consumption_per_flat, capacity, params['battery_discharge_cutoff_limit'],
+        params['battery_charge_efficiency'], max_power, profile_index=np.arange(n_households), use_jit=use_jit)
+    return sums.sum(axis=2), sums[:, 1], sums[:, 2]
+
+
+def _household_indices(names, households):
+    indices = []
+    for household in households:
+        if isinstance(household, str):
+            if household not in names:
+                raise KeyError(f"Unknown household {household!r}, the fleet has {', '.join(names)}")
+            indices.append(names.index(household))
+        else:
+            index = int(household)
+            if not 0 <= index < len(names):
+                raise IndexError(f"Household index {index} out of range, the fleet has "
+                                 f"{len(names)} households: {', '.join(names)}")
+            indices.append(index)
+    return indices
+
+
+def _run_building(index, columns, battery, pv_shares, params, use_jit):
+    rows = sweep._shared['rows']
+    sums = _simulate_fleet_arrays(rows[0], rows[1], rows[2:][columns].T, sweep._shared['year_starts'],
+                                  sweep._shared['step_hours'], params, battery, pv_shares, use_jit=use_jit)
+    return index, sums
+
+
+def simulate_buildings(buildings, fleet, max_workers=None, progress=None, use_jit=True):
+    """Simulate many buildings, each a group of households of ``fleet``, over a process pool.
+
+    ``buildings`` holds one dict per building with ``households`` (names or column
+    indices) and optionally ``battery``, ``pv_shares`` and further parameters of
+    ``simulate_fleet``. The inputs are shared with the workers as in ``sweep.run_sweep``;
+    ``progress`` is called as ``progress(buildings_done, buildings_total)``.
+    Returns the ``FleetResult`` of each building in order.
+    """
+    tasks = []
+    for building in buildings:
+        building = dict(building)
+        columns = _household_indices(fleet.household_names, building.pop('households'))
+        battery = building.pop('battery', 'shared')
+        pv_shares = building.pop('pv_shares', None)
+        tasks.append((columns, battery, pv_shares, _resolve_parameters(building)))
+    if not tasks:
+        return []
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(tasks)))
+
+    data = fleet.dataset
+    rows = [data.P_oso, data.P_wnw, *fleet.consumption_profiles.T]
+    with sweep._shared_rows(rows, np.result_type(*rows)) as block:
+        results = [None] * len(tasks)
+        context = {'year_starts': data.year_starts, 'step_hours': data.step_hours}
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=sweep._attach_shared_rows,
+                                 initargs=(*block, context)) as executor:
+            futures = [executor.submit(_run_building, i, *task, use_jit) for i, task in enumerate(tasks)]
+            for done, future in enumerate(as_completed(futures), start=1):
+                index, sums = future.result()
+                columns, battery, _, params = tasks[index]
+                results[index] = FleetResult(params, battery, data.years,
+                                             tuple(fleet.household_names[i] for i in columns), *sums)
+                if progress is not None:
+                    progress(done, len(tasks))
+    return results
+
+
+def _build_fleet_arrays(columns, resolution, dtype):
+    """Aligned arrays of the PV files and the household meters ``columns``"""
+    options = dataset_module.PREPROCESSING_OPTIONS
+    local_time, p_oso, p_wnw = dataset_module._load_pv_series(resolution)
+    consumption_time, profiles = loader.load_household_profiles(
+        dataset_module.PATH_CONSUMPTION, columns, options['consumption_year'], freq=resolution)
+    arrays = dataset_module._align_consumption(local_time, p_oso, p_wnw, consumption_time, profiles,
+                                               resolution, dtype)
+    arrays['consumption_profiles'] = arrays['consumption_kW_normed']
+    arrays['consumption_kW_normed'] = arrays['consumption_profiles'].mean(axis=1, dtype=np.float64).astype(dtype)
+    return arrays
@@ -0,0 +1,168 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+class StageObserver:
+    """Receives the events of an instrumented run; all hooks do nothing by default.
+
+    A run (one call of ``run_pv_battery_simulation``) emits ``on_run_start``,
+    then ``on_stage_start``/``on_stage_end`` for each of its stages, e.g.
+    ``load``, ``smoothing``, ``dispatch``, ``aggregation`` and ``report``, and
+    finally ``on_run_end`` with the metrics record of the run.
+    """
+
+    def on_run_start(self, parameters):
+        pass
+
+    def on_stage_start(self, stage):
+        pass
+
+    def on_stage_end(self, stage):
+        pass
+
+    def on_run_end(self, record):
+        pass
+
+
+class StageTimer(StageObserver):
+    """Measures wall-clock time and, optionally, memory allocations of every stage.
+
+    After a run, ``stages`` maps each stage to a dict with ``seconds`` and, with
+    ``track_allocations``, ``allocated_bytes`` (still held at the end of the
+    stage) and ``peak_bytes`` (highest additional allocation during the stage).
+    Allocations are traced with tracemalloc, which slows the run down noticeably;
+    the timing alone costs a few microseconds per stage. If tracemalloc is
+    already tracing, that session's peak is left alone and ``peak_bytes`` is
+    not recorded.
+    """
+
+    def __init__(self, track_allocations=False):
+        self.track_allocations = track_allocations
+        self.stages = {}
+        self._started = {}
+        self._started_tracing = False
+
+    def on_run_start(self, parameters):
+        self.stages = {}
+        if self.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def on_stage_start(self, stage):
+        memory = None
+        if self.track_allocations:
+            if self._started_tracing and hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        self._started[stage] = (time.perf_counter(), memory)
+
+    def on_stage_end(self, stage):
+        end = time.perf_counter()
+        start, memory = self._started.pop(stage)
+        metrics = {'seconds': end - start}
+        if memory is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            metrics['allocated_bytes'] = current - memory
+            if self._started_tracing:
+                metrics['peak_bytes'] = max(peak - memory, 0)
+        self.stages[stage] = metrics
+
+    def on_run_end(self, record):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+class JsonLinesRecorder(StageTimer):
+    """Appends one JSON object per run to a file: parameters, results and stage metrics.
+
+    ``target`` is the path of the ``.jsonl`` file, opened for appending, or an
+    open text file. ``track_allocations`` is passed on to ``StageTimer``.
+    """
+
+    def __init__(self, target, track_allocations=False):
+        super().__init__(track_allocations)
+        if isinstance(target, str):
+            self._file = open(target, "a", encoding="utf-8")
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+
+    def on_run_end(self, record):
+        super().on_run_end(record)
+        line = {'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                **record, 'stages': self.stages}
+        self._file.write(json.dumps(line, default=_json_default) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Instrumentation:
+    """Dispatches the run and stage events to a list of observers"""
+
+    def __init__(self, observers):
+        self.observers = list(observers)
+
+    def run_start(self, parameters):
+        for observer in self.observers:
+            observer.on_run_start(parameters)
+
+    @contextmanager
+    def stage(self, name):
+        for observer in self.observers:
+            observer.on_stage_start(name)
+        try:
+            yield
+        finally:
+            for observer in reversed(self.observers):
+                observer.on_stage_end(name)
+
+    def run_end(self, record):
+        for observer in self.observers:
+            observer.on_run_end(record)
+
+
+class _NoInstrumentation:
+    """Stand-in without observers: every stage is one shared no-op context manager"""
+    observers = ()
+    _context = nullcontext()
+
+    def run_start(self, parameters):
+        pass
+
+    def stage(self, name):
+        return self._context
+
+    def run_end(self, record):
+        pass
+
+
+NO_INSTRUMENTATION = _NoInstrumentation()
+
+
+def instrumentation(observers):
+    """Instrumentation for the given observers, the shared no-op one if there are none"""
+    if not observers:
+        return NO_INSTRUMENTATION
+    return Instrumentation(observers)
+
+
+def _json_default(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
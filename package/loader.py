@@ -0,0 +1,193 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+# One record of the PVGIS "outputs.hourly" array, e.g. {"time": "20050101:0010", "P": 0.0, ...}
+_PVGIS_RECORD = re.compile(rb'\{\s*"time"\s*:\s*"(\d{8}:\d{4})"\s*,\s*"P"\s*:\s*([-+0-9.eE]+)')
+
+# First day-of-year (0-based) of each month in a leap year, so that 29 February has its own slot
+_LEAP_YEAR_MONTH_OFFSETS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def load_pvgis_hourly(path):
+    """Read the hourly PV output of a PVGIS time series JSON file.
+
+    Only ``time`` and ``P`` of each record are extracted, by scanning the raw
+    bytes instead of building a dict per hour. Files with a different record
+    layout are parsed with the json module, still without keeping the dicts.
+    Returns the UTC time of each record as datetime64[m] and the PV output in W.
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+
+    records = _PVGIS_RECORD.findall(content)
+    if len(records) != content.count(b'"time"'):
+        records = _parse_pvgis_records_json(content)
+    # No fixed width: long numbers such as repr(float) must keep all their digits
+    records = np.array(records).reshape(-1, 2)
+
+    return parse_pvgis_time(records[:, 0].astype("S13")), records[:, 1].astype(np.float64)
+
+
+def _parse_pvgis_records_json(content):
+    """Fallback for unusual layouts: let the json module reduce each record to (time, P)"""
+    def reduce_record(pairs):
+        record = dict(pairs)
+        if "time" in record and "P" in record:
+            return (record["time"].encode(), repr(float(record["P"])).encode())
+        return record
+
+    data = json.loads(content, object_pairs_hook=reduce_record)
+    return data['outputs']['hourly']
+
+
+def parse_pvgis_time(values):
+    """Convert PVGIS timestamps ``YYYYMMDD:HHMM`` (UTC) to datetime64[m] with integer arithmetic"""
+    digits = _digits(values, 13)
+    return _datetime_from_fields(_number(digits, 0, 4), _number(digits, 4, 6), _number(digits, 6, 8),
+                                 _number(digits, 9, 11), _number(digits, 11, 13))
+
+
+def parse_opsd_timestamp(values):
+    """Convert Open Power System Data timestamps ``YYYY-MM-DDTHH:MM:SS+HHMM`` to UTC datetime64[m].
+
+    Uses integer arithmetic on the fixed-width strings and falls back to
+    ``pd.to_datetime`` for any other format.
+    """
+    values = np.asarray(values, dtype=object)
+    encoded = np.asarray(values.astype(str), dtype="S")
+    if encoded.dtype.itemsize != 24 or not np.all(np.char.str_len(encoded) == 24):
+        return pd.to_datetime(values, utc=True).tz_localize(None).to_numpy().astype("datetime64[m]")
+
+    digits = _digits(encoded, 24)
+    local = _datetime_from_fields(_number(digits, 0, 4), _number(digits, 5, 7), _number(digits, 8, 10),
+                                  _number(digits, 11, 13), _number(digits, 14, 16))
+    sign = np.where(digits[:, 19] == ord("-") - ord("0"), -1, 1)
+    offset_minutes = sign * (_number(digits, 20, 22) * 60 + _number(digits, 22, 24))
+    return local - offset_minutes.astype("timedelta64[m]")
+
+
+def _digits(values, width):
+    """Fixed-width ASCII strings as an (n, width) array of digit values"""
+    return np.asarray(values, dtype=f"S{width}").view(np.uint8).reshape(-1, width).astype(np.int64) - ord("0")
+
+
+def _number(digits, first, last):
+    value = np.zeros(len(digits), dtype=np.int64)
+    for column in range(first, last):
+        value = value * 10 + digits[:, column]
+    return value
+
+
+def _datetime_from_fields(year, month, day, hour, minute):
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    return days.astype("datetime64[m]") + (hour * 60 + minute).astype("timedelta64[m]")
+
+
+def load_household_consumption(path, column, year, freq="h"):
+    """Consumption of one household meter for one calendar year (UTC), normed to a total of 1.
+
+    The Open Power System Data file holds cumulative meter readings every 15
+    minutes; the difference to the next reading is the energy of the quarter
+    hour starting at a reading, and these are summed per ``freq``, by default
+    per hour. ``freq="15min"`` keeps the original resolution. Returns the UTC
+    start of each interval and the normed consumption.
+    """
+    time, profiles = load_household_profiles(path, [column], year, freq)
+    return time, profiles[:, 0]
+
+
+def load_household_profiles(path, columns, year, freq="h"):
+    """Consumption of several household meters, each normed to a total of 1 over the year.
+
+    Same as ``load_household_consumption`` for a list of meter columns, read in
+    one pass, as an array of shape ``(n_steps, len(columns))``. Raises
+    ValueError for meters without consumption in ``year``.
+    """
+    df_raw = pd.read_csv(path, usecols=['cet_cest_timestamp', *columns])
+    timestamps = pd.DatetimeIndex(parse_opsd_timestamp(df_raw['cet_cest_timestamp'])).tz_localize("UTC")
+    # Label the energy between two readings with the earlier one, i.e. with the start of its interval
+    df_cons = pd.DataFrame(df_raw[list(columns)].to_numpy(), index=timestamps, columns=columns) \
+        .diff().shift(-1).resample(freq).sum()
+    df_filtered = df_cons[(df_cons.index >= pd.Timestamp(f"{year}-01-01", tz="UTC"))
+                          & (df_cons.index <= pd.Timestamp(f"{year}-12-31 23:59:59", tz="UTC"))]
+    totals = df_filtered.sum()
+    empty = [column for column in columns if not totals[column] > 0]
+    if empty:
+        raise ValueError(f"No consumption in {year} for {empty}")
+    return df_filtered.index, df_filtered.to_numpy() / totals.to_numpy()
+
+
+def household_columns(path):
+    """Names of all household grid import meters in an Open Power System Data file"""
+    header = pd.read_csv(path, nrows=0).columns
+    return [column for column in header if "residential" in column and column.endswith("_grid_import")]
+
+
+def interpolate_hourly(time, values, steps_per_hour):
+    """Resample hourly series to ``steps_per_hour`` steps per hour by linear interpolation.
+
+    ``time`` is any time within each hour, e.g. the PVGIS ``HH:10`` stamps.
+    Each hourly value is taken as the mean over its hour and placed at the
+    middle of the hour; the sub-hourly steps are sampled at their own middle.
+    Summed over a day or year the energy stays the same, apart from gaps in
+    the data. Returns the start of each sub-hourly step and the list of
+    resampled series.
+    """
+    step_minutes = 60 // steps_per_hour
+    hour_start = np.asarray(time).astype("datetime64[h]").astype("datetime64[m]")
+    offsets = np.arange(steps_per_hour) * step_minutes
+    step_start = (hour_start[:, None] + offsets.astype("timedelta64[m]")).ravel()
+
+    minutes = hour_start.astype(np.int64)
+    hour_middle = minutes + 30.0
+    step_middle = (minutes[:, None] + offsets + step_minutes / 2).ravel()
+    return step_start, [np.interp(step_middle, hour_middle, np.asarray(series, dtype=np.float64))
+                        for series in values]
+
+
+def calendar_hour_index(month, day, hour):
+    """Position of (month, day, hour) in an hourly leap-year calendar, 0 ... 366*24-1.
+
+    29 February always has its own slot, so the same calendar hour of any year
+    maps to the same position.
+    """
+    day_of_year = _LEAP_YEAR_MONTH_OFFSETS[np.asarray(month) - 1] + np.asarray(day) - 1
+    return day_of_year * 24 + np.asarray(hour)
+
+
+def calendar_step_index(month, day, hour, minute, steps_per_hour=1):
+    """Like ``calendar_hour_index`` for a calendar with ``steps_per_hour`` steps per hour"""
+    step = np.asarray(minute) // (60 // steps_per_hour)
+    return calendar_hour_index(month, day, hour) * steps_per_hour + step
+
+
+def align_profile_to_calendar(profile_time, local_time, steps_per_hour=1):
+    """Index of the profile step with the same calendar time for every local time step.
+
+    Returns ``(index, valid)``: ``valid`` is False where the profile has no such
+    step, which are the steps an inner merge on (month, day, hour) would drop.
+    This makes the two special cases explicit:
+
+    * Leap days: 29 February of a weather year is only matched if the profile
+      year is a leap year, and the profile's 29 February is unused otherwise.
+    * DST: weather steps use local wall-clock time. The skipped hour in spring
+      has no step, and the repeated hour in autumn occurs twice and is mapped
+      to the same profile hour both times.
+
+    With ``steps_per_hour`` > 1 both series are matched per sub-hourly step,
+    e.g. per quarter hour, instead of per hour.
+    """
+    profile_time = pd.DatetimeIndex(profile_time)
+    lookup = np.full(366 * 24 * steps_per_hour, -1, dtype=np.int64)
+    lookup[calendar_step_index(profile_time.month, profile_time.day, profile_time.hour,
+                               profile_time.minute, steps_per_hour)] = np.arange(len(profile_time))
+
+    local_time = pd.DatetimeIndex(local_time)
+    index = lookup[calendar_step_index(local_time.month, local_time.day, local_time.hour,
+                                       local_time.minute, steps_per_hour)]
+    valid = index >= 0
+    return index, valid
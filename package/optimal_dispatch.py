@@ -0,0 +1,251 @@
+"""Cost-optimal battery dispatch for time-varying tariffs, by rolling-horizon dynamic programming.
+
+The value functions of all windows are computed together, vectorised over
+windows; only the forward pass that follows the state of charge is sequential.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from dispatch import greedy_dispatch
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, see the "jit" extra in pyproject.toml
+    njit = None
+
+DISPATCH_STRATEGIES = ('greedy', 'optimal')
+
+# A plan only replaces the greedy step if it is cheaper by more than this, in EUR
+_TIE_TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class Tariff:
+    """Import and export price in EUR per kWh, constant or one value per time step"""
+    import_price: object = 0.30
+    export_price: object = 0.08
+
+    @classmethod
+    def time_of_use(cls, hour, prices_by_hour, export_price=0.08):
+        """Tariff with an import price per hour of the day, e.g. from ``dataset.calendar['hour']``"""
+        prices_by_hour = np.asarray(prices_by_hour, dtype=np.float64)
+        if prices_by_hour.shape != (24,):
+            raise ValueError(f"prices_by_hour must have 24 entries, got shape {prices_by_hour.shape}")
+        return cls(prices_by_hour[np.asarray(hour)], export_price)
+
+    def prices(self, n_steps):
+        """Import and export price per step as two float64 arrays of length ``n_steps``"""
+        return tuple(np.ascontiguousarray(np.broadcast_to(np.asarray(price, dtype=np.float64), (n_steps,)))
+                     for price in (self.import_price, self.export_price))
+
+    def energy_cost(self, pv_kW, consumption_kW, from_grid_kW, battery_charge_kWh, battery_discharge_kWh,
+                    battery_charge_efficiency):
+        """Cost of the grid import minus the revenue of the feed-in, per step"""
+        import_price, export_price = self.prices(len(from_grid_kW))
+        feed_in = pv_kW + from_grid_kW + battery_discharge_kWh - consumption_kW \
+            - battery_charge_kWh / battery_charge_efficiency
+        return import_price * from_grid_kW - export_price * np.maximum(feed_in, 0.0)
+
+
+def optimal_dispatch(pv_kW, consumption_kW, import_price, export_price, battery_capacity_kWh,
+                     battery_discharge_cutoff_limit, battery_charge_efficiency, battery_max_power_kW,
+                     horizon=48, commit=24, soc_bins=41, grid_charging=False, initial_soc_kWh=None,
+                     chunk_windows=512, use_jit=True):
+    """Dispatch the battery for the lowest energy cost over rolling windows.
+
+    Same battery parameters and outputs as :func:`dispatch.greedy_dispatch`. Each
+    window plans ``horizon`` steps on ``soc_bins`` state of charge bins and carries
+    out the first ``commit``; energy left at its end is valued at the window's
+    mean import price. The battery charges from PV surplus only, unless
+    ``grid_charging``, and never discharges into the grid; ties keep the greedy step.
+    """
+    pv = np.ascontiguousarray(pv_kW, dtype=np.float64)
+    consumption = np.ascontiguousarray(consumption_kW, dtype=np.float64)
+    if pv.shape != consumption.shape or pv.ndim != 1:
+        raise ValueError("pv_kW and consumption_kW must be 1-D arrays of equal length")
+    if not 1 <= commit <= horizon:
+        raise ValueError(f"commit must be between 1 and horizon ({horizon}), got {commit}")
+    if soc_bins < 2:
+        raise ValueError(f"soc_bins must be at least 2, got {soc_bins}")
+    n = len(pv)
+    import_price = np.ascontiguousarray(np.broadcast_to(np.asarray(import_price, dtype=np.float64), (n,)))
+    export_price = np.ascontiguousarray(np.broadcast_to(np.asarray(export_price, dtype=np.float64), (n,)))
+
+    capacity = float(battery_capacity_kWh)
+    min_soc = capacity * battery_discharge_cutoff_limit
+    if capacity - min_soc <= 0:
+        # Nothing to plan without usable capacity
+        return greedy_dispatch(pv, consumption, battery_capacity_kWh, battery_discharge_cutoff_limit,
+                               battery_charge_efficiency, battery_max_power_kW, initial_soc_kWh,
+                               use_jit=use_jit)
+    battery = (capacity, min_soc, float(battery_charge_efficiency), float(battery_max_power_kW),
+               (capacity - min_soc) / (soc_bins - 1), bool(grid_charging))
+
+    surplus = np.maximum(pv - consumption, 0.0)
+    deficit = np.maximum(consumption - pv, 0.0)
+    values = _window_values(surplus, deficit, import_price, export_price, battery, soc_bins,
+                            horizon, commit, chunk_windows)
+
+    soc = capacity / 2 if initial_soc_kWh is None else float(initial_soc_kWh)
+    out = tuple(np.empty(n, dtype=np.float64) for _ in range(4))
+    kernel = _forward_pass_jit if use_jit and _forward_pass_jit is not None else _forward_pass
+    kernel(surplus, deficit, import_price, export_price, values, commit, soc, *battery, *out)
+    return out
+
+
+def _window_values(surplus, deficit, import_price, export_price, battery, n_bins, horizon, commit,
+                   chunk_windows):
+    """Value function after each committed step of every window, shape ``(n_windows, commit, n_bins)``.
+
+    ``values[w, j]`` is the lowest cost from step ``w * commit + j + 1`` to the
+    end of window ``w``, by state of charge bin.
+    """
+    capacity, min_soc, efficiency, max_power, bin_kWh, grid_charging = battery
+    n = len(surplus)
+    n_windows = -(-n // commit)
+    soc = min_soc + bin_kWh * np.arange(n_bins)
+
+    # Candidate targets of every bin: a band of neighbouring bins reachable at full power, ...
+    reach = min(int(np.ceil(max_power / bin_kWh)), n_bins - 1)
+    offsets = np.arange(-reach, reach + 1)
+    targets = np.arange(n_bins)[:, None] + offsets
+    outside = (targets < 0) | (targets >= n_bins)
+    targets = np.clip(targets, 0, n_bins - 1)
+    # The change of a move depends only on the offset, so its step cost is the same for every bin
+    change = offsets * bin_kWh
+
+    # ... and the continuous limits: full discharge, full charge and charging all PV surplus
+    room = np.minimum(capacity - soc, max_power)
+    usable = np.minimum(soc - min_soc, max_power)
+
+    values = np.empty((n_windows, commit, n_bins))
+    # Steps beyond the series are padded with no PV, no consumption and no price
+    padded = n_windows * commit + horizon
+    series = [np.zeros(padded) for _ in range(4)]
+    for padded_values, values_in in zip(series, (surplus, deficit, import_price, export_price)):
+        padded_values[:n] = values_in
+    surplus, deficit, import_price, export_price = series
+
+    for first in range(0, n_windows, chunk_windows):
+        windows = np.arange(first, min(first + chunk_windows, n_windows))
+        steps = windows[:, None] * commit + np.arange(horizon)
+        # Terminal value: stored energy saves its cost at the mean import price of the window
+        end_price = import_price[steps].mean(axis=1)
+        value = -end_price[:, None] * (soc - min_soc)
+
+        for j in range(horizon - 1, -1, -1):
+            step = steps[:, j][:, None]
+            u, v = surplus[step], deficit[step]
+            p, e = import_price[step], export_price[step]
+            charge_limit = room if grid_charging else np.minimum(room, efficiency * u)
+            low = soc - np.minimum(usable, v)
+            high = soc + charge_limit
+
+            # Moves to the bins of the band, infeasible ones cost infinity
+            cost = value[:, targets]
+            cost += _step_cost(0.0, change, u, v, p, e, efficiency)[:, None, :]
+            infeasible = outside | (change < (low - soc)[..., None] - 1e-12) \
+                | (change > charge_limit[..., None] + 1e-12)
+            cost[np.broadcast_to(infeasible, cost.shape)] = np.inf
+            best = cost.min(axis=2)
+
+            # Moves to the continuous limits, with the value interpolated between bins
+            for target in (low, high, soc + np.minimum(room, efficiency * u)):
+                target = np.broadcast_to(np.minimum(target, high), value.shape)
+                cost = _step_cost(soc, target, u, v, p, e, efficiency) \
+                    + _interpolate(value, target, min_soc, bin_kWh)
+                best = np.minimum(best, cost)
+
+            value = best
+            if j >= 1 and j <= commit:
+                values[windows, j - 1] = value
+        if horizon == commit:
+            # The last committed step of a window ends at the window's terminal value
+            values[windows, commit - 1] = -end_price[:, None] * (soc - min_soc)
+    return values
+
+
+def _step_cost(soc, target, surplus, deficit, import_price, export_price, efficiency):
+    """Energy cost of moving the state of charge from ``soc`` to ``target`` in one step"""
+    change = target - soc
+    drawn = np.maximum(change, 0.0) / efficiency
+    from_grid = deficit - np.maximum(-change, 0.0) + np.maximum(drawn - surplus, 0.0)
+    feed_in = np.maximum(surplus - drawn, 0.0)
+    return import_price * from_grid - export_price * feed_in
+
+
+def _interpolate(value, soc, min_soc, bin_kWh):
+    """Linear interpolation of the value per bin, ``value`` of shape (windows, bins)"""
+    n_bins = value.shape[1]
+    position = np.clip((soc - min_soc) / bin_kWh, 0, n_bins - 1)
+    lower = np.minimum(position.astype(np.int64), n_bins - 2)
+    fraction = position - lower
+    low = np.take_along_axis(value, lower, axis=1)
+    high = np.take_along_axis(value, lower + 1, axis=1)
+    return low + (high - low) * fraction
+
+
+def _forward_pass(surplus, deficit, import_price, export_price, values, commit, soc,
+                  capacity, min_soc, efficiency, max_power, bin_kWh, grid_charging,
+                  soc_out, grid_out, charge_out, discharge_out):
+    """Follow the state of charge through all steps, choosing each move by the stored value functions.
+
+    The candidates of a step are the greedy move, the continuous limits,
+    staying idle and every bin in between; a candidate replaces the greedy
+    move only if it is cheaper by more than the tie tolerance.
+    """
+    n_bins = values.shape[2]
+    for i in range(len(surplus)):
+        w = i // commit
+        j = i - w * commit
+        u = surplus[i]
+        v = deficit[i]
+        room = max(min(capacity - soc, max_power), 0.0)
+        usable = max(min(soc - min_soc, max_power), 0.0)
+        pv_charge = min(room, efficiency * u)
+        low = soc - min(usable, v)
+        high = soc + (room if grid_charging else pv_charge)
+        first_bin = int(np.ceil((low - min_soc) / bin_kWh - 1e-9))
+        last_bin = int(np.floor((high - min_soc) / bin_kWh + 1e-9))
+
+        best_target = soc
+        best_cost = np.inf
+        for k in range(-4, last_bin - first_bin + 1):
+            if k == -4:
+                target = soc + pv_charge if u > 0.0 else low  # the greedy move
+            elif k == -3:
+                target = low
+            elif k == -2:
+                target = high
+            elif k == -1:
+                target = soc
+            else:
+                target = min(max(min_soc + (first_bin + k) * bin_kWh, low), high)
+
+            change = target - soc
+            drawn = change / efficiency if change > 0.0 else 0.0
+            discharge = -change if change < 0.0 else 0.0
+            from_grid = v - discharge + (drawn - u if drawn > u else 0.0)
+            feed_in = u - drawn if u > drawn else 0.0
+            position = min(max((target - min_soc) / bin_kWh, 0.0), n_bins - 1.0)
+            lower = min(int(position), n_bins - 2)
+            fraction = position - lower
+            future = values[w, j, lower] + (values[w, j, lower + 1] - values[w, j, lower]) * fraction
+            cost = import_price[i] * from_grid - export_price[i] * feed_in + future
+            if cost < best_cost - _TIE_TOLERANCE:
+                best_cost = cost
+                best_target = target
+
+        change = best_target - soc
+        charge = change if change > 0.0 else 0.0
+        discharge = -change if change < 0.0 else 0.0
+        drawn = charge / efficiency
+        soc = best_target
+        soc_out[i] = soc
+        grid_out[i] = v - discharge + (drawn - u if drawn > u else 0.0)
+        charge_out[i] = charge
+        discharge_out[i] = discharge
+
+
+_forward_pass_jit = njit(cache=True)(_forward_pass) if njit is not None else None
@@ -0,0 +1,184 @@
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import battery_simulation
+
+# Golden ratio conjugate, step of the golden-section search
+_INVERSE_PHI = (math.sqrt(5) - 1) / 2
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """Investment and tariff assumptions for the economic evaluation.
+
+    ``battery_prices`` maps capacities in kWh to prices in EUR and is linearly
+    interpolated, or is a callable. ``grid_tariff`` is earned per kWh of PV
+    energy used on site, ``feed_in_tariff`` per kWh fed in, and
+    ``annual_running_cost`` is the yearly cost net of fixed income. The net
+    present value is taken over ``horizon_years`` at ``discount_rate``.
+    """
+    battery_prices: object = field(default_factory=lambda: {
+        0: 0, 6.5: 14750, 9.75: 16200, 13: 17700, 16.25: 19400, 19.5: 21000})
+    pv_cost_per_kWp: float = 715 / 0.46
+    fixed_cost: float = 3087
+    grid_tariff: float = 0.25
+    feed_in_tariff: float = 0.0
+    annual_running_cost: float = 480 - 180
+    horizon_years: int = 20
+    discount_rate: float = 0.0
+
+    def battery_price(self, battery_capacity_kWh):
+        if callable(self.battery_prices):
+            return float(self.battery_prices(battery_capacity_kWh))
+        capacities = sorted(self.battery_prices)
+        return float(np.interp(battery_capacity_kWh, capacities, [self.battery_prices[c] for c in capacities]))
+
+    def battery_capacity_range(self):
+        """Smallest and largest capacity covered by the price table"""
+        if callable(self.battery_prices):
+            raise ValueError("battery_bounds must be given when battery_prices is a callable")
+        return min(self.battery_prices), max(self.battery_prices)
+
+    def investment(self, installed_power_kWp, battery_capacity_kWh):
+        return self.pv_cost_per_kWp * installed_power_kWp + self.fixed_cost \
+            + self.battery_price(battery_capacity_kWh)
+
+    def annual_cash_flow(self, avg_pv_used, avg_pv_total):
+        return avg_pv_used * self.grid_tariff + (avg_pv_total - avg_pv_used) * self.feed_in_tariff \
+            - self.annual_running_cost
+
+    def evaluate(self, installed_power_kWp, battery_capacity_kWh, avg_pv_used, avg_pv_total):
+        """Return investment, yearly cash flow, payback time in years and net present value"""
+        investment = self.investment(installed_power_kWp, battery_capacity_kWh)
+        cash_flow = self.annual_cash_flow(avg_pv_used, avg_pv_total)
+        payback_years = investment / cash_flow if cash_flow > 0 else math.inf
+        if self.discount_rate == 0:
+            annuity = self.horizon_years
+        else:
+            annuity = (1 - (1 + self.discount_rate) ** -self.horizon_years) / self.discount_rate
+        return {
+            'investment': investment,
+            'annual_cash_flow': cash_flow,
+            'payback_years': payback_years,
+            'npv': cash_flow * annuity - investment,
+        }
+
+
+@dataclass(frozen=True)
+class OptimizationResult:
+    """Best configuration found by optimize_configuration"""
+    parameters: dict
+    objective: str
+    investment: float
+    annual_cash_flow: float
+    payback_years: float
+    npv: float
+    stats: battery_simulation.SimulationStats
+    n_evaluations: int
+    history: pd.DataFrame
+
+
+def optimize_configuration(cost_model=None, total_power_kWp=15, objective='payback',
+                           battery_bounds=None, oso_share_bounds=(0.0, 1.0),
+                           battery_step=0.05, power_step=0.1, tolerance=None,
+                           max_rounds=6, dataset=None, **parameters):
+    """Find the battery capacity and east/west split with the best economics.
+
+    Minimises the payback time (``objective='payback'``) or maximises the net
+    present value (``objective='npv'``) for a fixed total PV power. The two
+    variables are optimised by coordinate descent, each line search being a
+    bounded golden-section search. Every simulation is memoised on the
+    configuration rounded to ``battery_step`` and ``power_step``, so repeated
+    points cost nothing and the search stops once it only revisits them.
+
+    ``battery_bounds`` defaults to the range of the price table and
+    ``oso_share_bounds`` limits the OSO share of ``total_power_kWp``. The
+    search stops when a round improves the objective by less than
+    ``tolerance``, by default 0.01 years or 1 EUR. Further keyword arguments
+    are passed on to ``run_pv_battery_simulation``.
+    """
+    if objective not in ('payback', 'npv'):
+        raise ValueError(f"objective must be 'payback' or 'npv', got {objective!r}")
+    if cost_model is None:
+        cost_model = CostModel()
+    if battery_bounds is None:
+        battery_bounds = cost_model.battery_capacity_range()
+    if tolerance is None:
+        tolerance = 0.01 if objective == 'payback' else 1.0
+    power_bounds = (oso_share_bounds[0] * total_power_kWp, oso_share_bounds[1] * total_power_kWp)
+
+    evaluations = {}
+
+    def evaluate(battery_capacity_kWh, installed_power_oso_kWp):
+        battery_capacity_kWh = _snap(battery_capacity_kWh, battery_step, battery_bounds)
+        installed_power_oso_kWp = _snap(installed_power_oso_kWp, power_step, power_bounds)
+        key = (battery_capacity_kWh, installed_power_oso_kWp)
+        if key not in evaluations:
+            stats = battery_simulation.simulate_stats(
+                dataset,
+                battery_capacity_kWh=battery_capacity_kWh,
+                installed_power_oso_kWp=installed_power_oso_kWp,
+                installed_power_wnw_kWp=total_power_kWp - installed_power_oso_kWp,
+                **parameters
+            )
+            economics = cost_model.evaluate(total_power_kWp, battery_capacity_kWh, stats.avg_pv_used,
+                                            stats.annual_sums[:, 0].mean())
+            loss = economics['payback_years'] if objective == 'payback' else -economics['npv']
+            evaluations[key] = (loss, stats, economics)
+        return evaluations[key][0]
+
+    battery = (battery_bounds[0] + battery_bounds[1]) / 2
+    power_oso = (power_bounds[0] + power_bounds[1]) / 2
+    best = evaluate(battery, power_oso)
+    for _ in range(max_rounds):
+        previous = best
+        battery = _golden_section(lambda x: evaluate(x, power_oso), *battery_bounds, battery_step)
+        power_oso = _golden_section(lambda x: evaluate(battery, x), *power_bounds, power_step)
+        best = evaluate(battery, power_oso)
+        if not previous - best >= tolerance:  # also stops if no finite payback was found
+            break
+
+    history = pd.DataFrame(
+        [{'battery_capacity_kWh': b, 'installed_power_oso_kWp': p, **economics}
+         for (b, p), (_, _, economics) in evaluations.items()])
+    _, stats, economics = min(evaluations.values(), key=lambda evaluation: evaluation[0])
+    return OptimizationResult(
+        parameters={**stats.parameters},
+        objective=objective,
+        stats=stats,
+        n_evaluations=len(evaluations),
+        history=history,
+        **economics,
+    )
+
+
+def _snap(value, step, bounds):
+    """Round to the search grid and clip to the bounds"""
+    value = round(round(value / step) * step, 10)
+    return min(max(value, bounds[0]), bounds[1])
+
+
+def _golden_section(f, lower, upper, resolution):
+    """Minimise a unimodal function on [lower, upper] to the given resolution.
+
+    Also compares the interval ends, so that a minimum on the boundary
+    (e.g. no battery) is not missed.
+    """
+    a, b = lower, upper
+    c = b - _INVERSE_PHI * (b - a)
+    d = a + _INVERSE_PHI * (b - a)
+    fc, fd = f(c), f(d)
+    while b - a > resolution:
+        if fc <= fd:
+            b, d, fd = d, c, fc
+            c = b - _INVERSE_PHI * (b - a)
+            fc = f(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + _INVERSE_PHI * (b - a)
+            fd = f(d)
+    candidates = [(fc, c), (fd, d), (f(lower), lower), (f(upper), upper)]
+    return min(candidates)[1]
@@ -0,0 +1,283 @@
+"""PVGIS hourly series for any number of roof orientations, downloaded concurrently and cached.
+
+``OrientationSeries`` stacks them into one ``(n_steps, n_orientations)`` array,
+so the PV output of any kWp mix is a single matrix-vector product.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+import numpy as np
+
+import data_cache
+import dataset as dataset_module
+import loader
+from dataset import SimulationDataset
+
+PVGIS_BASE_URL = "https://re.jrc.ec.europa.eu/api/v5_3/seriescalc"
+
+# Query of the two existing roof files, except for angle and aspect
+PVGIS_QUERY = {
+    'lat': 48.865,
+    'lon': 9.314,
+    'startyear': 2005,
+    'endyear': 2023,
+    'raddatabase': 'PVGIS-SARAH3',
+    'pvcalculation': 1,
+    'peakpower': 1,
+    'loss': 14,
+    'pvtechchoice': 'crystSi',
+    'outputformat': 'json',
+}
+
+PVGIS_CACHE_DIR = os.path.join(dataset_module.DATA_DIR, ".pvgis")
+
+# HTTP status codes worth another attempt: rate limit and server errors
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_REQUEST_INDEX = "requests.json"
+
+
+def orientation_grid(slopes, aspects):
+    """All (slope, aspect) combinations in degrees; PVGIS aspect 0 = south, -90 = east"""
+    return [(float(slope), float(aspect)) for slope in slopes for aspect in aspects]
+
+
+class PVGISClient:
+    """Fetches PVGIS hourly series with at most ``max_connections`` concurrent requests.
+
+    Responses are stored once under their SHA-256 in ``cache_dir/objects`` and
+    indexed by request URL, so no series is requested twice. Connection errors,
+    timeouts, 429 and 5xx answers are retried ``retries`` times, waiting
+    ``backoff`` seconds and twice as long for every further attempt. ``query``
+    overrides ``PVGIS_QUERY``, e.g. ``lat``, ``lon`` or ``startyear``.
+    """
+
+    def __init__(self, base_url=PVGIS_BASE_URL, cache_dir=PVGIS_CACHE_DIR, max_connections=4,
+                 retries=3, backoff=1.0, timeout=60, **query):
+        if max_connections < 1:
+            raise ValueError(f"max_connections must be at least 1, got {max_connections}")
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.query = {**PVGIS_QUERY, **query}
+        self.downloads = 0
+
+    def url(self, slope, aspect):
+        """Request URL of one orientation, with the query in a fixed order"""
+        query = {**self.query, 'angle': slope, 'aspect': aspect}
+        return f"{self.base_url}?{urlencode(sorted(query.items()))}"
+
+    def fetch(self, orientations, progress=None):
+        """Paths of the cached responses for ``orientations``, downloading the missing ones.
+
+        ``progress`` is called as ``progress(done, total)`` after each download.
+        Also works where an event loop is already running, e.g. in Jupyter.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_async(orientations, progress))
+        # asyncio.run cannot be nested, run the downloads in a loop of their own
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.fetch_async(orientations, progress)).result()
+
+    async def fetch_async(self, orientations, progress=None):
+        """Coroutine version of ``fetch``"""
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        index = _read_json(os.path.join(self.cache_dir, _REQUEST_INDEX))
+        urls = [self.url(slope, aspect) for slope, aspect in orientations]
+        missing = sorted({url for url in urls
+                          if url not in index or not os.path.exists(self._object_path(index[url]))})
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(self.max_connections)
+            done = 0
+
+            async def download(url):
+                nonlocal done
+                async with semaphore:
+                    digest = await self._download(loop, executor, url)
+                done += 1
+                if progress is not None:
+                    progress(done, len(missing))
+                return digest
+
+            with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+                digests = await asyncio.gather(*(download(url) for url in missing))
+            # Re-read, another process may have added entries in the meantime
+            index = _read_json(os.path.join(self.cache_dir, _REQUEST_INDEX))
+            index.update(zip(missing, digests))
+            data_cache._write_json_atomic(os.path.join(self.cache_dir, _REQUEST_INDEX), index)
+
+        return [self._object_path(index[url]) for url in urls]
+
+    def load(self, orientations, resolution="h", dtype=np.float64, progress=None):
+        """Fetch ``orientations`` and return them stacked and aligned, see ``OrientationSeries``.
+
+        Each response is parsed once and kept as a memory-mapped array; the
+        stacked, aligned arrays of a grid are cached as well.
+        """
+        orientations = [(float(slope), float(aspect)) for slope, aspect in orientations]
+        paths = self.fetch(orientations, progress)
+        dtype = np.dtype(dtype)
+        options = {**dataset_module.PREPROCESSING_OPTIONS, 'orientations': orientations,
+                   'resolution': resolution, 'dtype': dtype.name}
+
+        def build():
+            return _build_orientation_arrays(paths, resolution, dtype, self.cache_dir)
+
+        arrays = data_cache.load_or_build(paths + [dataset_module.PATH_CONSUMPTION], options, build,
+                                          os.path.join(self.cache_dir, "stacked"))
+        return OrientationSeries(
+            time=np.asarray(arrays['time']),
+            year=np.asarray(arrays['year']),
+            power=np.asarray(arrays['power']),
+            consumption_kW_normed=np.asarray(arrays['consumption_kW_normed']),
+            orientations=tuple(orientations),
+            step_hours=1 / dataset_module.STEPS_PER_HOUR[resolution],
+        )
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", f"{digest}.json")
+
+    async def _download(self, loop, executor, url):
+        for attempt in range(self.retries + 1):
+            try:
+                content = await loop.run_in_executor(executor, self._get, url)
+                self.downloads += 1
+                break
+            except (urllib.error.HTTPError, urllib.error.URLError, socket.timeout, TimeoutError,
+                    ConnectionError) as error:
+                retry = not isinstance(error, urllib.error.HTTPError) or error.code in _RETRY_STATUS
+                if not retry or attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        if b'"hourly"' not in content:
+            raise ValueError(f"No hourly series in the PVGIS response of {url}")
+
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            # Write under a temporary name first so readers never see half a file
+            handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(handle, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _get(self, url):
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return response.read()
+
+
+@dataclass(frozen=True, eq=False)
+class OrientationSeries:
+    """PV output in W of 1 kWp per orientation, one column of ``power`` per entry of ``orientations``.
+
+    Aligned with the consumption profile like ``SimulationDataset``.
+    """
+    time: np.ndarray
+    year: np.ndarray
+    power: np.ndarray
+    consumption_kW_normed: np.ndarray
+    orientations: tuple
+    step_hours: float = 1.0
+
+    def __post_init__(self):
+        if self.power.shape != (len(self.time), len(self.orientations)):
+            raise ValueError(f"power must have shape ({len(self.time)}, {len(self.orientations)}), "
+                             f"got {self.power.shape}")
+        power = self.power.view()
+        power.flags.writeable = False
+        object.__setattr__(self, 'power', power)
+
+    def index(self, slope, aspect):
+        """Column of the given orientation"""
+        return self.orientations.index((float(slope), float(aspect)))
+
+    def weights(self, kWp):
+        """kWp per column from a vector or a dict ``{(slope, aspect): kWp}``"""
+        if isinstance(kWp, dict):
+            weights = np.zeros(len(self.orientations))
+            for (slope, aspect), value in kWp.items():
+                weights[self.index(slope, aspect)] += value
+            return weights
+        weights = np.asarray(kWp, dtype=np.float64)
+        if weights.shape != (len(self.orientations),):
+            raise ValueError(f"Expected one kWp value per orientation ({len(self.orientations)}), "
+                             f"got shape {weights.shape}")
+        return weights
+
+    def combine(self, kWp):
+        """PV output in W of a plant with ``kWp`` per orientation, one matrix-vector product"""
+        return self.power @ self.weights(kWp)
+
+    def dataset(self, oso, wnw=None, name=""):
+        """A ``SimulationDataset`` whose roof sides are the kWp mixes ``oso`` and ``wnw``, see ``combine``.
+
+        Each side is normalised to 1 kWp, so set ``installed_power_*_kWp`` to the
+        total kWp of its mix. Without ``wnw`` that side produces nothing.
+        """
+        sides = []
+        for kWp in (oso, wnw):
+            if kWp is None:
+                sides.append(np.zeros(len(self.time), dtype=self.power.dtype))
+                continue
+            weights = self.weights(kWp)
+            sides.append((self.power @ (weights / weights.sum())).astype(self.power.dtype, copy=False))
+        return SimulationDataset(self.time, self.year, sides[0], sides[1], self.consumption_kW_normed,
+                                 name=name, step_hours=self.step_hours)
+
+
+def _parsed_series(path, cache_dir):
+    """Time and output of one cached response, parsed on first use only"""
+    arrays = data_cache.load_or_build(
+        [path], {'series': 'pvgis_hourly', 'object': os.path.basename(path)},
+        lambda: dict(zip(('time', 'P'), loader.load_pvgis_hourly(path))),
+        os.path.join(cache_dir, "parsed"))
+    return arrays['time'], arrays['P']
+
+
+def _build_orientation_arrays(paths, resolution, dtype, cache_dir):
+    """Stack the series of ``paths`` over their common hours and align them with the consumption"""
+    series = [_parsed_series(path, cache_dir) for path in paths]
+    time_utc = series[0][0]
+    for other_time, _ in series[1:]:
+        if not np.array_equal(other_time, time_utc):
+            time_utc = np.intersect1d(time_utc, other_time)
+    columns = [np.asarray(values)[np.searchsorted(np.asarray(times), time_utc)] for times, values in series]
+
+    local_time, columns = dataset_module._pv_weather_years(time_utc, columns, resolution)
+    options = dataset_module.PREPROCESSING_OPTIONS
+    consumption_time, consumption_normed = loader.load_household_consumption(
+        dataset_module.PATH_CONSUMPTION, options['consumption_column'], options['consumption_year'],
+        freq=resolution)
+    index, valid = loader.align_profile_to_calendar(consumption_time, local_time,
+                                                    dataset_module.STEPS_PER_HOUR[resolution])
+    return {
+        'time': local_time[valid].floor(resolution).to_numpy(),
+        'year': local_time.year[valid].to_numpy().astype(np.int64),
+        'power': np.stack(columns, axis=1)[valid].astype(dtype, copy=False),
+        'consumption_kW_normed': consumption_normed[index[valid]].astype(dtype, copy=False),
+    }
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
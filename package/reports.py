@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+import battery_simulation
+from aggregates import ReportAggregates
+from dataset import default_dataset
+from sweep import parameter_grid
+
+# Page layout of the current worker process, built on its first report and reused afterwards
+_layout = None
+
+
+def _init_worker():
+    """Worker initializer: never pick an interactive backend, even if some module imports pyplot"""
+    matplotlib.use("Agg")
+
+
+def _render_report(aggregates, pdf_filename):
+    global _layout
+    if _layout is None:
+        _layout = battery_simulation.ReportLayout()
+    return _layout.render(aggregates, pdf_filename)
+
+
+def generate_reports(scenarios, output_dir=".", dataset=None, max_workers=None, progress=None, use_jit=True):
+    """Write one PDF report per scenario, rendered in parallel over a process pool.
+
+    The simulations run in the calling process, which only sends the small
+    ``ReportAggregates`` of each scenario to the workers. Every worker keeps one
+    ``battery_simulation.ReportLayout`` and refills it for each report, so the
+    figures are built once per process instead of once per page.
+
+    ``scenarios`` are parameter sets as for ``sweep.run_sweep``, and
+    ``progress`` is called as ``progress(reports_done, reports_total)``.
+    Returns the normalised scenarios with the path of each report in
+    ``pdf_filename``; files are named by ``battery_simulation.report_filename``,
+    so running the same scenario again overwrites its report.
+    """
+    if isinstance(scenarios, dict):
+        scenarios = parameter_grid(**scenarios)
+    params = battery_simulation._normalize_params(scenarios)
+    records = params.to_dict('records')
+    filenames = [os.path.join(output_dir, battery_simulation.report_filename(record)) for record in records]
+
+    if dataset is None:
+        dataset = default_dataset()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Identical scenarios share one file, render it only once
+    unique = dict(zip(filenames, records))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(unique)))
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        futures = []
+        for pdf_filename, record in unique.items():
+            result = battery_simulation.simulate(dataset, use_jit=use_jit, **record)
+            futures.append(executor.submit(_render_report, ReportAggregates.from_result(result), pdf_filename))
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+            if progress is not None:
+                progress(done, len(unique))
+
+    return params.assign(pdf_filename=filenames)
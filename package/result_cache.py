@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import battery_simulation
+from battery_simulation import SIMULATION_DEFAULTS, SimulationStats, _resolve_parameters
+from dataset import default_dataset
+from dispatch import STATS_COLUMNS
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "disk_hits", "misses", "maxsize", "currsize"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    years BLOB NOT NULL,
+    annual_sums BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_fingerprint ON results (fingerprint);
+"""
+
+
+class ResultCache:
+    """Memoises ``simulate_stats`` results per parameter set and dataset.
+
+    Keys are the seven parameters as floats plus ``SimulationDataset.fingerprint``.
+    ``maxsize`` bounds the in-memory LRU tier; ``path`` adds an unbounded SQLite
+    tier that survives restarts, e.g. ``ResultCache(path="data/.cache/results.sqlite")``.
+    """
+
+    def __init__(self, maxsize=16384, path=None):
+        if maxsize < 0:
+            raise ValueError(f"maxsize must not be negative, got {maxsize}")
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._disk_hits = self._misses = 0
+        self._connection = None
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def simulate_stats(self, dataset=None, use_jit=True, **parameters):
+        """``battery_simulation.simulate_stats``, computed only on a cache miss"""
+        if dataset is None:
+            dataset = default_dataset()
+        stats = self.get(dataset, parameters)
+        if stats is None:
+            stats = battery_simulation.simulate_stats(dataset, use_jit=use_jit, **parameters)
+            self.put(dataset, stats)
+        return stats
+
+    def get(self, dataset, parameters):
+        """The cached ``SimulationStats`` for ``parameters`` on ``dataset``, or None"""
+        key = _cache_key(dataset.fingerprint, _resolve_parameters(parameters))
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return stats
+            if self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT years, annual_sums FROM results WHERE key = ?", (_disk_key(key),)).fetchone()
+                if row is not None:
+                    stats = _stats_from_row(key, *row)
+                    self._remember(key, stats)
+                    self._disk_hits += 1
+                    return stats
+            self._misses += 1
+            return None
+
+    def put(self, dataset, stats):
+        """Store the result of one run on ``dataset``"""
+        self.put_many(dataset, [stats])
+
+    def put_many(self, dataset, results):
+        """Store several results of runs on ``dataset``, on disk in one transaction"""
+        fingerprint = dataset.fingerprint
+        keyed = [(_cache_key(fingerprint, stats.parameters), stats) for stats in results]
+        with self._lock:
+            for key, stats in keyed:
+                self._remember(key, stats)
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        [(_disk_key(key), fingerprint,
+                          np.ascontiguousarray(stats.years, dtype=np.int64).tobytes(),
+                          np.ascontiguousarray(stats.annual_sums, dtype=np.float64).tobytes())
+                         for key, stats in keyed])
+
+    def invalidate(self, dataset=None):
+        """Drop the entries of ``dataset``, or all entries, from memory and disk"""
+        fingerprint = None if dataset is None else dataset.fingerprint
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == fingerprint]:
+                    del self._entries[key]
+            if self._connection is not None:
+                with self._connection:
+                    if fingerprint is None:
+                        self._connection.execute("DELETE FROM results")
+                    else:
+                        self._connection.execute("DELETE FROM results WHERE fingerprint = ?", (fingerprint,))
+
+    def cache_info(self):
+        """Hit and miss counts like ``functools.lru_cache``; ``disk_hits`` are memory misses found on disk"""
+        with self._lock:
+            return CacheInfo(self._hits, self._disk_hits, self._misses, self.maxsize, len(self._entries))
+
+    def __len__(self):
+        """Number of entries in memory"""
+        return len(self._entries)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _remember(self, key, stats):
+        if self.maxsize == 0:
+            return
+        self._entries[key] = stats
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def _cache_key(fingerprint, params):
+    return (fingerprint,) + tuple(float(params[name]) for name in SIMULATION_DEFAULTS)
+
+
+def _disk_key(key):
+    # repr of a float round-trips exactly, so equal parameters give equal text
+    return json.dumps(key)
+
+
+def _stats_from_row(key, years, annual_sums):
+    params = dict(zip(SIMULATION_DEFAULTS, key[1:]))
+    annual_sums = np.frombuffer(annual_sums, dtype=np.float64).reshape(-1, len(STATS_COLUMNS))
+    return SimulationStats.from_annual_sums(params, np.frombuffer(years, dtype=np.int64), annual_sums)
@@ -0,0 +1,114 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import battery_simulation
+from aggregates import annual_metrics
+from dataset import default_dataset
+
+# View on the shared input block and its context, set up once per worker process by _attach_shared_rows
+_shared = {}
+
+
+def parameter_grid(**values):
+    """Build the cartesian product of parameter values as a table for run_sweep.
+
+    Example: ``parameter_grid(battery_capacity_kWh=[0, 6.5, 13], installed_power_oso_kWp=range(16))``
+    """
+    names = list(values)
+    rows = itertools.product(*(np.atleast_1d(values[name]) for name in names))
+    return pd.DataFrame(list(rows), columns=names)
+
+
+@contextmanager
+def _shared_rows(rows, dtype):
+    """Copy the equally long series ``rows`` into a new shared memory block.
+
+    Yields the arguments of ``_attach_shared_rows`` except its context; the
+    block is removed on exit.
+    """
+    shape = (len(rows), len(rows[0]))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, math.prod(shape) * np.dtype(dtype).itemsize))
+    try:
+        block = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        for k, values in enumerate(rows):
+            block[k] = values
+        # No view may outlive the block, or shm.close() fails
+        del block
+        yield shm.name, shape, dtype
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _attach_shared_rows(shm_name, shape, dtype, context):
+    """Worker initializer: map the block of ``_shared_rows`` instead of loading the data files again"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _shared.update(context, shm=shm, rows=np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _run_chunk(chunk_index, params, use_jit):
+    """Simulate one chunk of scenarios on the shared inputs, keeping only per-year sums"""
+    p_oso, p_wnw, consumption_smoothed = _shared['rows']
+    sums = battery_simulation._simulate_batch_arrays(
+        p_oso, p_wnw, consumption_smoothed, _shared['year_starts'], params,
+        step_hours=_shared['step_hours'], use_jit=use_jit)
+    metrics = annual_metrics(
+        sums['PV_total_kW'], sums['consumption_kW'], sums['from_grid_kW'])
+    return chunk_index, metrics
+
+
+def run_sweep(param_grid, dataset=None, max_workers=None, chunk_size=None, progress=None, use_jit=True):
+    """Run a parameter sweep in parallel over a process pool.
+
+    The hourly input series are loaded once in the calling process and placed
+    in a ``multiprocessing.shared_memory`` block that all workers map, so no
+    worker parses the data files. The grid is split into chunks, and each chunk
+    runs as one batch that keeps only per-year sums (see
+    ``dispatch.greedy_dispatch_batch_stats``), so a worker needs no memory per time step.
+
+    ``param_grid`` is a table like that of ``simulate_batch``, or a dict of
+    lists that is expanded with ``parameter_grid``. By default there is one
+    worker per CPU and about four chunks per worker; ``progress`` is called as
+    ``progress(scenarios_done, scenarios_total)`` whenever a chunk finishes.
+    The result has the layout of ``simulate_batch``, rows in grid order.
+    """
+    if isinstance(param_grid, dict):
+        param_grid = parameter_grid(**param_grid)
+    # Normalise the table (defaults, column order) before it is split up
+    params = battery_simulation._normalize_params(param_grid)
+
+    n_scenarios = len(params)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(n_scenarios / (4 * max_workers)))
+
+    if dataset is None:
+        dataset = default_dataset()
+    rows = [dataset.P_oso, dataset.P_wnw, dataset.consumption_smoothed]
+    # float32 datasets stay float32, the kernel reads them without a float64 copy
+    with _shared_rows(rows, np.result_type(*rows)) as block:
+        chunks = [params.iloc[start:start + chunk_size] for start in range(0, n_scenarios, chunk_size)]
+        results = [None] * len(chunks)
+        done = 0
+        context = {'year_starts': dataset.year_starts, 'step_hours': dataset.step_hours}
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_shared_rows,
+                                 initargs=(*block, context)) as executor:
+            futures = [executor.submit(_run_chunk, i, chunk, use_jit) for i, chunk in enumerate(chunks)]
+            for future in as_completed(futures):
+                chunk_index, metrics = future.result()
+                results[chunk_index] = metrics
+                done += len(chunks[chunk_index])
+                if progress is not None:
+                    progress(done, n_scenarios)
+
+    metrics = {name: np.concatenate([chunk[name] for chunk in results]) for name in results[0]} \
+        if results else {}
+    return params.assign(**metrics)
@@ -0,0 +1,212 @@
+"""Deterministic synthetic stand-ins for the PVGIS and household input files.
+
+The real data files are not part of the repository. This module writes files
+with the same names and layout as ``dataset.PATH_PV_OSO``, ``PATH_PV_WNW`` and
+``PATH_CONSUMPTION``, so the simulation, benchmarks and reports run in a clean
+checkout. The values follow a simple clear-sky model with random cloudiness
+and a household load with daily peaks; they are plausible, not real.
+
+Usage: ``python synthetic_data.py [DIRECTORY]`` writes the files into
+``DIRECTORY/data``. ``serve_pvgis`` starts a local stand-in for the PVGIS
+API that answers hourly series requests for any orientation.
+"""
+import argparse
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import dataset
+
+# Path of the PVGIS endpoint answered by serve_pvgis
+PVGIS_PATH = "/api/v5_3/seriescalc"
+
+LATITUDE = 48.865
+LONGITUDE = 9.314
+
+# (path, slope in degrees, PVGIS aspect in degrees: 0 = south, -90 = east) of the two roof sides
+PV_SIDES = [
+    (dataset.PATH_PV_OSO, 42, -75),
+    (dataset.PATH_PV_WNW, 48, 105),
+]
+
+# Meter columns of the Open Power System Data household file
+HOUSEHOLD_COLUMNS = [f"DE_KN_residential{i}_grid_import" for i in range(1, 7)]
+
+
+def write_synthetic_data(directory=".", first_year=2005, last_year=2023, consumption_year=2016, seed=0):
+    """Write the three input files into ``directory``, replacing existing ones.
+
+    The files go into the ``data`` subdirectory as expected by ``dataset``,
+    under the same names for any range of weather years. The same arguments
+    always give the same files. Returns the paths of the written files.
+    """
+    rng = np.random.default_rng(seed)
+    paths = []
+
+    time, clearness = _weather(rng, first_year, last_year)
+    for path, slope, aspect in PV_SIDES:
+        path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(_pvgis_json(time, _pv_output(time, slope, aspect) * clearness, slope, aspect))
+        paths.append(path)
+
+    path = os.path.join(directory, dataset.PATH_CONSUMPTION)
+    _write_household_csv(path, rng, consumption_year)
+    paths.append(path)
+    return paths
+
+
+def pvgis_hourly_json(slope, aspect, first_year=2005, last_year=2023, seed=0):
+    """Synthetic PVGIS hourly series of 1 kWp with any orientation, as JSON text.
+
+    The cloudiness depends only on ``seed`` and the years, so all orientations
+    see the same weather, and the two ``PV_SIDES`` equal the files written by
+    ``write_synthetic_data`` with the same arguments.
+    """
+    time, clearness = _weather(np.random.default_rng(seed), first_year, last_year)
+    return _pvgis_json(time, _pv_output(time, slope, aspect) * clearness, slope, aspect)
+
+
+def serve_pvgis(host="127.0.0.1", port=0, seed=0, failures=0):
+    """Start a local stand-in for the PVGIS ``seriescalc`` endpoint in a background thread.
+
+    Answers ``GET /api/v5_3/seriescalc?angle=..&aspect=..&startyear=..&endyear=..``
+    with ``pvgis_hourly_json``, other paths with 404. ``port=0`` picks a free
+    port. The first ``failures`` requests get a 503, to try out retries.
+
+    Returns the server: ``server.server_address`` gives the port,
+    ``server.shutdown()`` stops it and ``server.requests`` counts the answered
+    requests, failed ones included.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            with lock:
+                server.requests += 1
+                failing = server.requests <= failures
+            if failing:
+                body, status = json.dumps({"message": "Service unavailable"}).encode(), 503
+            elif url.path != PVGIS_PATH:
+                body, status = json.dumps({"message": f"Unknown path {url.path}"}).encode(), 404
+            else:
+                body, status = self._series(query)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _series(self, query):
+            try:
+                body = pvgis_hourly_json(float(query['angle']), float(query['aspect']),
+                                         int(query.get('startyear', 2005)), int(query.get('endyear', 2023)),
+                                         seed).encode()
+                status = 200
+            except (KeyError, ValueError) as error:
+                body = json.dumps({"message": f"Invalid request: {error}"}).encode()
+                status = 400
+            return body, status
+
+        def log_message(self, format, *args):
+            pass
+
+    lock = threading.Lock()
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _weather(rng, first_year, last_year):
+    """UTC hours of the PVGIS files and the cloudiness factor of each hour"""
+    time = pd.date_range(f"{first_year}-01-01 00:10", f"{last_year}-12-31 23:10", freq="h", tz="UTC")
+    # Cloudiness per day, shared by all roof sides
+    days = (time.normalize() - time[0].normalize()).days.to_numpy()
+    return time, _daily_clearness(rng, days[-1] + 1)[days]
+
+
+def _daily_clearness(rng, n_days):
+    """Fraction of the clear-sky output per day, an AR(1) process between 0.1 and 1"""
+    noise = rng.normal(0.0, 0.35, n_days)
+    values = np.empty(n_days)
+    state = 0.0
+    for i in range(n_days):
+        state = 0.7 * state + noise[i]
+        values[i] = state
+    return np.clip(0.75 + values, 0.1, 1.0)
+
+
+def _pv_output(time, slope, aspect):
+    """Clear-sky output in W of 1 kWp with the given orientation"""
+    day_of_year = time.dayofyear.to_numpy()
+    solar_hour = time.hour.to_numpy() + time.minute.to_numpy() / 60 + LONGITUDE / 15
+    declination = np.radians(23.45) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    hour_angle = np.radians(15 * (solar_hour - 12))
+    latitude = np.radians(LATITUDE)
+
+    sin_elevation = (np.sin(latitude) * np.sin(declination)
+                     + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle))
+    elevation = np.arcsin(np.clip(sin_elevation, -1, 1))
+    # Sun azimuth in the PVGIS convention, 0 = south, negative towards east
+    azimuth = np.arctan2(np.sin(hour_angle),
+                         np.cos(hour_angle) * np.sin(latitude) - np.tan(declination) * np.cos(latitude))
+
+    slope, aspect = np.radians(slope), np.radians(aspect)
+    cos_incidence = (np.sin(elevation) * np.cos(slope)
+                     + np.cos(elevation) * np.sin(slope) * np.cos(azimuth - aspect))
+    # Beam with a simple air-mass attenuation plus a diffuse share
+    beam = 1000 * 0.7 ** (1 / np.maximum(sin_elevation, 0.05) ** 0.678) * np.maximum(cos_incidence, 0)
+    diffuse = 100 * np.maximum(sin_elevation, 0) * (1 + np.cos(slope)) / 2
+    return np.where(sin_elevation > 0, 0.86 * (beam + diffuse), 0.0)
+
+
+def _pvgis_json(time, power, slope, aspect):
+    records = ",".join(
+        f'{{"time": "{t}", "P": {p:.2f}, "G(i)": {p * 1.1:.2f}, "H_sun": 0.0, "T2m": 10.0, "WS10m": 1.0, "Int": 0.0}}'
+        for t, p in zip(time.strftime("%Y%m%d:%H%M"), power))
+    inputs = {
+        "location": {"latitude": LATITUDE, "longitude": LONGITUDE},
+        "mounting_system": {"fixed": {"slope": {"value": slope}, "azimuth": {"value": aspect}}},
+        "pv_module": {"technology": "c-Si", "peak_power": 1.0, "system_loss": 14.0},
+    }
+    return ('{"inputs": ' + json.dumps(inputs) + ', "outputs": {"hourly": [' + records
+            + ']}, "meta": {"synthetic": true}}')
+
+
+def _write_household_csv(path, rng, year):
+    """15-minute cumulative meter readings in kWh from the day before until the day after ``year``"""
+    time = pd.date_range(f"{year - 1}-12-31 00:00", f"{year + 1}-01-01 23:45", freq="15min", tz="UTC")
+    local = time.tz_convert(dataset.PREPROCESSING_OPTIONS['timezone'])
+    hour = local.hour.to_numpy() + local.minute.to_numpy() / 60
+    season = 1 + 0.25 * np.cos(2 * np.pi * (local.dayofyear.to_numpy() - 15) / 365)
+    # Base load with a morning and a larger evening peak, in kWh per quarter hour
+    profile = (0.05 + 0.06 * np.exp(-((hour - 7.5) / 1.2) ** 2)
+               + 0.1 * np.exp(-((hour - 19) / 2) ** 2)) * season
+
+    frame = pd.DataFrame({
+        'utc_timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        'cet_cest_timestamp': local.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    })
+    for i, column in enumerate(HOUSEHOLD_COLUMNS):
+        energy = profile * (0.7 + 0.1 * i) * rng.lognormal(0.0, 0.4, len(time))
+        frame[column] = np.round(np.cumsum(energy), 3)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic PVGIS and household input files")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--first-year", type=int, default=2005)
+    parser.add_argument("--last-year", type=int, default=2023)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in write_synthetic_data(args.directory, args.first_year, args.last_year, seed=args.seed):
+        print(path)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from dataset import SimulationDataset
+
+
+@pytest.fixture
+def small_dataset():
+    """Factory of a two-year hourly dataset with a simple daily PV and load shape"""
+    def make(dtype=np.float64):
+        time = np.arange(np.datetime64("2020-01-01T00"), np.datetime64("2022-01-01T00"), np.timedelta64(1, "h"))
+        year = time.astype("datetime64[Y]").astype(np.int64) + 1970
+        hour = np.arange(len(time)) % 24
+        rng = np.random.default_rng(0)
+        daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+        p_oso = daylight * rng.uniform(200, 900, len(time))
+        p_wnw = np.roll(p_oso, 2) * 0.7
+        consumption = rng.uniform(0.5, 1.5, len(time)) * (1 + (hour >= 18))
+        consumption = consumption / consumption[year == 2020].sum()
+        return SimulationDataset(time, year, *(np.asarray(values, dtype=dtype)
+                                               for values in (p_oso, p_wnw, consumption)))
+    return make
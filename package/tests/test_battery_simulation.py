@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+import battery_simulation
+
+
+def test_float32_dataset_gives_float64_results(small_dataset):
+    dataset = small_dataset(np.float32)
+    result = battery_simulation.simulate(dataset)
+
+    assert result.consumption_kW.dtype == np.float64
+    for name, value in result.summary().items():
+        assert isinstance(value, (float, np.float64)), name
+        assert value == pytest.approx(battery_simulation.simulate_stats(dataset).summary()[name], rel=1e-12)
+
+
+def test_simulate_batch_equals_single_runs(small_dataset):
+    dataset = small_dataset()
+    table = [{'battery_capacity_kWh': 0}, {'battery_capacity_kWh': 13, 'installed_power_wnw_kWp': 0},
+             {'consumption_per_flat_per_year_kWh': 4500}]
+    batch = battery_simulation.simulate_batch(table, dataset)
+
+    assert len(batch) == len(table)
+    for row, parameters in zip(batch.to_dict('records'), table):
+        for name, value in battery_simulation.simulate_stats(dataset, **parameters).summary().items():
+            assert row[name] == pytest.approx(value, rel=1e-12)
+
+
+def test_simulate_batch_without_scenarios(small_dataset):
+    batch = battery_simulation.simulate_batch([], small_dataset())
+
+    assert len(batch) == 0
+    assert 'avg_pv_used' in batch.columns
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+import data_cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.csv"
+    path.write_text("1,2,3\n")
+    return path
+
+
+def _load(source, cache_dir, options=None, builds=None):
+    def build():
+        builds.append(1)
+        return {'values': np.loadtxt(source, delimiter=",") * (options or {}).get('scale', 1)}
+    return data_cache.load_or_build([str(source)], options or {}, build, str(cache_dir))
+
+
+def _entries(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if os.path.isdir(cache_dir / name))
+
+
+def test_second_load_uses_cache(source, tmp_path):
+    builds = []
+    first = _load(source, tmp_path / "cache", builds=builds)
+    second = _load(source, tmp_path / "cache", builds=builds)
+
+    assert len(builds) == 1
+    assert isinstance(second['values'], np.memmap)
+    np.testing.assert_array_equal(second['values'], first['values'])
+
+
+def test_changed_file_rebuilds_and_removes_stale_entry(source, tmp_path):
+    cache_dir = tmp_path / "cache"
+    builds = []
+    _load(source, cache_dir, builds=builds)
+    old_entries = _entries(cache_dir)
+
+    source.write_text("4,5,6,7\n")
+    result = _load(source, cache_dir, builds=builds)
+
+    assert len(builds) == 2
+    np.testing.assert_array_equal(result['values'], [4, 5, 6, 7])
+    assert len(_entries(cache_dir)) == 1
+    assert _entries(cache_dir) != old_entries
+
+
+def test_changed_option_rebuilds_and_keeps_other_entry(source, tmp_path):
+    cache_dir = tmp_path / "cache"
+    builds = []
+    _load(source, cache_dir, builds=builds)
+
+    result = _load(source, cache_dir, {'scale': 2}, builds=builds)
+
+    assert len(builds) == 2
+    np.testing.assert_array_equal(result['values'], [2, 4, 6])
+    # Entries with other options are not stale, e.g. the hourly and the 15-minute data
+    assert len(_entries(cache_dir)) == 2
+    _load(source, cache_dir, builds=builds)
+    assert len(builds) == 2
+
+
+@pytest.mark.parametrize("damage", ["truncate", "missing_array", "missing_index"])
+def test_damaged_entry_is_rebuilt(source, tmp_path, damage):
+    cache_dir = tmp_path / "cache"
+    builds = []
+    _load(source, cache_dir, builds=builds)
+    entry_dir = cache_dir / _entries(cache_dir)[0]
+    if damage == "truncate":
+        content = (entry_dir / "values.npy").read_bytes()
+        (entry_dir / "values.npy").write_bytes(content[:len(content) - 8])
+    elif damage == "missing_array":
+        (entry_dir / "values.npy").unlink()
+    else:
+        (entry_dir / "arrays.json").unlink()
+
+    result = _load(source, cache_dir, builds=builds)
+
+    assert len(builds) == 2
+    np.testing.assert_array_equal(result['values'], [1, 2, 3])
+    np.testing.assert_array_equal(_load(source, cache_dir, builds=builds)['values'], [1, 2, 3])
+    assert len(builds) == 2
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from dataset import SimulationDataset
+
+
+def test_dataset_is_not_changed_through_its_inputs(small_dataset):
+    reference = small_dataset()
+    time, year = np.array(reference.time), np.array(reference.year)
+    p_oso, p_wnw, consumption = (np.array(values) for values in
+                                 (reference.P_oso, reference.P_wnw, reference.consumption_kW_normed))
+    dataset = SimulationDataset(time, year, p_oso, p_wnw, consumption)
+    fingerprint, smoothed = dataset.fingerprint, dataset.consumption_smoothed.copy()
+
+    consumption *= 2
+    p_oso[:] = 0
+
+    assert dataset.fingerprint == fingerprint
+    np.testing.assert_array_equal(dataset.consumption_smoothed, smoothed)
+    np.testing.assert_array_equal(dataset.P_oso, reference.P_oso)
+    with pytest.raises(ValueError):
+        dataset.P_wnw[0] = 1
+
+
+def test_dataset_keeps_read_only_inputs_without_copy(small_dataset, tmp_path):
+    reference = small_dataset()
+    np.save(tmp_path / "P_oso.npy", reference.P_oso)
+    p_oso = np.load(tmp_path / "P_oso.npy", mmap_mode="r")
+
+    dataset = SimulationDataset(reference.time, reference.year, p_oso, reference.P_wnw,
+                                reference.consumption_kW_normed)
+
+    assert np.shares_memory(dataset.P_oso, p_oso)
+    assert np.shares_memory(dataset.P_wnw, reference.P_wnw)
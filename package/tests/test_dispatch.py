@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dispatch
+from aggregates import annual_metrics
+from dispatch import greedy_dispatch, greedy_dispatch_batch, greedy_dispatch_batch_stats, greedy_dispatch_stats
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(1)
+    hours = np.arange(3 * 200)
+    p_oso = np.clip(np.sin(hours / 24 * 2 * np.pi), 0, None) * 900 * rng.uniform(0.3, 1.0, len(hours))
+    p_wnw = np.roll(p_oso, 3) * 0.8
+    profile = rng.uniform(0.5, 1.5, len(hours)) / len(hours)
+    return p_oso, p_wnw, profile, np.array([0, 200, 400])
+
+
+def _baseline_dispatch(df, battery_capacity_kWh, battery_discharge_cutoff_limit,
+                       battery_charge_efficiency, battery_max_power_kW):
+    """The iterrows loop of the original run_pv_battery_simulation, unchanged"""
+    soc = battery_capacity_kWh/2
+    soc_list = []
+    grid_list = []
+    battery_charge_list = []
+    battery_discharge_list = []
+
+    for idx, row in df.iterrows():
+        pv_surplus = row["PV_total_kW"] - row["consumption_kW"]
+        if pv_surplus > 0:
+            charge_possible = min(
+                pv_surplus * battery_charge_efficiency,
+                battery_capacity_kWh - soc,
+                battery_max_power_kW
+            )
+            soc += charge_possible
+            grid = 0
+            battery_charge = charge_possible
+            battery_discharge = 0
+        else:
+            discharge_possible = min(
+                -pv_surplus,
+                soc - battery_capacity_kWh * battery_discharge_cutoff_limit,
+                battery_max_power_kW
+            )
+            soc -= discharge_possible
+            grid = -pv_surplus - discharge_possible if discharge_possible < -pv_surplus else 0
+            battery_charge = 0
+            battery_discharge = discharge_possible
+
+        soc_list.append(soc)
+        grid_list.append(grid)
+        battery_charge_list.append(battery_charge)
+        battery_discharge_list.append(battery_discharge)
+    return soc_list, grid_list, battery_charge_list, battery_discharge_list
+
+
+# capacity, cutoff, efficiency, max power
+BATTERIES = {
+    'default': (10.0, 0.1, 0.95, 4.2),
+    'cutoff': (10.0, 0.6, 0.95, 4.2),
+    'max_power': (10.0, 0.1, 0.95, 0.3),
+    'no_battery': (0.0, 0.1, 0.95, 4.2),
+}
+
+
+@pytest.mark.parametrize("battery", BATTERIES.values(), ids=BATTERIES.keys())
+@pytest.mark.parametrize("use_jit", [True, False])
+def test_greedy_dispatch_equals_baseline_loop(series, battery, use_jit):
+    p_oso, p_wnw, profile, _ = series
+    df = pd.DataFrame({'PV_total_kW': 10*p_oso*1e-3 + 5*p_wnw*1e-3, 'consumption_kW': profile * 3200})
+
+    result = greedy_dispatch(df['PV_total_kW'], df['consumption_kW'], *battery, use_jit=use_jit)
+
+    for values, expected in zip(result, _baseline_dispatch(df, *battery)):
+        np.testing.assert_array_equal(values, expected)
+
+
+@pytest.mark.skipif(dispatch.njit is None, reason="numba is not installed")
+@pytest.mark.parametrize("battery", BATTERIES.values(), ids=BATTERIES.keys())
+def test_jit_kernels_equal_python_fallback(series, battery):
+    p_oso, p_wnw, profile, year_starts = series
+    pv = 10*p_oso*1e-3 + 5*p_wnw*1e-3
+    consumption = profile * 3200
+
+    for jit, python in zip(greedy_dispatch(pv, consumption, *battery, use_jit=True),
+                           greedy_dispatch(pv, consumption, *battery, use_jit=False)):
+        np.testing.assert_array_equal(jit, python)
+
+    stats = [greedy_dispatch_stats(p_oso, p_wnw, profile, year_starts, 10, 5, 3200, *battery, use_jit=use_jit)
+             for use_jit in (True, False)]
+    np.testing.assert_array_equal(*stats)
+
+    batch = [greedy_dispatch_batch(np.stack([pv, pv / 2], axis=1), np.stack([consumption] * 2, axis=1),
+                                   np.full(2, battery[0] / 2), *battery, use_jit=use_jit)
+             for use_jit in (True, False)]
+    for jit, python in zip(*batch):
+        np.testing.assert_array_equal(jit, python)
+
+
+SCENARIOS = [
+    # oso kWp, wnw kWp, consumption, capacity, cutoff, efficiency, max power
+    (10.0, 5.0, 3200.0, 10.0, 0.1, 0.95, 3.0),
+    (0.0, 0.0, 3200.0, 10.0, 0.1, 0.95, 3.0),
+    (15.0, 0.0, 8000.0, 0.0, 0.1, 0.9, 5.0),
+]
+
+
+@pytest.mark.parametrize("use_jit", [True, False])
+def test_batch_stats_equal_single_runs(series, use_jit):
+    p_oso, p_wnw, profile, year_starts = series
+    columns = np.array(SCENARIOS).T
+    sums = greedy_dispatch_batch_stats(p_oso, p_wnw, profile, year_starts, *columns, use_jit=use_jit)
+
+    assert sums.shape == (3, 5, len(SCENARIOS))
+    for j, scenario in enumerate(SCENARIOS):
+        expected = greedy_dispatch_stats(p_oso, p_wnw, profile, year_starts, *scenario, use_jit=use_jit)
+        np.testing.assert_array_equal(sums[:, :, j], expected)
+
+
+def test_batch_stats_profile_per_scenario(series):
+    p_oso, p_wnw, profile, year_starts = series
+    profiles = np.stack([profile, profile[::-1]])
+    sums = greedy_dispatch_batch_stats(p_oso, p_wnw, profiles, year_starts, 10.0, 5.0, 3200.0,
+                                       10.0, 0.1, 0.95, 3.0, profile_index=[1, 0])
+
+    expected = greedy_dispatch_stats(p_oso, p_wnw, profile[::-1], year_starts,
+                                     10.0, 5.0, 3200.0, 10.0, 0.1, 0.95, 3.0)
+    np.testing.assert_array_equal(sums[:, :, 0], expected)
+    assert not np.array_equal(sums[:, :, 0], sums[:, :, 1])
+
+
+def test_annual_metrics_skip_nan_years():
+    # No PV: the battery's initial charge gives inf in the first year, 0/0 in the others
+    metrics = annual_metrics(np.zeros(3), np.full(3, 100.0), np.array([98.0, 100.0, 100.0]))
+    assert metrics['avg_self_consumption_rate'] == np.inf
+    assert metrics['avg_pv_used'] == pytest.approx(2 / 3)
+
+    metrics = annual_metrics(np.zeros(3), np.full(3, 100.0), np.full(3, 100.0))
+    assert np.isnan(metrics['avg_self_consumption_rate'])
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_simulation import _resolve_parameters
+from dataset import SimulationDataset
+from dispatch import greedy_dispatch
+from ensemble import ENSEMBLE_METRICS, EnsembleResult, run_ensemble
+from optimize import CostModel
+
+
+def _result(payback_years):
+    n = len(payback_years)
+    members = pd.DataFrame({name: np.arange(n, dtype=np.float64) for name in ENSEMBLE_METRICS})
+    members['payback_years'] = payback_years
+    return EnsembleResult({}, np.zeros((n, 1, 5)), np.zeros((n, 1)), members)
+
+
+def test_percentiles_interpolate_linearly():
+    table = _result(np.arange(11.0)).percentiles((0, 25, 50, 100))
+    assert list(table.index) == ['P0', 'P25', 'P50', 'P100']
+    np.testing.assert_allclose(table['npv'], [0, 2.5, 5, 10])
+
+
+def test_percentiles_keep_members_that_never_pay_back():
+    table = _result([5.0, 8.0, np.inf, np.inf]).percentiles((10, 50, 90))
+    assert table.loc['P10', 'payback_years'] == pytest.approx(5.9)
+    assert table.loc['P50', 'payback_years'] == np.inf
+    assert table.loc['P90', 'payback_years'] == np.inf
+
+
+def test_run_ensemble_is_reproducible(small_dataset):
+    dataset = small_dataset()
+    kwargs = dict(n_members=6, cost_model=CostModel(horizon_years=3), dataset=dataset, seed=4)
+    first, second = run_ensemble(**kwargs), run_ensemble(**kwargs)
+
+    assert first.annual_sums.shape == (6, 3, 5)
+    pd.testing.assert_frame_equal(first.members, second.members)
+    assert not run_ensemble(**{**kwargs, 'seed': 5}).members.equals(first.members)
+
+
+@pytest.fixture
+def one_year_dataset(small_dataset):
+    """First year of the small dataset only, so every member-year sees the same weather"""
+    dataset = small_dataset()
+    n = dataset.year_starts[1]
+    return SimulationDataset(dataset.time[:n], dataset.year[:n], dataset.P_oso[:n], dataset.P_wnw[:n],
+                             dataset.consumption_kW_normed[:n])
+
+
+def _deterministic(**kwargs):
+    return dict(consumption_scale_sd=0.0, consumption_year_sd=0.0, shift_variants=0, capacity_fade_sd=0.0,
+                battery_capacity_kWh=8, **kwargs)
+
+
+def test_state_of_charge_carries_over_between_years(one_year_dataset):
+    result = run_ensemble(n_members=2, cost_model=CostModel(horizon_years=3), dataset=one_year_dataset,
+                          **_deterministic(capacity_fade_mean=0.0))
+
+    # One continuous run over three copies of the year
+    params = _resolve_parameters({'battery_capacity_kWh': 8})
+    pv = np.tile(params['installed_power_oso_kWp'] * one_year_dataset.P_oso * 1e-3
+                 + params['installed_power_wnw_kWp'] * one_year_dataset.P_wnw * 1e-3, 3)
+    consumption = np.tile(one_year_dataset.consumption_smoothed
+                          * params['consumption_per_flat_per_year_kWh'], 3)
+    _, grid, charge, discharge = greedy_dispatch(
+        pv, consumption, 8, params['battery_discharge_cutoff_limit'], params['battery_charge_efficiency'],
+        params['battery_max_power_kW'])
+    expected = np.stack([values.reshape(3, -1).sum(axis=1) for values in (pv, consumption, grid, charge, discharge)],
+                        axis=1)
+    for member in range(2):
+        np.testing.assert_allclose(result.annual_sums[member], expected, rtol=1e-9)
+
+
+def test_capacity_fade_lowers_self_consumption(one_year_dataset):
+    result = run_ensemble(n_members=2, cost_model=CostModel(horizon_years=5), dataset=one_year_dataset,
+                          **_deterministic(capacity_fade_mean=0.3))
+
+    pv_total, consumption, from_grid = (result.annual_sums[:, :, k] for k in range(3))
+    self_consumption = (consumption - from_grid) / pv_total
+    assert np.all(np.diff(self_consumption, axis=1) < 0)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import battery_simulation
+import fleet
+from dispatch import greedy_dispatch_stats
+
+
+@pytest.fixture
+def small_fleet(small_dataset):
+    dataset = small_dataset()
+    profile = np.asarray(dataset.consumption_kW_normed)
+    return fleet.FleetDataset.from_profiles(dataset, np.stack([profile, np.roll(profile, 5)], axis=1))
+
+
+def test_select_rejects_unknown_households(small_fleet):
+    assert small_fleet.select([1, 'flat1']).household_names == ('flat2', 'flat1')
+    with pytest.raises(IndexError, match="flat1, flat2"):
+        small_fleet.select([2])
+    with pytest.raises(IndexError):
+        small_fleet.select([-1])
+    with pytest.raises(KeyError, match="flat1, flat2"):
+        small_fleet.select(['flat3'])
+
+
+def test_per_flat_battery_equals_single_runs(small_fleet):
+    parameters = dict(installed_power_oso_kWp=8, installed_power_wnw_kWp=4, battery_capacity_kWh=5,
+                      battery_max_power_kW=2)
+    result = fleet.simulate_fleet(small_fleet, battery='per_flat', pv_shares=[3, 1], **parameters)
+
+    dataset = small_fleet.dataset
+    params = battery_simulation._resolve_parameters(parameters)
+    for k, share in enumerate([0.75, 0.25]):
+        # Each flat runs alone with its share of the plant and its own profile
+        expected = greedy_dispatch_stats(
+            dataset.P_oso, dataset.P_wnw, small_fleet.consumption_profiles[:, k], dataset.year_starts,
+            8 * share, 4 * share, 3200, 5 * share, params['battery_discharge_cutoff_limit'],
+            params['battery_charge_efficiency'], 2 * share)
+        np.testing.assert_allclose(result.household_consumption[:, k], expected[:, 1])
+        np.testing.assert_allclose(result.household_from_grid[:, k], expected[:, 2])
+    assert result.annual_sums.shape == (2, 5)
+
+
+def test_per_flat_battery_per_household_values(small_fleet):
+    result = fleet.simulate_fleet(small_fleet, battery='per_flat', battery_capacity_kWh=[6, 0],
+                                  battery_max_power_kW=[3, 1])
+
+    dataset = small_fleet.dataset
+    params = battery_simulation._resolve_parameters({})
+    for k, (capacity, max_power) in enumerate([(6, 3), (0, 1)]):
+        expected = greedy_dispatch_stats(
+            dataset.P_oso, dataset.P_wnw, small_fleet.consumption_profiles[:, k], dataset.year_starts,
+            params['installed_power_oso_kWp'] / 2, params['installed_power_wnw_kWp'] / 2, 3200, capacity,
+            params['battery_discharge_cutoff_limit'], params['battery_charge_efficiency'], max_power)
+        np.testing.assert_allclose(result.household_from_grid[:, k], expected[:, 2])
+
+
+def test_per_flat_splits_building_battery(small_fleet):
+    total = fleet.simulate_fleet(small_fleet, battery='per_flat', pv_shares=[3, 1], battery_capacity_kWh=10,
+                                 battery_max_power_kW=4)
+    split = fleet.simulate_fleet(small_fleet, battery='per_flat', pv_shares=[3, 1], battery_capacity_kWh=[7.5, 2.5],
+                                 battery_max_power_kW=[3, 1])
+
+    np.testing.assert_array_equal(total.annual_sums, split.annual_sums)
+    np.testing.assert_array_equal(total.household_from_grid, split.household_from_grid)
@@ -0,0 +1,33 @@
+import tracemalloc
+
+import numpy as np
+
+from instrumentation import StageTimer
+
+
+def _run(timer):
+    timer.on_run_start({})
+    timer.on_stage_start('dispatch')
+    np.ones(100_000)
+    timer.on_stage_end('dispatch')
+    timer.on_run_end({})
+    return timer.stages['dispatch']
+
+
+def test_timer_traces_its_own_session():
+    stage = _run(StageTimer(track_allocations=True))
+    assert stage['peak_bytes'] >= 800_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_timer_leaves_outer_session_alone():
+    tracemalloc.start()
+    try:
+        np.ones(1_000_000)
+        outer_peak = tracemalloc.get_traced_memory()[1]
+        stage = _run(StageTimer(track_allocations=True))
+        assert 'peak_bytes' not in stage and 'allocated_bytes' in stage
+        assert tracemalloc.get_traced_memory()[1] >= outer_peak
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
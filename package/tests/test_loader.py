@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import loader
+
+
+def _write_pvgis(path, records):
+    with open(path, "w") as file:
+        json.dump({"outputs": {"hourly": records}}, file)
+
+
+def test_load_pvgis_hourly_keeps_long_numbers(tmp_path):
+    path = tmp_path / "series.json"
+    _write_pvgis(path, [{"time": "20050101:0010", "P": 1.2345678901234567e-05},
+                        {"time": "20050101:0110", "P": 123.45}])
+
+    time, power = loader.load_pvgis_hourly(path)
+
+    assert time.tolist() == [np.datetime64("2005-01-01T00:10"), np.datetime64("2005-01-01T01:10")]
+    assert power.tolist() == [1.2345678901234567e-05, 123.45]
+
+
+def test_load_pvgis_hourly_json_fallback_keeps_long_numbers(tmp_path):
+    # "P" before "time" does not match the byte scanner, so the json module parses the file
+    path = tmp_path / "series.json"
+    _write_pvgis(path, [{"P": 0.1 + 0.2, "time": "20050101:0010"}])
+
+    _, power = loader.load_pvgis_hourly(path)
+
+    assert power.tolist() == [0.1 + 0.2]
+
+
+def _write_opsd(path, start_utc, readings):
+    """Cumulative meter readings every 15 minutes, stamped in CET/CEST like the OPSD file"""
+    time = pd.date_range(start_utc, periods=len(readings), freq="15min", tz="UTC").tz_convert("Europe/Berlin")
+    pd.DataFrame({'cet_cest_timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                  'DE_KN_residential1_grid_import': readings}).to_csv(path, index=False)
+
+
+def test_quarter_hour_consumption_is_labelled_with_interval_start(tmp_path):
+    # 2 kWh are used between the readings at 10:00 and 10:15 UTC
+    path = tmp_path / "household.csv"
+    _write_opsd(path, "2016-06-01 09:00", [5.0] * 5 + [7.0] * 7)
+
+    time, consumption = loader.load_household_consumption(path, 'DE_KN_residential1_grid_import', 2016, "15min")
+
+    assert time[np.argmax(consumption)] == pd.Timestamp("2016-06-01 10:00", tz="UTC")
+    assert consumption.sum() == 1
+
+
+def test_quarter_hour_consumption_aligned_with_pv(tmp_path):
+    path = tmp_path / "household.csv"
+    _write_opsd(path, "2016-06-01 09:00", [5.0] * 5 + [7.0] * 7)
+    profile_time, consumption = loader.load_household_consumption(
+        path, 'DE_KN_residential1_grid_import', 2016, "15min")
+    # PV only in the hour 10:00-11:00
+    pv_time = np.array(["2016-06-01T09:10", "2016-06-01T10:10", "2016-06-01T11:10"], dtype="datetime64[m]")
+    step_start, (pv,) = loader.interpolate_hourly(pv_time, [np.array([0.0, 4.0, 0.0])], 4)
+
+    index, valid = loader.align_profile_to_calendar(profile_time.tz_localize(None), step_start, 4)
+
+    assert valid.all()
+    aligned = consumption[index]
+    assert step_start[np.argmax(aligned)] == np.datetime64("2016-06-01T10:00")
+    assert pv[np.argmax(aligned)] > 0
+
+
+def test_interpolate_hourly_keeps_energy():
+    rng = np.random.default_rng(1)
+    time = np.datetime64("2020-03-01T00:10") + np.arange(48).astype("timedelta64[h]")
+    hourly = rng.uniform(0, 5, 48)
+
+    step_start, (quarter_hourly,) = loader.interpolate_hourly(time, [hourly], 4)
+
+    assert step_start[:5].tolist() == [np.datetime64("2020-03-01T00:00") + np.timedelta64(15 * i, "m")
+                                       for i in range(5)]
+    np.testing.assert_allclose(quarter_hourly.sum() / 4, hourly.sum())
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from dispatch import greedy_dispatch
+from optimal_dispatch import Tariff, optimal_dispatch
+
+BATTERY = dict(battery_capacity_kWh=10.0, battery_discharge_cutoff_limit=0.1,
+               battery_charge_efficiency=0.9, battery_max_power_kW=3.0)
+
+
+@pytest.fixture
+def week():
+    rng = np.random.default_rng(2)
+    hour = np.arange(7 * 24) % 24
+    pv = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) * rng.uniform(2, 8, len(hour))
+    consumption = rng.uniform(0.2, 1.0, len(hour)) + 2.0 * (hour >= 17) * (hour <= 21)
+    return hour, pv, consumption
+
+
+def test_tariff_energy_cost():
+    tariff = Tariff(import_price=[0.2, 0.4], export_price=0.1)
+    cost = tariff.energy_cost(pv_kW=np.array([5.0, 0.0]), consumption_kW=np.array([1.0, 2.0]),
+                              from_grid_kW=np.array([0.0, 1.5]), battery_charge_kWh=np.array([1.8, 0.0]),
+                              battery_discharge_kWh=np.array([0.0, 0.5]), battery_charge_efficiency=0.9)
+    # Step 1: 5 - 1 - 1.8 / 0.9 = 2 kWh fed in; step 2: 1.5 kWh imported at 0.4
+    np.testing.assert_allclose(cost, [-0.2, 0.6])
+
+
+def test_time_of_use_tariff():
+    prices = np.linspace(0.2, 0.43, 24)
+    tariff = Tariff.time_of_use([0, 23, 5], prices)
+    np.testing.assert_allclose(tariff.prices(3)[0], prices[[0, 23, 5]])
+    np.testing.assert_allclose(tariff.prices(3)[1], 0.08)
+    with pytest.raises(ValueError):
+        Tariff.time_of_use([0], prices[:12])
+
+
+@pytest.mark.parametrize("grid_charging", [False, True])
+def test_optimal_dispatch_keeps_the_energy_balance(week, grid_charging):
+    hour, pv, consumption = week
+    import_price, export_price = Tariff.time_of_use(hour, np.where(np.arange(24) < 6, 0.15, 0.40)).prices(len(hour))
+    soc, from_grid, charge, discharge = optimal_dispatch(pv, consumption, import_price, export_price,
+                                                         grid_charging=grid_charging, **BATTERY)
+
+    np.testing.assert_allclose(np.diff(np.r_[5.0, soc]), charge - discharge, atol=1e-9)
+    assert soc.min() >= 1.0 - 1e-9 and soc.max() <= 10.0 + 1e-9
+    assert charge.max() <= 3.0 + 1e-9 and discharge.max() <= 3.0 + 1e-9
+    assert np.all(charge * discharge == 0)
+    # Consumption is covered by PV, the battery and the grid; the battery never feeds the grid
+    grid_charge = np.maximum(charge / 0.9 - np.maximum(pv - consumption, 0), 0)
+    np.testing.assert_allclose(np.minimum(pv, consumption) + discharge + from_grid - grid_charge,
+                               consumption, atol=1e-9)
+    assert np.all(discharge <= np.maximum(consumption - pv, 0) + 1e-9)
+    if not grid_charging:
+        assert np.all(grid_charge <= 1e-9)
+
+
+def test_optimal_dispatch_saves_cost_and_keeps_greedy_on_flat_tariff(week):
+    hour, pv, consumption = week
+    greedy = greedy_dispatch(pv, consumption, **BATTERY)
+    flat = optimal_dispatch(pv, consumption, 0.3, 0.08, **BATTERY)
+    for optimal, expected in zip(flat, greedy):
+        np.testing.assert_allclose(optimal, expected, atol=1e-9)
+
+    tariff = Tariff.time_of_use(hour, np.where(np.arange(24) < 6, 0.10, 0.45))
+    costs = [tariff.energy_cost(pv, consumption, result[1], result[2], result[3], 0.9).sum()
+             for result in (greedy, optimal_dispatch(pv, consumption, *tariff.prices(len(pv)),
+                                                     grid_charging=True, **BATTERY))]
+    assert costs[1] <= costs[0] + 1e-9
@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+import battery_simulation
+import optimize
+
+
+def test_cost_model_evaluate():
+    model = optimize.CostModel(battery_prices={0: 0, 10: 5000}, pv_cost_per_kWp=1000, fixed_cost=500,
+                               grid_tariff=0.3, feed_in_tariff=0.1, annual_running_cost=100,
+                               horizon_years=10, discount_rate=0.05)
+
+    result = model.evaluate(10, 5, avg_pv_used=6000, avg_pv_total=9000)
+
+    assert result['investment'] == pytest.approx(10000 + 500 + 2500)
+    assert result['annual_cash_flow'] == pytest.approx(1800 + 300 - 100)
+    assert result['payback_years'] == pytest.approx(13000 / 2000)
+    assert result['npv'] == pytest.approx(2000 * (1 - 1.05 ** -10) / 0.05 - 13000)
+    assert model.evaluate(10, 5, avg_pv_used=0, avg_pv_total=0)['payback_years'] == math.inf
+
+
+def test_snap_stays_within_bounds():
+    assert optimize._snap(0.05, 0.1, (0.05, 1.0)) == 0.05
+    assert optimize._snap(0.97, 0.1, (0.05, 0.97)) == 0.97
+    assert optimize._snap(0.44, 0.1, (0.05, 0.97)) == 0.4
+
+
+@pytest.mark.parametrize("minimum", [0.0, 3.3, 10.0])
+def test_golden_section_finds_minimum_with_few_evaluations(minimum):
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return (x - minimum) ** 2
+
+    assert optimize._golden_section(f, 0.0, 10.0, 0.01) == pytest.approx(minimum, abs=0.01)
+    assert len(calls) < 30  # a full grid at this resolution needs 1001 evaluations
+
+
+def test_optimize_configuration_memoises_simulations(small_dataset, monkeypatch):
+    dataset = small_dataset()
+    calls = []
+    simulate_stats = battery_simulation.simulate_stats
+    monkeypatch.setattr(battery_simulation, 'simulate_stats',
+                        lambda *args, **kwargs: calls.append(kwargs) or simulate_stats(*args, **kwargs))
+
+    result = optimize.optimize_configuration(dataset=dataset, battery_step=0.5, power_step=0.5)
+
+    assert len(calls) == result.n_evaluations == len(result.history)
+    assert len({(c['battery_capacity_kWh'], c['installed_power_oso_kWp']) for c in calls}) == len(calls)
+    # The full grid has 40 capacities times 31 splits
+    assert result.n_evaluations < 40 * 31 / 4
+
+
+def test_optimize_configuration_finds_optimum_on_bound(small_dataset):
+    model = optimize.CostModel(battery_prices=lambda capacity: 1e6 * capacity)
+
+    result = optimize.optimize_configuration(model, dataset=small_dataset(), battery_bounds=(0, 10),
+                                             battery_step=0.5, power_step=0.5)
+
+    assert result.parameters['battery_capacity_kWh'] == 0
+
+
+def test_optimize_configuration_npv_matches_grid(small_dataset):
+    dataset = small_dataset()
+    model = optimize.CostModel(discount_rate=0.03)
+    total_power_kWp = 15
+
+    result = optimize.optimize_configuration(model, total_power_kWp, objective='npv', dataset=dataset,
+                                             battery_step=1.5, power_step=1.5)
+
+    npv = []
+    for capacity in [1.5 * b for b in range(14)]:
+        for power_oso in [1.5 * p for p in range(11)]:
+            stats = battery_simulation.simulate_stats(dataset, battery_capacity_kWh=capacity,
+                                                      installed_power_oso_kWp=power_oso,
+                                                      installed_power_wnw_kWp=total_power_kWp - power_oso)
+            npv.append(model.evaluate(total_power_kWp, capacity, stats.avg_pv_used,
+                                      stats.annual_sums[:, 0].mean())['npv'])
+    assert result.npv == pytest.approx(max(npv), rel=1e-9)
+    assert result.n_evaluations < len(npv)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import pv_sources
+import synthetic_data
+
+ORIENTATIONS = pv_sources.orientation_grid([30, 45], [-90, 0])
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    synthetic_data.write_synthetic_data(tmp_path, first_year=2020, last_year=2021)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def pvgis_server():
+    server = synthetic_data.serve_pvgis(failures=2)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, cache_dir):
+    host, port = server.server_address
+    return pv_sources.PVGISClient(f"http://{host}:{port}{synthetic_data.PVGIS_PATH}", cache_dir,
+                                  max_connections=2, retries=3, backoff=0.01, startyear=2020, endyear=2021)
+
+
+def test_client_retries_and_caches(data_dir, pvgis_server):
+    client = _client(pvgis_server, data_dir / "pvgis")
+    series = client.load(ORIENTATIONS)
+
+    # Two injected failures, then one successful request per orientation
+    assert pvgis_server.requests == len(ORIENTATIONS) + 2
+    assert client.downloads == len(ORIENTATIONS)
+    assert series.power.shape == (len(series.time), len(ORIENTATIONS))
+
+    again = _client(pvgis_server, data_dir / "pvgis").load(ORIENTATIONS)
+    assert pvgis_server.requests == len(ORIENTATIONS) + 2
+    np.testing.assert_array_equal(again.power, series.power)
+
+
+def test_combine_stacks_orientations(data_dir, pvgis_server):
+    series = _client(pvgis_server, data_dir / "pvgis").load(ORIENTATIONS)
+    south = series.power[:, series.index(30, 0)]
+    east = series.power[:, series.index(45, -90)]
+
+    np.testing.assert_allclose(series.combine({(30, 0): 2.0, (45, -90): 0.5}), 2.0 * south + 0.5 * east)
+    np.testing.assert_allclose(series.combine([0, 1, 0, 0]), series.power[:, 1])
+    assert not np.array_equal(south, east)
+
+
+def test_client_gives_up_after_retries(data_dir):
+    server = synthetic_data.serve_pvgis(failures=10)
+    try:
+        client = _client(server, data_dir / "pvgis")
+        client.retries = 1
+        with pytest.raises(pv_sources.urllib.error.HTTPError):
+            client.fetch(ORIENTATIONS[:1])
+        assert server.requests == 2
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,31 @@
+import re
+
+from battery_simulation import report_filename
+from reports import generate_reports
+
+
+def test_report_filename_keeps_existing_names():
+    assert report_filename({}) == "PV_Batterie_Simulation_20kWh_OSO10kWp_WNW10kWp_3200kWh-Whg_4,2kW_10-95.pdf"
+    assert report_filename({'battery_capacity_kWh': 16.2}).startswith("PV_Batterie_Simulation_16,2kWh_")
+
+
+def test_report_filename_distinguishes_nearby_values():
+    names = {report_filename({'battery_capacity_kWh': value}) for value in (10.0, 10.0000001, 10.0000002)}
+    assert len(names) == 3
+    assert report_filename({'battery_charge_efficiency': 0.951234}) != report_filename({'battery_charge_efficiency': 0.9512345})
+
+
+def test_generate_reports_renders_every_scenario(small_dataset, tmp_path):
+    scenarios = [{'battery_capacity_kWh': 0}, {'battery_capacity_kWh': 13}]
+    calls = []
+
+    result = generate_reports(scenarios, tmp_path / "reports", small_dataset(), max_workers=2,
+                              progress=lambda done, total: calls.append((done, total)))
+
+    assert len(set(result['pdf_filename'])) == 2
+    for pdf_filename in result['pdf_filename']:
+        with open(pdf_filename, "rb") as file:
+            content = file.read()
+        assert content.startswith(b"%PDF")
+        assert len(re.findall(rb"/Type\s*/Page\b", content)) == 4
+    assert calls == [(1, 2), (2, 2)]
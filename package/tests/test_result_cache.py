@@ -0,0 +1,39 @@
+import numpy as np
+
+import battery_simulation
+from result_cache import ResultCache
+
+
+def test_least_recently_used_entry_is_dropped(small_dataset):
+    dataset = small_dataset()
+    cache = ResultCache(maxsize=2)
+    for capacity in (5, 10):
+        cache.simulate_stats(dataset, battery_capacity_kWh=capacity)
+    cache.simulate_stats(dataset, battery_capacity_kWh=5.0)  # hit, 10 is now the oldest
+    cache.simulate_stats(dataset, battery_capacity_kWh=15)
+
+    assert len(cache) == 2
+    assert cache.get(dataset, {'battery_capacity_kWh': 5}) is not None
+    assert cache.get(dataset, {'battery_capacity_kWh': 10}) is None
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 4, 2)
+
+
+def test_results_survive_in_sqlite(small_dataset, tmp_path):
+    dataset = small_dataset()
+    path = str(tmp_path / "results.sqlite")
+    with ResultCache(path=path) as cache:
+        stats = cache.simulate_stats(dataset, battery_capacity_kWh=7.5)
+
+    with ResultCache(path=path) as cache:
+        cached = cache.get(dataset, {'battery_capacity_kWh': 7.5})
+        assert cache.cache_info().disk_hits == 1
+        assert cached.summary() == stats.summary()
+        np.testing.assert_array_equal(cached.annual_sums, stats.annual_sums)
+
+        # A changed dataset never sees the old entries
+        other = battery_simulation.SimulationDataset(
+            dataset.time, dataset.year, dataset.P_oso * 0.5, dataset.P_wnw, dataset.consumption_kW_normed)
+        assert cache.get(other, {'battery_capacity_kWh': 7.5}) is None
+        cache.invalidate(dataset)
+        assert cache.get(dataset, {'battery_capacity_kWh': 7.5}) is None
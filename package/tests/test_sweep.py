@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import battery_simulation
+import sweep
+
+
+def test_run_sweep_keeps_grid_order_and_equals_simulate_batch(small_dataset):
+    dataset = small_dataset()
+    grid = sweep.parameter_grid(battery_capacity_kWh=[13, 0, 6.5], installed_power_oso_kWp=[4, 16])
+    calls = []
+
+    result = sweep.run_sweep(grid, dataset, max_workers=2, chunk_size=2,
+                             progress=lambda done, total: calls.append((done, total)))
+
+    pd.testing.assert_frame_equal(result, battery_simulation.simulate_batch(grid, dataset), rtol=1e-12)
+    assert sorted(calls) == [(2, 6), (4, 6), (6, 6)]
+
+
+def test_run_sweep_float32_rows_in_shared_memory(small_dataset):
+    dataset = small_dataset(np.float32)
+
+    result = sweep.run_sweep({'battery_capacity_kWh': [0, 10]}, dataset, max_workers=2, chunk_size=1)
+
+    expected = battery_simulation.simulate_batch([{'battery_capacity_kWh': 0}, {'battery_capacity_kWh': 10}],
+                                                 dataset)
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-12)